@@ -7,35 +7,106 @@ signal prediction_completed(result)
 var python_script_name = "godot_predictor.py" 
 var python_executable = "python"
 
+# Long-running Python worker started with OS.execute_with_pipe (see godot_predictor.py --worker)
+var worker = null
+var worker_output = ""
+var next_request_id = 0
+
+# How long to wait for the worker's answer (including its startup) before predicting without it
+var worker_timeout_msec = 15000
+
+# Get the correct path to the ML directory (at project root, not in App)
+func get_project_root():
+	var app_dir = OS.get_executable_path().get_base_dir()
+	# Need to go up two levels: from /App/mentalhealthapp to project root
+	return app_dir.get_base_dir().get_base_dir()
+
+func get_script_path():
+	return get_project_root() + "/ML/" + python_script_name
+
+# Start the prediction worker once; it keeps the model loaded between predictions
+func start_worker():
+	if worker != null and OS.is_process_running(worker["pid"]):
+		return true
+	
+	var script_path = get_script_path()
+	print("Starting prediction worker: ", script_path)
+	# Non-blocking pipes, so a worker that hangs can't freeze the app (see request_from_worker)
+	var pipe = OS.execute_with_pipe(python_executable, [script_path, "--worker"], false)
+	if pipe.is_empty():
+		print("Could not start prediction worker")
+		worker = null
+		return false
+	
+	worker = pipe
+	worker_output = ""
+	return true
+
+# Print what the worker wrote to stderr; a full, unread stderr pipe would block the worker
+func drain_worker_stderr():
+	var errors = worker["stderr"].get_buffer(4096)
+	while not errors.is_empty():
+		printerr(errors.get_string_from_utf8())
+		errors = worker["stderr"].get_buffer(4096)
+
+# Send one request to the worker and wait for the response with the same id
+func request_from_worker(features_dict):
+	next_request_id += 1
+	var request_id = next_request_id
+	var stdio = worker["stdio"]
+	stdio.store_line(JSON.stringify({"id": request_id, "input": features_dict}))
+	stdio.flush()
+	
+	# Poll for our response, skipping the worker's "ready" line and anything else that isn't it
+	var deadline = Time.get_ticks_msec() + worker_timeout_msec
+	while OS.is_process_running(worker["pid"]) and Time.get_ticks_msec() < deadline:
+		drain_worker_stderr()
+		var chunk = stdio.get_buffer(4096)
+		if chunk.is_empty():
+			OS.delay_msec(2)
+			continue
+		# The last piece is a line the worker hasn't finished writing yet
+		var lines = (worker_output + chunk.get_string_from_utf8()).split("\n")
+		worker_output = lines[-1]
+		for i in range(lines.size() - 1):
+			var response = JSON.parse_string(lines[i])
+			if response is Dictionary and response.get("id") == request_id:
+				worker_output = "\n".join(lines.slice(i + 1))
+				response.erase("id")
+				return response
+	
+	# The worker died or didn't answer in time; the next prediction will start a new one
+	print("Prediction worker did not answer, running the script once instead")
+	stop_worker()
+	return null
+
 # Call the ML model to predict mood based on input features
 func predict_mood(features_dict):
-	# Convert features dictionary to JSON with proper escaping
-	var json = JSON.new()
-	var json_text = JSON.stringify(features_dict)
-	
-	# Double-escape special characters for command line
-	# Replace any backslashes with double backslashes
-	json_text = json_text.replace("\\", "\\\\")
-	# Escape double quotes 
-	json_text = json_text.replace("\"", "\\\"")
+	print("Sending JSON: ", JSON.stringify(features_dict))
 	
-	print("Sending JSON: ", json_text)
+	if start_worker():
+		var result = request_from_worker(features_dict)
+		if result != null:
+			emit_signal("prediction_completed", result)
+			return result
 	
+	# Fall back to running the script once for this prediction
+	return predict_mood_once(features_dict)
+
+# Run godot_predictor.py once for a single prediction
+func predict_mood_once(features_dict):
 	# Create array to store output
 	var output = []
 	
-	# Get the correct path to the ML directory (at project root, not in App)
-	var app_dir = OS.get_executable_path().get_base_dir()
-	# Need to go up two levels: from /App/mentalhealthapp to project root
-	var project_root = app_dir.get_base_dir().get_base_dir()
-	var script_path = project_root + "/ML/" + python_script_name
+	var project_root = get_project_root()
+	var script_path = get_script_path()
 	
-	print("App directory: ", app_dir)
 	print("Project root: ", project_root)
 	print("Using script path: ", script_path)
 	
-	# Create a temporary JSON file instead of passing directly via command line
-	var temp_json_path = project_root + "/temp_input.json"
+	# Write the input to a temporary JSON file instead of passing it on the command line
+	# Each call gets its own file so overlapping predictions don't overwrite each other
+	var temp_json_path = project_root + "/temp_input_%d_%d.json" % [OS.get_process_id(), Time.get_ticks_usec()]
 	var file = FileAccess.open(temp_json_path, FileAccess.WRITE)
 	if file:
 		file.store_string(JSON.stringify(features_dict))
@@ -44,6 +115,7 @@ func predict_mood(features_dict):
 		
 		# Execute the Python script with the file path
 		var exit_code = OS.execute(python_executable, [script_path, temp_json_path], output, true)
+		DirAccess.remove_absolute(temp_json_path)
 		
 		# Parse the JSON result
 		if exit_code == 0 and output.size() > 0:
@@ -61,6 +133,19 @@ func predict_mood(features_dict):
 		emit_signal("prediction_completed", error)
 		return error
 
+# Close the worker's pipes and end it
+func stop_worker():
+	if worker != null:
+		worker["stdio"].close()
+		worker["stderr"].close()
+		if OS.is_process_running(worker["pid"]):
+			OS.kill(worker["pid"])
+		worker = null
+
+# Stop the worker when the node goes away
+func _exit_tree():
+	stop_worker()
+
 # Get absolute path for the script based on the project directory
 func get_absolute_path(relative_path):
 	# Convert the resource path to a global path
@@ -438,12 +438,13 @@ func get_prediction_features():
 	else:
 		features["SLEEP_HOURS"] = randf_range(5.0, 9.0)  # Randomized default
 	
-	# GENDER - Use user profile data
+	# GENDER - Use user profile data (the model only knows Female and Male; others are left out)
 	if DataStorage.user_data.has("user_profile") and DataStorage.user_data.user_profile.has("gender"):
-		features["GENDER"] = DataStorage.user_data.user_profile.gender
+		if DataStorage.user_data.user_profile.gender in ["Female", "Male"]:
+			features["GENDER"] = DataStorage.user_data.user_profile.gender
 	else:
 		# Randomize gender selection to prevent same defaults
-		var genders = ["Male", "Female", "Other"]
+		var genders = ["Male", "Female"]
 		features["GENDER"] = genders[randi() % genders.size()]
 	
 	# AGE - Use user profile data
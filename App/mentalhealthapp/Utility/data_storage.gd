@@ -208,8 +208,10 @@ func get_model_input_data():
 	else:
 		input_features["SLEEP_HOURS"] = 7  # Default to 7 hours if no data
 	
-	# GENDER and AGE from user profile
-	input_features["GENDER"] = user_data["user_profile"]["gender"]
+	# GENDER and AGE from user profile; the model only knows the survey's Female/Male answers,
+	# so any other gender is left out and filled in by the model like a missing answer
+	if user_data["user_profile"]["gender"] in ["Female", "Male"]:
+		input_features["GENDER"] = user_data["user_profile"]["gender"]
 	input_features["AGE"] = user_data["user_profile"]["age"]
 	
 	# WORK_LIFE_BALANCE_SCORE - Use mood score as the balance score
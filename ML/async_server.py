@@ -0,0 +1,262 @@
+#!/usr/bin/env python
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from serve_model import predict_batch, active_models, check_for_new_version
+from instrumentation import METRICS
+
+"""
+Asyncio prediction server that micro-batches concurrent requests.
+
+Requests that arrive close together are queued and answered by one vectorized
+predict_batch call: a batch is flushed when it reaches --max-batch requests or
+when its first request has waited --max-wait-ms, and each caller gets its own
+result. Prediction runs in a single worker thread, so the event loop keeps
+accepting (and batching) requests while a batch is being scored.
+
+Speaks a minimal HTTP/1.1 with keep-alive:
+   POST /predict   the same JSON object as serve_model.py --serve
+   GET  /health
+   GET  /stats     batch-size histogram and flush counters
+   GET  /metrics   stage timings and fallback counters (see instrumentation.py)
+Usage:
+   python async_server.py 5001 --max-batch 64 --max-wait-ms 5
+"""
+
+DEFAULT_MAX_BATCH = 64
+DEFAULT_MAX_WAIT_MS = 5.0
+
+# Largest request body accepted, in bytes
+MAX_BODY_SIZE = 1 << 20
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large"}
+
+
+class RequestTooLarge(Exception):
+    pass
+
+
+class MicroBatcher:
+    def __init__(self, predict, max_batch=DEFAULT_MAX_BATCH, max_wait_ms=DEFAULT_MAX_WAIT_MS):
+        """
+        Args:
+            predict: Function taking a list of inputs and returning one result per input
+            max_batch: Flush as soon as this many requests are queued
+            max_wait_ms: Flush when the oldest queued request has waited this long
+        """
+        self.predict = predict
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.queue = None
+        self.task = None
+
+        self.requests = 0
+        self.batches = 0
+        self.flushed_full = 0
+        self.flushed_timeout = 0
+        self.histogram = {}
+        self.predict_seconds = 0.0
+
+    def start(self):
+        self.queue = asyncio.Queue()
+        self.task = asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, record):
+        """Queue one input and wait for its result"""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((record, future))
+        return await future
+
+    async def _collect(self):
+        """Wait for the first request, then gather more until the batch is full or the wait is over"""
+        batch = [await self.queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            # Anything already queued joins without waiting
+            while len(batch) < self.max_batch and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            remaining = deadline - time.monotonic()
+            if len(batch) >= self.max_batch or remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            self._record(len(batch))
+            start = time.perf_counter()
+            try:
+                results = await loop.run_in_executor(self.executor, self.predict, [record for record, _ in batch])
+            except Exception as e:
+                results = [{"error": f"Prediction failed: {str(e)}"}] * len(batch)
+            self.predict_seconds += time.perf_counter() - start
+            if len(results) != len(batch):
+                # Never leave a caller waiting on a result that will not come
+                results = [{"error": f"Prediction failed: got {len(results)} results for {len(batch)} inputs"}] * len(batch)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def _record(self, size):
+        self.requests += size
+        self.batches += 1
+        if size >= self.max_batch:
+            self.flushed_full += 1
+        else:
+            self.flushed_timeout += 1
+        # Power-of-two buckets: "1", "2", "4", ... count batches up to that size
+        bucket = 1
+        while bucket < size:
+            bucket *= 2
+        self.histogram[bucket] = self.histogram.get(bucket, 0) + 1
+
+    def stats(self):
+        return {
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+            "requests": self.requests,
+            "batches": self.batches,
+            "mean_batch_size": round(self.requests / self.batches, 2) if self.batches else 0.0,
+            "flushed_full": self.flushed_full,
+            "flushed_timeout": self.flushed_timeout,
+            "batch_size_histogram": {str(bucket): self.histogram[bucket] for bucket in sorted(self.histogram)},
+            "predict_seconds": round(self.predict_seconds, 4),
+            "queued": self.queue.qsize() if self.queue is not None else 0,
+        }
+
+
+def http_response(status, payload, keep_alive):
+    body = json.dumps(payload).encode()
+    headers = [
+        f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+        "Content-Type: application/json",
+        f"Content-Length: {len(body)}",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}",
+    ]
+    return ("\r\n".join(headers) + "\r\n\r\n").encode() + body
+
+
+async def read_request(reader):
+    """
+    Parse one HTTP request; returns (method, path, headers, body) or None when the client is done
+
+    Raises:
+        ValueError: The request line, a header or Content-Length is malformed
+        RequestTooLarge: The body is longer than MAX_BODY_SIZE
+    """
+    request_line = await reader.readline()
+    if not request_line.strip():
+        return None
+    parts = request_line.decode("latin-1").split(" ", 2)
+    if len(parts) != 3:
+        raise ValueError("Malformed request line")
+    method, path, version = parts
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, separator, value = line.decode("latin-1").partition(":")
+        if not separator or not name.strip():
+            raise ValueError("Malformed header")
+        headers[name.strip().lower()] = value.strip()
+
+    length = headers.get("content-length", "0")
+    if not length.isdigit():
+        raise ValueError("Invalid Content-Length")
+    length = int(length)
+    if length > MAX_BODY_SIZE:
+        raise RequestTooLarge("Request body too large")
+    body = await reader.readexactly(length) if length else b""
+    headers[":version"] = version.strip()
+    return method, path.split("?", 1)[0], headers, body
+
+
+async def handle_request(batcher, method, path, body):
+    """Route one request; returns (status, payload)"""
+    # Newly promoted registry versions are loaded and swapped in on a background thread
+    check_for_new_version()
+    if path == "/predict":
+        if method != "POST":
+            return 405, {"error": "Use POST"}
+        try:
+            input_data = json.loads(body)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return 400, {"error": "Invalid JSON input"}
+        result = await batcher.submit(input_data)
+        return (400 if "error" in result else 200), result
+    if path == "/health":
+        return 200, {"status": "ok"}
+    if path == "/stats":
+        return 200, batcher.stats()
+    if path == "/metrics":
+        return 200, METRICS.snapshot()
+    return 404, {"error": "Not found"}
+
+
+async def serve_connection(batcher, reader, writer):
+    try:
+        while True:
+            try:
+                request = await read_request(reader)
+            except RequestTooLarge as e:
+                writer.write(http_response(413, {"error": str(e)}, False))
+                break
+            except ValueError as e:
+                writer.write(http_response(400, {"error": str(e)}, False))
+                break
+            except (asyncio.IncompleteReadError, ConnectionError):
+                break
+            if request is None:
+                break
+
+            method, path, headers, body = request
+            connection = headers.get("connection", "").lower()
+            keep_alive = connection != "close" and (headers[":version"] != "HTTP/1.0" or connection == "keep-alive")
+
+            status, payload = await handle_request(batcher, method, path, body)
+            writer.write(http_response(status, payload, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host, port, max_batch, max_wait_ms):
+    batcher = MicroBatcher(predict_batch, max_batch, max_wait_ms)
+    batcher.start()
+    server = await asyncio.start_server(lambda r, w: serve_connection(batcher, r, w), host, port, backlog=1024)
+    print(f"Serving on http://{host}:{port} (max batch {max_batch}, max wait {max_wait_ms}ms)", file=sys.stderr)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-batching prediction server")
+    parser.add_argument("port", nargs="?", type=int, default=int(os.environ.get("PORT", 5001)))
+    parser.add_argument("--host", default=os.environ.get("HOST", "127.0.0.1"))
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH, help="Flush after this many requests")
+    parser.add_argument("--max-wait-ms", type=float, default=DEFAULT_MAX_WAIT_MS,
+                        help="Flush when the oldest queued request has waited this long")
+    args = parser.parse_args()
+
+    # Load the model before accepting requests so the first batch doesn't pay for it
+    active_models().warm()
+    try:
+        asyncio.run(serve(args.host, args.port, args.max_batch, args.max_wait_ms))
+    except KeyboardInterrupt:
+        pass
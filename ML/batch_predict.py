@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+import sys
+import json
+import argparse
+from itertools import islice
+from serve_model import predict_batch, DEFAULT_CHUNK_SIZE
+
+"""
+Score many inputs at once from newline-delimited JSON (one feature object per line)
+Usage:
+   python batch_predict.py history.ndjson > scores.ndjson
+   cat history.ndjson | python batch_predict.py --chunk-size 5000
+Each output line is the prediction for the input line in the same position.
+If an input object has an "id" field it is copied to its result.
+"""
+
+
+def parse_line(line):
+    """Parse one NDJSON line, returning the error message as a result if it isn't valid JSON"""
+    try:
+        return json.loads(line), None
+    except json.JSONDecodeError as e:
+        return None, {"error": "Invalid JSON input", "details": str(e)}
+
+
+def predict_stream(lines, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield one result dictionary per non-empty input line, in input order
+
+    Args:
+        lines: Iterable of NDJSON lines
+        chunk_size: Number of lines scored together in one model call
+    """
+    lines = (line for line in lines if line.strip())
+    while True:
+        chunk = list(islice(lines, chunk_size))
+        if not chunk:
+            break
+
+        parsed = [parse_line(line) for line in chunk]
+        records = [record for record, error in parsed if error is None]
+        predictions = iter(predict_batch(records, chunk_size=chunk_size))
+
+        for record, error in parsed:
+            if error is not None:
+                yield error
+                continue
+
+            result = next(predictions)
+            if isinstance(record, dict) and "id" in record:
+                result = {"id": record["id"], **result}
+            yield result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch well-being predictions from NDJSON")
+    parser.add_argument("input", nargs="?", default="-", help="NDJSON file to read (default: stdin)")
+    parser.add_argument("--output", "-o", default="-", help="NDJSON file to write (default: stdout)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows per model call")
+    args = parser.parse_args()
+
+    source = sys.stdin if args.input == "-" else open(args.input, "r")
+    target = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        for result in predict_stream(source, chunk_size=args.chunk_size):
+            target.write(json.dumps(result) + "\n")
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if target is not sys.stdout:
+            target.close()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+import os
+import sys
+import json
+import argparse
+import statistics
+import tempfile
+import subprocess
+import numpy as np
+
+"""
+Size, memory, load time and accuracy of each model artifact.
+
+Compares the pickled sklearn pipeline (model + target scaler joblib files) with
+the exact compiled export and the compact one (float32 thresholds, int16 node
+values, shared subtrees), both exported from the same pipeline into a
+temporary directory. For each artifact it records the on-disk size, and
+measures in fresh Python processes the load time and how much RSS the loaded
+model adds (the modules it needs are imported first, so only the artifact is
+counted). Predictions are compared with the original pipeline on the held-out
+20% of the Kaggle data, split exactly as wellbeing_train.py does.
+Usage:
+   python benchmarks/artifacts.py
+   python benchmarks/artifacts.py --runs 10 --output artifacts.json
+"""
+
+ML_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_PATH = os.path.join(ML_DIR, "data", "Wellbeing_and_lifestyle_data_Kaggle.csv")
+sys.path.insert(0, ML_DIR)
+
+from serve_model import FEATURES, model_source
+from compiled_forest import compile_model_files, load_compiled_model
+
+ARTIFACTS = ["joblib", "compiled", "compact"]
+
+TARGET = "WORK_LIFE_BALANCE_SCORE"
+
+# Runs inside the fresh process; prints one JSON line with the load time and the RSS it added
+LOAD_PROBE = """
+import sys, json, time
+sys.path.insert(0, %r)
+from prefork import memory_stats
+kind, paths = sys.argv[1], sys.argv[2:]
+if kind == "joblib":
+    import joblib
+    import sklearn.pipeline, sklearn.compose, sklearn.impute, sklearn.preprocessing, sklearn.ensemble
+else:
+    from compiled_forest import load_compiled_model
+before = memory_stats()["rss_mb"]
+start = time.perf_counter()
+if kind == "joblib":
+    loaded = [joblib.load(path) for path in paths]
+else:
+    loaded = load_compiled_model(paths[0])
+load_seconds = time.perf_counter() - start
+print(json.dumps({"load_seconds": load_seconds, "rss_mb": memory_stats()["rss_mb"] - before}))
+""" % (ML_DIR,)
+
+
+def held_out_split(path=DATA_PATH):
+    """The test split of wellbeing_train.py: rows with a target, test_size=0.2, random_state=42"""
+    import pandas as pd
+    from sklearn.model_selection import train_test_split
+
+    df = pd.read_csv(path)
+    df = df[~df[TARGET].isna()]
+    X_train, X_test, y_train, y_test = train_test_split(df[FEATURES], df[TARGET].to_numpy(dtype=np.float64),
+                                                        test_size=0.2, random_state=42)
+    return X_test, y_test
+
+
+def run_load_probe(kind, paths):
+    output = subprocess.run([sys.executable, "-c", LOAD_PROBE, kind] + list(paths), cwd=ML_DIR,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def error_stats(predictions, reference, target):
+    difference = np.abs(predictions - reference)
+    return {
+        "max_abs_diff": float(difference.max()),
+        "mean_abs_diff": float(difference.mean()),
+        "rmse": float(np.sqrt(np.mean((predictions - target) ** 2))),
+    }
+
+
+def measure_artifacts(model_path, scaler_path, workdir, runs=5, data_path=DATA_PATH):
+    """
+    Export both compiled formats from the pipeline and measure all three artifacts
+
+    Returns:
+        List of result dictionaries, one per artifact
+    """
+    import joblib
+
+    paths = {"joblib": [model_path] + ([scaler_path] if scaler_path and os.path.exists(scaler_path) else [])}
+    for kind in ("compiled", "compact"):
+        paths[kind] = [os.path.join(workdir, f"{kind}.npz")]
+        compile_model_files(model_path, paths["joblib"][1] if len(paths["joblib"]) > 1 else None,
+                            paths[kind][0], compact=kind == "compact")
+
+    X_test, y_test = held_out_split(data_path)
+    pipeline = joblib.load(model_path)
+    reference = pipeline.predict(X_test)
+    if len(paths["joblib"]) > 1:
+        reference = joblib.load(paths["joblib"][1]).inverse_transform(reference.reshape(-1, 1)).flatten()
+    columns = {name: X_test[name].to_numpy(dtype=object) for name in FEATURES}
+
+    results = []
+    for kind in ARTIFACTS:
+        probes = [run_load_probe(kind, paths[kind]) for _ in range(runs)]
+        if kind == "joblib":
+            predictions = reference
+            nodes = sum(estimator.tree_.node_count for estimator in pipeline.steps[-1][1].estimators_)
+        else:
+            compiled = load_compiled_model(paths[kind][0])
+            predictions = compiled.predict(columns)
+            nodes = len(compiled.feature)
+        results.append({
+            "artifact": kind,
+            "size_bytes": sum(os.path.getsize(path) for path in paths[kind]),
+            "nodes": nodes,
+            "load_seconds": statistics.median(probe["load_seconds"] for probe in probes),
+            "rss_mb": statistics.median(probe["rss_mb"] for probe in probes),
+            "test_rows": len(y_test),
+            **error_stats(predictions, reference, y_test),
+        })
+    return results
+
+
+if __name__ == "__main__":
+    served = model_source()
+    parser = argparse.ArgumentParser(description="Compare the size, memory, load time and accuracy of model artifacts")
+    parser.add_argument("--model", default=served["model_path"])
+    parser.add_argument("--scaler", default=served["scaler_path"])
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes per load measurement")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = measure_artifacts(args.model, args.scaler, workdir, args.runs, args.data)
+
+    print(f"{'artifact':<10}{'size':>10}{'nodes':>8}{'load':>10}{'rss':>9}{'max diff':>11}{'mean diff':>11}{'rmse':>9}")
+    for result in results:
+        print(f"{result['artifact']:<10}{result['size_bytes'] / 1024:>8.0f}KB{result['nodes']:>8}"
+              f"{result['load_seconds'] * 1000:>8.1f}ms{result['rss_mb']:>7.1f}MB"
+              f"{result['max_abs_diff']:>11.2e}{result['mean_abs_diff']:>11.2e}{result['rmse']:>9.3f}")
+    print(f"Errors are in raw score on {results[0]['test_rows']} held-out rows; diffs are against the joblib pipeline")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"model_path": args.model, "results": results}, f, indent=2)
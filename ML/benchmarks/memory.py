@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import subprocess
+import urllib.request
+
+"""
+Memory benchmark for multi-worker serving.
+
+Starts N independent `serve_model.py --serve` processes (every one loads its
+own model) and then one `serve_model.py --serve --workers N` pre-fork server,
+sends each worker some predictions and compares per-worker RSS and PSS. PSS
+splits shared pages between the processes using them, so its sum is the real
+memory cost of the deployment.
+Usage:
+   python benchmarks/memory.py --workers 4
+   python benchmarks/memory.py --backend sklearn --output memory.json
+"""
+
+ML_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ML_DIR)
+
+from prefork import memory_stats
+
+SAMPLE_INPUT = {"DAILY_STRESS": 3, "FLOW": 5, "TODO_COMPLETED": 6, "SLEEP_HOURS": 7, "GENDER": "Female", "AGE": 28}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1)
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+def send_predictions(port, count):
+    body = json.dumps(SAMPLE_INPUT).encode()
+    for _ in range(count):
+        request = urllib.request.Request(f"http://127.0.0.1:{port}/predict", data=body,
+                                         headers={"Content-Type": "application/json"})
+        urllib.request.urlopen(request, timeout=10).read()
+
+
+def start_server(port, backend, workers=1):
+    command = [sys.executable, os.path.join(ML_DIR, "serve_model.py"), "--serve", str(port)]
+    if workers > 1:
+        command += ["--workers", str(workers)]
+    env = dict(os.environ, MOOD_PREDICTOR_BACKEND=backend)
+    return subprocess.Popen(command, cwd=ML_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def child_pids(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children", "r") as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+def summarize(label, stats):
+    stats = [s for s in stats if s is not None]
+    return {
+        "setup": label,
+        "processes": len(stats),
+        "rss_mb_per_worker": round(sum(s["rss_mb"] for s in stats) / max(len(stats), 1), 2),
+        "pss_mb_per_worker": round(sum(s["pss_mb"] for s in stats) / max(len(stats), 1), 2),
+        "total_pss_mb": round(sum(s["pss_mb"] for s in stats), 2),
+        "workers": stats,
+    }
+
+
+def measure_independent(backend, workers, requests):
+    """N separate servers, each loading its own model"""
+    ports = [free_port() for _ in range(workers)]
+    servers = [start_server(port, backend) for port in ports]
+    try:
+        for port in ports:
+            wait_until_up(port)
+            send_predictions(port, requests)
+        return summarize("independent", [memory_stats(server.pid) for server in servers])
+    finally:
+        for server in servers:
+            server.terminate()
+            server.wait()
+
+
+def measure_prefork(backend, workers, requests):
+    """One pre-fork server; the parent is counted too since it holds the shared model"""
+    port = free_port()
+    server = start_server(port, backend, workers)
+    try:
+        wait_until_up(port)
+        # Connections are spread over the workers by the kernel
+        send_predictions(port, requests * workers)
+        pids = [server.pid] + child_pids(server.pid)
+        return summarize("prefork", [memory_stats(pid) for pid in pids])
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare memory of independent and pre-forked server workers")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--backend", default="auto", choices=["auto", "compiled", "lookup", "sklearn"])
+    parser.add_argument("--requests", type=int, default=50, help="Predictions sent per worker")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    if memory_stats() is None:
+        print("This benchmark needs /proc/<pid>/smaps_rollup (Linux)")
+        sys.exit(1)
+
+    results = [
+        measure_independent(args.backend, args.workers, args.requests),
+        measure_prefork(args.backend, args.workers, args.requests),
+    ]
+    print(f"{'setup':<13}{'processes':>10}{'rss/worker':>12}{'pss/worker':>12}{'total pss':>12}")
+    for result in results:
+        print(f"{result['setup']:<13}{result['processes']:>10}{result['rss_mb_per_worker']:>10.1f}MB"
+              f"{result['pss_mb_per_worker']:>10.1f}MB{result['total_pss_mb']:>10.1f}MB")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"backend": args.backend, "workers": args.workers, "results": results}, f, indent=2)
@@ -0,0 +1,426 @@
+#!/usr/bin/env python
+import os
+import sys
+import json
+import time
+import shutil
+import signal
+import socket
+import argparse
+import platform
+import tempfile
+import subprocess
+import urllib.error
+import urllib.request
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+"""
+Prediction benchmark suite.
+
+Drives every way the app can get a prediction, with every backend:
+   function  do_mood_prediction called in a fresh Python process
+   cli       godot_predictor.py <file> run once per prediction, as the app's predict button does
+   worker    godot_predictor.py --worker over stdin/stdout
+   batch     batch_predict.py on an NDJSON file
+   server    serve_model.py --serve, with concurrent clients
+   async     async_server.py (micro-batching), with concurrent clients
+Inputs are drawn from the feature distributions in the Kaggle data profile
+(data/Wellbeing_and_lifestyle_data_Kaggle.profile.json), so the lookup table and
+cache see a realistic mix of repeated and distinct inputs.
+
+For each mode and backend it records p50/p95/p99 latency, throughput, peak RSS
+of the process doing the predictions and startup time, and writes them as JSON.
+Two result files can be compared to catch regressions between commits:
+Usage:
+   python benchmarks/predict.py run --output before.json
+   python benchmarks/predict.py run --mode cli --mode server --backend auto --requests 200
+   python benchmarks/predict.py compare before.json after.json --tolerance 0.15
+"""
+
+ML_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_ROOT = os.path.dirname(ML_DIR)
+PROFILE_PATH = os.path.join(ML_DIR, "data", "Wellbeing_and_lifestyle_data_Kaggle.profile.json")
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from startup import BACKENDS, run_probe
+
+RESULTS_VERSION = 1
+
+MODES = ["function", "cli", "worker", "batch", "server", "async"]
+
+# One-shot CLI runs are slow (a whole interpreter each), so they get fewer requests
+CLI_REQUESTS = 20
+
+# Numeric ages drawn for each AGE category of the survey (the app sends the age in years)
+AGE_RANGES = {"Less than 20": (15, 20), "21 to 35": (21, 36), "36 to 50": (36, 51), "51 or more": (51, 71)}
+
+# Runs inside the fresh process for the function mode; prints one JSON line with its timings
+FUNCTION_PROBE = """
+import sys, json, time
+start = time.perf_counter()
+import serve_model
+backend = serve_model.active_backend()
+if backend != "compiled":
+    serve_model.load_model()
+ready = time.perf_counter()
+with open(sys.argv[1]) as f:
+    inputs = json.load(f)
+latencies = []
+results = []
+for input_data in inputs:
+    before = time.perf_counter()
+    results.append(json.loads(serve_model.do_mood_prediction(input_data)))
+    latencies.append(time.perf_counter() - before)
+print(json.dumps({"backend": backend, "startup_seconds": ready - start, "latencies": latencies,
+                  "wall_seconds": time.perf_counter() - ready, "results": results}))
+"""
+
+
+def generate_inputs(count, seed=0, profile_path=PROFILE_PATH):
+    """
+    Survey answers drawn feature by feature from the Kaggle data's value frequencies
+
+    Returns:
+        List of input dictionaries as the app sends them (numbers as floats, AGE in years)
+    """
+    with open(profile_path, "r") as f:
+        columns = json.load(f)["columns"]
+    rng = np.random.RandomState(seed)
+
+    def draw(name, numeric=True):
+        categories = columns[name]["categories"]
+        if numeric:
+            # Drop malformed survey values such as the date in DAILY_STRESS
+            categories = {value: n for value, n in categories.items() if value.replace(".", "", 1).isdigit()}
+        values = list(categories)
+        weights = np.array(list(categories.values()), dtype=np.float64)
+        return [values[i] for i in rng.choice(len(values), size=count, p=weights / weights.sum())]
+
+    samples = {name: [float(value) for value in draw(name)]
+               for name in ("DAILY_STRESS", "FLOW", "TODO_COMPLETED", "SLEEP_HOURS")}
+    samples["GENDER"] = draw("GENDER", numeric=False)
+    samples["AGE"] = [float(rng.randint(*AGE_RANGES[category])) for category in draw("AGE", numeric=False)]
+    return [{name: samples[name][i] for name in samples} for i in range(count)]
+
+
+def summarize_latencies(latencies):
+    latencies = np.asarray(latencies, dtype=np.float64) * 1000
+    if not len(latencies):
+        return None
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {"p50": round(float(p50), 3), "p95": round(float(p95), 3), "p99": round(float(p99), 3),
+            "mean": round(float(latencies.mean()), 3), "max": round(float(latencies.max()), 3)}
+
+
+def count_outcomes(results):
+    """(errors, heuristic fallbacks) among prediction results"""
+    errors = sum(1 for result in results if "error" in result)
+    fallbacks = sum(1 for result in results if "note" in result)
+    return errors, fallbacks
+
+
+def wait_rusage(process):
+    """Wait for a child and return its peak RSS in MB (from the kernel's accounting of that child)"""
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    # Linux reports kilobytes, macOS bytes
+    return round(usage.ru_maxrss / 2 ** 20 if sys.platform == "darwin" else usage.ru_maxrss / 2 ** 10, 2)
+
+
+def child_env(backend):
+    return dict(os.environ, MOOD_PREDICTOR_BACKEND=backend)
+
+
+def result_entry(mode, backend, active_backend, results, latencies, wall_seconds, startup_seconds, peak_rss_mb,
+                 concurrency=1):
+    errors, fallbacks = count_outcomes(results)
+    return {
+        "mode": mode,
+        "backend": backend,
+        "active_backend": active_backend,
+        "requests": len(results),
+        "concurrency": concurrency,
+        "latency_ms": summarize_latencies(latencies),
+        "throughput_per_second": round(len(results) / wall_seconds, 2) if wall_seconds > 0 else None,
+        "startup_seconds": round(startup_seconds, 4) if startup_seconds is not None else None,
+        "peak_rss_mb": peak_rss_mb,
+        "errors": errors,
+        "fallbacks": fallbacks,
+    }
+
+
+def bench_function(backend, inputs, workdir, concurrency):
+    path = os.path.join(workdir, "inputs.json")
+    with open(path, "w") as f:
+        json.dump(inputs, f)
+    process = subprocess.Popen([sys.executable, "-c", FUNCTION_PROBE, path], cwd=ML_DIR, env=child_env(backend),
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    output = process.stdout.read()
+    peak = wait_rusage(process)
+    probe = json.loads(output.strip().splitlines()[-1])
+    return result_entry("function", backend, probe["backend"], probe["results"], probe["latencies"],
+                        probe["wall_seconds"], probe["startup_seconds"], peak)
+
+
+def bench_cli(backend, inputs, workdir, concurrency):
+    """One interpreter per prediction; latency is the whole process, startup comes from startup.py's probe"""
+    inputs = inputs[:CLI_REQUESTS]
+    results, latencies, peaks = [], [], []
+    for i, input_data in enumerate(inputs):
+        path = os.path.join(workdir, f"input_{i}.json")
+        with open(path, "w") as f:
+            json.dump(input_data, f)
+        start = time.perf_counter()
+        process = subprocess.Popen([sys.executable, os.path.join(ML_DIR, "godot_predictor.py"), path], cwd=ML_DIR,
+                                   env=child_env(backend), stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        output = process.stdout.read()
+        peaks.append(wait_rusage(process))
+        latencies.append(time.perf_counter() - start)
+        # Godot reads output[0], so the first line must be the prediction
+        results.append(json.loads(output.splitlines()[0]))
+    probe = run_probe(backend, os.path.join(workdir, "input_0.json"))
+    return result_entry("cli", backend, probe["backend"], results, latencies, sum(latencies),
+                        probe["import_seconds"] + probe["load_seconds"], max(peaks))
+
+
+def bench_worker(backend, inputs, workdir, concurrency):
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, os.path.join(ML_DIR, "godot_predictor.py"), "--worker"], cwd=ML_DIR,
+                               env=child_env(backend), stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                               stderr=subprocess.DEVNULL, text=True, bufsize=1)
+    ready = json.loads(process.stdout.readline())
+    startup = time.perf_counter() - start
+    if ready.get("status") != "ready":
+        raise RuntimeError(f"Worker didn't start: {ready}")
+
+    results, latencies = [], []
+    begin = time.perf_counter()
+    for i, input_data in enumerate(inputs):
+        before = time.perf_counter()
+        process.stdin.write(json.dumps({"id": i, "input": input_data}) + "\n")
+        results.append(json.loads(process.stdout.readline()))
+        latencies.append(time.perf_counter() - before)
+    wall = time.perf_counter() - begin
+    process.stdin.close()
+    peak = wait_rusage(process)
+    return result_entry("worker", backend, None, results, latencies, wall, startup, peak)
+
+
+def bench_batch(backend, inputs, workdir, concurrency):
+    """The whole file is one call, so there is no per-request latency; startup is included in the throughput"""
+    path = os.path.join(workdir, "inputs.ndjson")
+    with open(path, "w") as f:
+        f.writelines(json.dumps(input_data) + "\n" for input_data in inputs)
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, os.path.join(ML_DIR, "batch_predict.py"), path], cwd=ML_DIR,
+                               env=child_env(backend), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    output = process.stdout.read()
+    peak = wait_rusage(process)
+    wall = time.perf_counter() - start
+    results = [json.loads(line) for line in output.splitlines() if line.strip()]
+    return result_entry("batch", backend, None, results, [], wall, None, peak)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(port, process, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server on port {port} exited during startup")
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1)
+            return
+        except OSError:
+            time.sleep(0.02)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+def post_prediction(port, input_data):
+    request = urllib.request.Request(f"http://127.0.0.1:{port}/predict", data=json.dumps(input_data).encode(),
+                                     headers={"Content-Type": "application/json"})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            result = json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        result = json.loads(e.read())
+    return result, time.perf_counter() - start
+
+
+def bench_http(mode, command, backend, inputs, concurrency):
+    port = free_port()
+    start = time.perf_counter()
+    process = subprocess.Popen(command + [str(port)], cwd=ML_DIR, env=child_env(backend),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_up(port, process)
+        startup = time.perf_counter() - start
+        active = None
+        if mode == "server":
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/model", timeout=5) as response:
+                active = json.loads(response.read())["backend"]
+
+        begin = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            answers = list(executor.map(lambda input_data: post_prediction(port, input_data), inputs))
+        wall = time.perf_counter() - begin
+    finally:
+        process.send_signal(signal.SIGINT)
+        peak = wait_rusage(process)
+    return result_entry(mode, backend, active, [result for result, _ in answers],
+                        [latency for _, latency in answers], wall, startup, peak, concurrency)
+
+
+def bench_server(backend, inputs, workdir, concurrency):
+    return bench_http("server", [sys.executable, os.path.join(ML_DIR, "serve_model.py"), "--serve"],
+                      backend, inputs, concurrency)
+
+
+def bench_async(backend, inputs, workdir, concurrency):
+    return bench_http("async", [sys.executable, os.path.join(ML_DIR, "async_server.py")],
+                      backend, inputs, concurrency)
+
+
+BENCHMARKS = {
+    "function": bench_function,
+    "cli": bench_cli,
+    "worker": bench_worker,
+    "batch": bench_batch,
+    "server": bench_server,
+    "async": bench_async,
+}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(modes=MODES, backends=BACKENDS, requests=500, concurrency=8, seed=0, verbose=True):
+    """
+    Run every mode with every backend on the same generated inputs
+
+    Returns:
+        Results dictionary (see RESULTS_VERSION), ready to be written as JSON
+    """
+    inputs = generate_inputs(requests, seed)
+    workdir = tempfile.mkdtemp(prefix="mood_bench_")
+    results = []
+    try:
+        for mode in modes:
+            for backend in backends:
+                entry = BENCHMARKS[mode](backend, inputs, workdir, concurrency)
+                results.append(entry)
+                if verbose:
+                    print(format_entry(entry), file=sys.stderr)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        "version": RESULTS_VERSION,
+        "commit": git_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "config": {"requests": requests, "concurrency": concurrency, "seed": seed,
+                   "cache": os.environ.get("MOOD_CACHE", "memory")},
+        "results": results,
+    }
+
+
+def format_header():
+    return (f"{'mode':<10}{'backend':<10}{'active':<10}{'p50':>9}{'p95':>9}{'p99':>9}{'req/s':>10}"
+            f"{'startup':>10}{'peak rss':>10}  errors/fallbacks")
+
+
+def format_entry(entry):
+    latency = entry["latency_ms"] or {}
+    cell = lambda value, unit="ms", width=9: f"{value:>{width - len(unit)}.1f}{unit}" if value is not None \
+        else f"{'-':>{width}}"
+    startup = entry["startup_seconds"] * 1000 if entry["startup_seconds"] is not None else None
+    return (f"{entry['mode']:<10}{entry['backend']:<10}{entry['active_backend'] or '-':<10}"
+            f"{cell(latency.get('p50'))}{cell(latency.get('p95'))}{cell(latency.get('p99'))}"
+            f"{cell(entry['throughput_per_second'], '', 10)}{cell(startup, 'ms', 10)}"
+            f"{cell(entry['peak_rss_mb'], 'MB', 10)}  {entry['errors']}/{entry['fallbacks']}")
+
+
+def compare(baseline, current, tolerance=0.1):
+    """
+    Compare two result files
+
+    Latencies, startup and peak RSS regress when they grow by more than the tolerance,
+    throughput when it drops by more than the tolerance.
+
+    Returns:
+        (report lines, list of regression descriptions)
+    """
+    checks = [("p50", lambda e: (e["latency_ms"] or {}).get("p50"), 1),
+              ("p95", lambda e: (e["latency_ms"] or {}).get("p95"), 1),
+              ("p99", lambda e: (e["latency_ms"] or {}).get("p99"), 1),
+              ("req/s", lambda e: e["throughput_per_second"], -1),
+              ("startup", lambda e: e["startup_seconds"], 1),
+              ("peak rss", lambda e: e["peak_rss_mb"], 1)]
+    before = {(e["mode"], e["backend"]): e for e in baseline["results"]}
+    lines = [f"{baseline.get('commit') or 'baseline'} -> {current.get('commit') or 'current'}"]
+    regressions = []
+    for entry in current["results"]:
+        key = (entry["mode"], entry["backend"])
+        if key not in before:
+            continue
+        cells = []
+        for name, value, direction in checks:
+            old, new = value(before[key]), value(entry)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            cells.append(f"{name} {change:+.0%}")
+            if change * direction > tolerance:
+                regressions.append(f"{key[0]}/{key[1]} {name}: {old:g} -> {new:g} ({change:+.0%})")
+        lines.append(f"{key[0]:<10}{key[1]:<10}" + "  ".join(cells))
+    return lines, regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark every prediction mode and backend")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="Run the benchmarks")
+    run.add_argument("--mode", action="append", choices=MODES, help="Mode to run (repeatable, default: all)")
+    run.add_argument("--backend", action="append", choices=BACKENDS, help="Backend (repeatable, default: all)")
+    run.add_argument("--requests", type=int, default=500, help=f"Predictions per run (cli uses {CLI_REQUESTS})")
+    run.add_argument("--concurrency", type=int, default=8, help="Concurrent clients for the server modes")
+    run.add_argument("--seed", type=int, default=0, help="Seed for the generated inputs")
+    run.add_argument("--output", help="Write results as JSON to this file")
+    diff = commands.add_parser("compare", help="Compare two result files")
+    diff.add_argument("baseline")
+    diff.add_argument("current")
+    diff.add_argument("--tolerance", type=float, default=0.1, help="Relative change counted as a regression")
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        with open(args.current, "r") as f:
+            current = json.load(f)
+        lines, regressions = compare(baseline, current, args.tolerance)
+        print("\n".join(lines))
+        if regressions:
+            print("Regressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        sys.exit(0)
+
+    print(format_header(), file=sys.stderr)
+    suite = run_suite(args.mode or MODES, args.backend or BACKENDS, args.requests, args.concurrency, args.seed)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(suite, f, indent=2)
+    else:
+        print(json.dumps(suite, indent=2))
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+"""
+Startup benchmark for the one-shot predictor.
+
+Each measurement runs in a fresh Python process so nothing is cached between runs.
+Import time, model-load time and first-prediction time are recorded separately,
+along with the full wall time of `godot_predictor.py <file>` as the app runs it.
+Usage:
+   python benchmarks/startup.py                       # all backends, 5 runs each
+   python benchmarks/startup.py --check               # exit 1 if over the startup budget
+   python benchmarks/startup.py --output startup.json
+"""
+
+ML_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_ROOT = os.path.dirname(ML_DIR)
+SAMPLE_INPUT = os.path.join(PROJECT_ROOT, "temp_input.json")
+
+BACKENDS = ["auto", "compiled", "lookup", "sklearn"]
+
+# Startup budget for the one-shot CLI with the default backend (seconds, median of the runs)
+STARTUP_BUDGET = {
+    "import_seconds": 0.25,
+    "load_seconds": 0.1,
+    "wall_seconds": 0.6,
+}
+
+# Modules the one-shot path should only import when it has to fall back to the pipeline
+HEAVY_MODULES = ["pandas", "sklearn", "flask", "joblib"]
+
+# Runs inside the fresh process; prints one JSON line with its timings
+PROBE = """
+import sys, json, time
+start = time.perf_counter()
+import serve_model
+imported = time.perf_counter()
+backend = serve_model.active_backend()
+if backend == "sklearn":
+    serve_model.load_model()
+loaded = time.perf_counter()
+with open(sys.argv[1]) as f:
+    result = serve_model.predict_record(json.load(f))
+predicted = time.perf_counter()
+print(json.dumps({
+    "backend": backend,
+    "import_seconds": imported - start,
+    "load_seconds": loaded - imported,
+    "predict_seconds": predicted - loaded,
+    "heavy_modules": [name for name in %r if name in sys.modules],
+    "ok": result.get("status") == "success",
+}))
+""" % (HEAVY_MODULES,)
+
+
+def run_probe(backend, input_path):
+    env = dict(os.environ, MOOD_PREDICTOR_BACKEND=backend)
+    output = subprocess.run([sys.executable, "-c", PROBE, input_path], cwd=ML_DIR, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run_cli(backend, input_path):
+    """Wall time of the one-shot script exactly as the app launches it"""
+    env = dict(os.environ, MOOD_PREDICTOR_BACKEND=backend)
+    start = time.perf_counter()
+    subprocess.run([sys.executable, os.path.join(ML_DIR, "godot_predictor.py"), input_path],
+                   cwd=ML_DIR, env=env, capture_output=True, check=True)
+    return time.perf_counter() - start
+
+
+def measure_startup(backend, input_path=SAMPLE_INPUT, runs=5):
+    """
+    Measure startup for one backend
+
+    Returns:
+        Dictionary with median timings over the runs
+    """
+    probes = [run_probe(backend, input_path) for _ in range(runs)]
+    walls = [run_cli(backend, input_path) for _ in range(runs)]
+    result = {"backend": backend, "active_backend": probes[0]["backend"], "runs": runs}
+    for key in ("import_seconds", "load_seconds", "predict_seconds"):
+        result[key] = statistics.median(probe[key] for probe in probes)
+    result["wall_seconds"] = statistics.median(walls)
+    result["heavy_modules"] = probes[0]["heavy_modules"]
+    result["ok"] = all(probe["ok"] for probe in probes)
+    return result
+
+
+def over_budget(result, budget=STARTUP_BUDGET):
+    """List of budget keys this measurement exceeds"""
+    return [key for key, limit in budget.items() if result[key] > limit]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure predictor startup time")
+    parser.add_argument("--backend", action="append", choices=BACKENDS,
+                        help="Backend to measure (repeatable, default: all)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--input", default=SAMPLE_INPUT)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--check", action="store_true",
+                        help="Exit 1 if the default backend is over the startup budget")
+    args = parser.parse_args()
+    if args.check and args.backend and "auto" not in args.backend:
+        parser.error("--check compares the default backend with the budget; add --backend auto")
+
+    results = [measure_startup(backend, args.input, args.runs) for backend in (args.backend or BACKENDS)]
+
+    print(f"{'backend':<10}{'active':<10}{'import':>10}{'load':>10}{'predict':>10}{'wall':>10}  heavy imports")
+    for result in results:
+        print(f"{result['backend']:<10}{result['active_backend']:<10}"
+              f"{result['import_seconds'] * 1000:>8.1f}ms{result['load_seconds'] * 1000:>8.1f}ms"
+              f"{result['predict_seconds'] * 1000:>8.1f}ms{result['wall_seconds'] * 1000:>8.1f}ms"
+              f"  {', '.join(result['heavy_modules']) or '-'}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"budget": STARTUP_BUDGET, "results": results}, f, indent=2)
+
+    if args.check:
+        default = next(result for result in results if result["backend"] == "auto")
+        failures = over_budget(default)
+        if failures:
+            print("Over startup budget: " + ", ".join(failures))
+            sys.exit(1)
@@ -1,17 +1,299 @@
-import pandas as pd
+#!/usr/bin/env python
 import os
+import sys
+import json
+import math
+import argparse
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 
-# Get the path to the CSV file
-file_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ML", "data", "Wellbeing_and_lifestyle_data_Kaggle.csv")
+"""
+Single-pass CSV profiler.
 
-# Read just the first few rows
-df = pd.read_csv(file_path)
+Streams a CSV in chunks and profiles every column in one pass with bounded
+memory: inferred type, null count, min/max/mean, approximate quantiles (from a
+fixed-size uniform sample) and value counts for columns with few distinct
+values. Chunks are parsed in order and profiled on a thread pool. The JSON
+profile it writes can be loaded with load_profile(); validate_record() checks
+one input against it (the prediction server does this for the categorical
+answers) and validate_frame() a whole DataFrame (the training scripts do this
+for every chunk they train on). pandas is only imported for profiling and
+validate_frame, so the prediction CLI can validate without it.
 
-# Print the column names
-print("CSV File Columns:")
-for i, col in enumerate(df.columns):
-    print(f"{i+1}. {col}")
+Usage:
+   python check_csv.py                                   # the Kaggle wellbeing data
+   python check_csv.py data/survey/PHQ-9.csv --output phq9_profile.json
+"""
 
-# Print a sample row to see the data
-print("\nSample Data Row:")
-print(df.iloc[0].to_dict()) 
\ No newline at end of file
+ML_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CSV = os.path.join(ML_DIR, "data", "Wellbeing_and_lifestyle_data_Kaggle.csv")
+# Stored profile of DEFAULT_CSV, the data the model is trained on
+DEFAULT_PROFILE = os.path.join(ML_DIR, "data", "Wellbeing_and_lifestyle_data_Kaggle.profile.json")
+
+PROFILE_VERSION = 1
+
+# Columns with more distinct values than this are not treated as categorical
+MAX_CATEGORIES = 50
+
+# Values kept per column for quantile estimates
+SAMPLE_SIZE = 4096
+
+QUANTILES = [0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99]
+
+
+class ColumnProfile:
+    """Mergeable statistics for one column"""
+
+    def __init__(self):
+        self.count = 0
+        self.nulls = 0
+        self.numeric = 0
+        self.integers = 0
+        self.total = 0.0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+        self.categories = {}
+        # Bottom-k sample: the SAMPLE_SIZE values with the smallest random keys are a uniform sample
+        self.sample_keys = np.empty(0)
+        self.sample_values = np.empty(0)
+
+    def update(self, values, rng):
+        """Profile one chunk of raw string values (None for empty cells)"""
+        import pandas as pd
+
+        missing = values.isna().to_numpy()
+        present = values[~missing]
+        self.count += len(present)
+        self.nulls += int(missing.sum())
+
+        numbers = pd.to_numeric(present, errors="coerce").to_numpy(dtype=np.float64)
+        numbers = numbers[~np.isnan(numbers)]
+        if len(numbers):
+            self.numeric += len(numbers)
+            self.integers += int((numbers == np.floor(numbers)).sum())
+            self.total += float(numbers.sum())
+            self.minimum = min(self.minimum, float(numbers.min()))
+            self.maximum = max(self.maximum, float(numbers.max()))
+            self._add_sample(rng.random_sample(len(numbers)), numbers)
+
+        if self.categories is not None:
+            for value, count in present.value_counts(sort=False).items():
+                self.categories[value] = self.categories.get(value, 0) + int(count)
+            if len(self.categories) > MAX_CATEGORIES:
+                self.categories = None
+        return self
+
+    def _add_sample(self, keys, values):
+        keys = np.concatenate([self.sample_keys, keys])
+        values = np.concatenate([self.sample_values, values])
+        if len(keys) > SAMPLE_SIZE:
+            keep = np.argpartition(keys, SAMPLE_SIZE)[:SAMPLE_SIZE]
+            keys, values = keys[keep], values[keep]
+        self.sample_keys, self.sample_values = keys, values
+
+    def merge(self, other):
+        self.count += other.count
+        self.nulls += other.nulls
+        self.numeric += other.numeric
+        self.integers += other.integers
+        self.total += other.total
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        self._add_sample(other.sample_keys, other.sample_values)
+        if self.categories is not None and other.categories is not None:
+            for value, count in other.categories.items():
+                self.categories[value] = self.categories.get(value, 0) + count
+            if len(self.categories) > MAX_CATEGORIES:
+                self.categories = None
+        else:
+            self.categories = None
+        return self
+
+    def dtype(self):
+        if self.count == 0:
+            return "empty"
+        if self.numeric == self.count:
+            return "integer" if self.integers == self.count else "float"
+        return "string"
+
+    def to_dict(self):
+        result = {"dtype": self.dtype(), "count": self.count, "nulls": self.nulls}
+        if self.numeric:
+            result.update({
+                "numeric_count": self.numeric,
+                "min": self.minimum,
+                "max": self.maximum,
+                "mean": self.total / self.numeric,
+                "quantiles": {str(q): float(v) for q, v in zip(QUANTILES, np.quantile(self.sample_values, QUANTILES))},
+            })
+        if self.categories is not None:
+            result["distinct"] = len(self.categories)
+            result["categories"] = dict(sorted(self.categories.items(), key=lambda item: (-item[1], item[0])))
+        else:
+            result["distinct"] = None  # More than MAX_CATEGORIES
+        return result
+
+
+def profile_chunk(chunk, seed):
+    """Profile one chunk (runs on a worker thread)"""
+    rng = np.random.RandomState(seed)
+    return {column: ColumnProfile().update(chunk[column], rng) for column in chunk.columns}
+
+
+def profile_csv(path, chunk_size=10000, threads=4):
+    """
+    Profile a CSV file in one streaming pass
+
+    Args:
+        path: CSV file
+        chunk_size: Rows parsed at a time
+        threads: Threads profiling chunks; at most 2 * threads chunks are held in memory
+
+    Returns:
+        Profile dictionary (see PROFILE_VERSION)
+    """
+    import pandas as pd
+
+    reader = pd.read_csv(path, dtype=str, keep_default_na=False, na_values=[""], chunksize=chunk_size,
+                         encoding="utf-8-sig")
+    columns = None
+    rows = 0
+    pending = []
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for i, chunk in enumerate(reader):
+            rows += len(chunk)
+            pending.append(executor.submit(profile_chunk, chunk, i))
+            if len(pending) >= 2 * threads:
+                columns = merge_profiles(columns, pending.pop(0).result())
+        for future in pending:
+            columns = merge_profiles(columns, future.result())
+
+    return {
+        "version": PROFILE_VERSION,
+        "file": os.path.basename(path),
+        "rows": rows,
+        "columns": {name: profile.to_dict() for name, profile in (columns or {}).items()},
+    }
+
+
+def merge_profiles(total, chunk):
+    if total is None:
+        return chunk
+    for name, profile in chunk.items():
+        total[name].merge(profile)
+    return total
+
+
+def load_profile(path=DEFAULT_PROFILE):
+    with open(path, "r") as f:
+        profile = json.load(f)
+    if profile.get("version") != PROFILE_VERSION:
+        raise ValueError(f"Unsupported profile version {profile.get('version')}")
+    return profile
+
+
+def validate_record(record, profile, columns=None):
+    """
+    Check one input record against a profile
+
+    Args:
+        record: Dictionary of column name -> value
+        profile: Profile from profile_csv or load_profile
+        columns: Columns to check (default: every column in the record that the profile knows)
+
+    Returns:
+        List of problem descriptions, empty if the record looks like the profiled data
+    """
+    problems = []
+    for name in columns if columns is not None else [name for name in record if name in profile["columns"]]:
+        column = profile["columns"].get(name)
+        if column is None:
+            problems.append(f"{name}: not in the profiled data")
+            continue
+        value = record.get(name)
+        if value is None or (isinstance(value, float) and math.isnan(value)):
+            if column["nulls"] == 0:
+                problems.append(f"{name}: missing, but never missing in the profiled data")
+            continue
+
+        if column["dtype"] in ("integer", "float"):
+            try:
+                number = float(value)
+            except (TypeError, ValueError):
+                problems.append(f"{name}: expected a number, got {value!r}")
+                continue
+            if not column["min"] <= number <= column["max"]:
+                problems.append(f"{name}: {number} outside the profiled range [{column['min']}, {column['max']}]")
+        elif column.get("categories") is not None and str(value) not in column["categories"]:
+            problems.append(f"{name}: unknown value {value!r}")
+    return problems
+
+
+def validate_frame(df, profile, columns=None):
+    """
+    Check every row of a DataFrame against a profile, one column at a time
+
+    Args:
+        df: DataFrame, e.g. one chunk of training data
+        profile: Profile from profile_csv or load_profile
+        columns: Columns to check (default: every column of df that the profile knows)
+
+    Returns:
+        List of problem descriptions with the number of rows affected, empty if the data looks
+        like the profiled data
+    """
+    import pandas as pd
+
+    problems = []
+    for name in columns if columns is not None else [name for name in df.columns if name in profile["columns"]]:
+        column = profile["columns"].get(name)
+        if column is None:
+            problems.append(f"{name}: not in the profiled data")
+            continue
+        values = df[name]
+        missing = values.isna()
+        if missing.any() and column["nulls"] == 0:
+            problems.append(f"{name}: {int(missing.sum())} missing, but never missing in the profiled data")
+        present = values[~missing]
+
+        if column["dtype"] in ("integer", "float"):
+            numbers = pd.to_numeric(present, errors="coerce")
+            if numbers.isna().any():
+                problems.append(f"{name}: {int(numbers.isna().sum())} values are not numbers")
+            outside = int(((numbers < column["min"]) | (numbers > column["max"])).sum())
+            if outside:
+                problems.append(f"{name}: {outside} values outside the profiled range [{column['min']}, {column['max']}]")
+        elif column.get("categories") is not None:
+            unknown = present[~present.astype(str).isin(list(column["categories"]))]
+            if len(unknown):
+                problems.append(f"{name}: {len(unknown)} unknown values, e.g. {unknown.iloc[0]!r}")
+    return problems
+
+
+def print_profile(profile):
+    print(f"{profile['file']}: {profile['rows']} rows")
+    print(f"{'column':<28}{'dtype':<9}{'nulls':>7}{'min':>10}{'median':>10}{'max':>10}{'distinct':>10}")
+    for name, column in profile["columns"].items():
+        median = column.get("quantiles", {}).get("0.5")
+        values = [column.get("min"), median, column.get("max")]
+        values = "".join(f"{v:>10.4g}" if v is not None else f"{'-':>10}" for v in values)
+        distinct = column["distinct"] if column["distinct"] is not None else f">{MAX_CATEGORIES}"
+        print(f"{name[:27]:<28}{column['dtype']:<9}{column['nulls']:>7}{values}{distinct:>10}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Profile CSV files in one streaming pass")
+    parser.add_argument("paths", nargs="*", default=[DEFAULT_CSV])
+    parser.add_argument("--output", help="Write the JSON profile here (one file: the profile, several: a list)")
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    profiles = [profile_csv(path, args.chunk_size, args.threads) for path in args.paths]
+    for profile in profiles:
+        print_profile(profile)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(profiles[0] if len(profiles) == 1 else profiles, f, indent=2)
+        print(f"Wrote profile to {args.output}", file=sys.stderr)
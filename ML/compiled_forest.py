@@ -0,0 +1,478 @@
+#!/usr/bin/env python
+import os
+import sys
+import json
+import struct
+import zipfile
+import argparse
+import numpy as np
+
+"""
+Compiled version of the well-being model for fast inference without sklearn or pandas.
+
+The trained Pipeline (ColumnTransformer with SimpleImputer + StandardScaler and
+SimpleImputer + OneHotEncoder, then a RandomForestRegressor) is flattened into
+contiguous NumPy arrays. Every tree is walked for a whole batch of rows at once,
+and the target scaler is folded into the leaf values so predictions come out in
+the original score range.
+
+Every node keeps the (scaled) mean target of its training rows, internal nodes
+included, so a prediction can also be split into per-feature contributions by
+following each tree's decision path: every split adds the change in node mean
+to the feature it tested (Saabas). One-hot columns add up to the feature they
+came from, and the contributions plus the forest's root mean equal the prediction.
+
+A compact export (--compact) stores the same walk in about a third of the
+space. Thresholds are float32, rounded down so float32 inputs split exactly
+as before. Node values are int16 steps between the forest's lowest and highest
+value. Identical subtrees (mostly leaves with the same value) are stored once.
+
+Usage:
+   python compiled_forest.py export            # writes mood_prediction_model.npz next to the model
+   python compiled_forest.py export --compact  # the same with quantized values and shared subtrees
+   python compiled_forest.py verify            # compares against the sklearn pipeline
+"""
+
+FORMAT_VERSION = 1
+
+# Array names stored in the .npz file next to the JSON header
+ARRAY_NAMES = ["numeric_fill", "numeric_mean", "numeric_scale",
+               "feature", "threshold", "left", "right", "value", "roots"]
+
+
+def _json_value(value):
+    """Convert NumPy scalars (category values, imputer fills) to plain Python values"""
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _pipeline_steps(transformer):
+    """Map step class names to fitted steps for a Pipeline inside the ColumnTransformer"""
+    return {type(step).__name__: step for _, step in getattr(transformer, "steps", [])}
+
+
+def export_compiled_model(pipeline, scaler=None, source=None):
+    """
+    Flatten a fitted preprocessing + forest Pipeline into plain arrays
+
+    Args:
+        pipeline: Fitted Pipeline as saved by training/wellbeing_train.py
+        scaler: Optional fitted target scaler (MinMaxScaler) folded into the leaf values
+        source: Optional dictionary describing the files the model was read from
+
+    Returns:
+        (header, arrays) where header is JSON-serializable and arrays maps names to NumPy arrays
+    """
+    preprocessor = pipeline.steps[0][1]
+    forest = pipeline.steps[-1][1]
+
+    blocks = []
+    numeric_fill, numeric_mean, numeric_scale = [], [], []
+    for name, transformer, columns in preprocessor.transformers_:
+        if name == "remainder":
+            if transformer != "drop":
+                raise ValueError("Only remainder='drop' can be compiled")
+            continue
+
+        steps = _pipeline_steps(transformer)
+        if set(steps) == {"SimpleImputer", "StandardScaler"}:
+            imputer, standard = steps["SimpleImputer"], steps["StandardScaler"]
+            n = len(columns)
+            numeric_fill.extend(np.asarray(imputer.statistics_, dtype=float))
+            numeric_mean.extend(standard.mean_ if standard.with_mean else np.zeros(n))
+            numeric_scale.extend(standard.scale_ if standard.with_std else np.ones(n))
+            blocks.append({"kind": "numeric", "columns": list(columns)})
+        elif set(steps) == {"SimpleImputer", "OneHotEncoder"}:
+            imputer, encoder = steps["SimpleImputer"], steps["OneHotEncoder"]
+            if encoder.drop is not None or encoder.handle_unknown != "ignore":
+                raise ValueError("Only OneHotEncoder(handle_unknown='ignore') without drop can be compiled")
+            blocks.append({
+                "kind": "categorical",
+                "columns": list(columns),
+                "fill": [_json_value(value) for value in imputer.statistics_],
+                "categories": [[_json_value(value) for value in categories] for categories in encoder.categories_],
+            })
+        else:
+            raise ValueError(f"Can't compile transformer '{name}' with steps {sorted(steps)}")
+
+    # Concatenate all trees into one node table; child indices are made absolute
+    feature, threshold, left, right, value, roots = [], [], [], [], [], []
+    offset = 0
+    for estimator in forest.estimators_:
+        tree = estimator.tree_
+        node_ids = np.arange(tree.node_count)
+        is_leaf = tree.children_left == -1
+
+        # Leaves point at themselves so every row can take the same number of steps
+        feature.append(np.where(is_leaf, 0, tree.feature))
+        threshold.append(np.where(is_leaf, np.inf, tree.threshold))
+        left.append(np.where(is_leaf, node_ids, tree.children_left) + offset)
+        right.append(np.where(is_leaf, node_ids, tree.children_right) + offset)
+        value.append(tree.value[:, 0, 0])
+        roots.append(offset)
+        offset += tree.node_count
+
+    value = np.concatenate(value).astype(np.float64)
+    if scaler is not None:
+        # MinMaxScaler.inverse_transform is affine, so it commutes with averaging the trees
+        value = (value - scaler.min_[0]) / scaler.scale_[0]
+
+    header = {
+        "format_version": FORMAT_VERSION,
+        "features": [str(name) for name in getattr(pipeline, "feature_names_in_", [])],
+        "blocks": blocks,
+        "n_columns": len(numeric_fill) + sum(len(categories) for block in blocks
+                                             if block["kind"] == "categorical"
+                                             for categories in block["categories"]),
+        "n_trees": len(forest.estimators_),
+        "max_depth": int(max(estimator.tree_.max_depth for estimator in forest.estimators_)),
+        "target_scaler_folded": scaler is not None,
+        "source": source or {},
+    }
+    arrays = {
+        "numeric_fill": np.asarray(numeric_fill, dtype=np.float64),
+        "numeric_mean": np.asarray(numeric_mean, dtype=np.float64),
+        "numeric_scale": np.asarray(numeric_scale, dtype=np.float64),
+        "feature": np.concatenate(feature).astype(np.int32),
+        "threshold": np.concatenate(threshold).astype(np.float64),
+        "left": np.concatenate(left).astype(np.int32),
+        "right": np.concatenate(right).astype(np.int32),
+        "value": value,
+        "roots": np.asarray(roots, dtype=np.int32),
+    }
+    return header, arrays
+
+
+def smallest_index_dtype(size):
+    """Smallest unsigned integer type that can index size entries (int32 beyond uint16)"""
+    for dtype in (np.uint8, np.uint16):
+        if size <= np.iinfo(dtype).max + 1:
+            return dtype
+    return np.int32
+
+
+def compact_model(header, arrays):
+    """
+    Shrink an exported model: float32 thresholds, int16 node values and shared identical subtrees
+
+    Every value keeps within half a quantization step (header["value_scale"]) of the original,
+    so a prediction moves by at most that much. Splits are unchanged.
+
+    Returns:
+        (header, arrays) in the same layout, loadable with load_compiled_model
+    """
+    value = arrays["value"]
+    low, high = float(value.min()), float(value.max())
+    limit = np.iinfo(np.int16).max
+    value_offset = (low + high) / 2
+    value_scale = (high - low) / (2 * limit) or 1.0
+    quantized = np.clip(np.round((value - value_offset) / value_scale), -limit, limit).astype(np.int16)
+
+    # Largest float32 <= each threshold: for float32 inputs, x <= t exactly when x <= that
+    threshold = arrays["threshold"].astype(np.float32)
+    rounded_up = threshold.astype(np.float64) > arrays["threshold"]
+    threshold[rounded_up] = np.nextafter(threshold[rounded_up], np.float32(-np.inf))
+
+    # Children always come after their parent, so walking backwards sees every subtree before its root
+    feature, left, right = arrays["feature"].tolist(), arrays["left"].tolist(), arrays["right"].tolist()
+    threshold_list, quantized_list = threshold.tolist(), quantized.tolist()
+    canonical = {}
+    ids = [0] * len(feature)
+    nodes = []
+    for node in range(len(feature) - 1, -1, -1):
+        if left[node] == node:
+            key = (quantized_list[node],)
+        else:
+            key = (feature[node], threshold_list[node], quantized_list[node], ids[left[node]], ids[right[node]])
+        if key not in canonical:
+            canonical[key] = len(nodes)
+            nodes.append(node)
+        ids[node] = canonical[key]
+
+    nodes = np.asarray(nodes)
+    ids = np.asarray(ids)
+    is_leaf = arrays["left"][nodes] == nodes
+    own_id = np.arange(len(nodes))
+    index_dtype = smallest_index_dtype(len(nodes))
+
+    compact_header = dict(header, value_offset=value_offset, value_scale=value_scale, compact={
+        "nodes": len(nodes),
+        "original_nodes": len(feature),
+        "value_bits": 16,
+    })
+    compact_arrays = dict(arrays)
+    compact_arrays.update({
+        "feature": arrays["feature"][nodes].astype(smallest_index_dtype(header["n_columns"])),
+        "threshold": threshold[nodes],
+        "left": np.where(is_leaf, own_id, ids[arrays["left"][nodes]]).astype(index_dtype),
+        "right": np.where(is_leaf, own_id, ids[arrays["right"][nodes]]).astype(index_dtype),
+        "value": quantized[nodes],
+        "roots": ids[arrays["roots"]].astype(index_dtype),
+    })
+    return compact_header, compact_arrays
+
+
+def save_compiled_model(path, header, arrays):
+    """Write the arrays and the JSON header to one uncompressed .npz file"""
+    # Replace the file atomically: running servers may have the old one memory-mapped
+    tmp_path = path + ".tmp.npz"
+    np.savez(tmp_path, header=np.array(json.dumps(header)), **arrays)
+    os.replace(tmp_path, path)
+
+
+def mmap_npz(path, names):
+    """
+    Memory-map arrays stored in an uncompressed .npz without reading them
+
+    np.savez stores every array as a plain .npy member of a zip file, so each
+    array's data sits at a fixed offset in the file and can be mapped directly.
+    """
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as f:
+        for name in names:
+            info = archive.getinfo(name + ".npy")
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{name} is compressed in {path} and can't be memory-mapped")
+            # Local file header: 30 fixed bytes, then the file name and extra field
+            f.seek(info.header_offset)
+            local_header = f.read(30)
+            name_length, extra_length = struct.unpack("<HH", local_header[26:30])
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            if dtype.hasobject:
+                raise ValueError(f"{name} in {path} holds Python objects and can't be memory-mapped")
+            values = np.memmap(path, dtype=dtype, mode="r", offset=f.tell(), shape=shape,
+                               order="F" if fortran_order else "C")
+            # A plain ndarray view still reads from the mapped file but indexes much faster than np.memmap
+            arrays[name] = values.view(np.ndarray)
+    return arrays
+
+
+def load_compiled_model(path, mmap=False):
+    """
+    Load a compiled model saved by save_compiled_model
+
+    With mmap=True the arrays are mapped from the file instead of read, so every
+    process serving the same file shares one copy of them in memory.
+    """
+    with np.load(path, allow_pickle=False) as data:
+        header = json.loads(str(data["header"]))
+        arrays = None if mmap else {name: data[name] for name in ARRAY_NAMES}
+    if mmap:
+        arrays = mmap_npz(path, ARRAY_NAMES)
+    return CompiledForest(header, arrays)
+
+
+class CompiledForest:
+    def __init__(self, header, arrays):
+        self.header = header
+        self.blocks = header["blocks"]
+        self.n_columns = header["n_columns"]
+        self.n_trees = header["n_trees"]
+        self.max_depth = header["max_depth"]
+        # Compact exports store node values as integer steps: value = offset + scale * stored
+        self.value_offset = header.get("value_offset", 0.0)
+        self.value_scale = header.get("value_scale", 1.0)
+        for name in ARRAY_NAMES:
+            setattr(self, name, arrays[name])
+
+        # Category -> one-hot column lookups, and the input feature each transformed column came from
+        self._category_index = []
+        self.input_features = []
+        column_feature = []
+        for block in self.blocks:
+            if block["kind"] == "categorical":
+                self._category_index.append([
+                    {category: i for i, category in enumerate(categories)}
+                    for categories in block["categories"]
+                ])
+                for name, categories in zip(block["columns"], block["categories"]):
+                    column_feature.extend([len(self.input_features)] * len(categories))
+                    self.input_features.append(name)
+            else:
+                self._category_index.append(None)
+                for name in block["columns"]:
+                    column_feature.append(len(self.input_features))
+                    self.input_features.append(name)
+        # Indexed by node: the input feature its split tests (leaves never add anything)
+        self._node_input_feature = np.asarray(column_feature,
+                                              dtype=smallest_index_dtype(len(self.input_features)))[self.feature]
+
+    def transform(self, columns):
+        """
+        Apply the pipeline's preprocessing to a batch of inputs
+
+        Args:
+            columns: Dictionary mapping each feature name to a sequence of values (AGE already binned)
+
+        Returns:
+            float32 matrix with one row per input, as the forest sees it
+        """
+        n_rows = len(columns[self.blocks[0]["columns"][0]])
+        X = np.zeros((n_rows, self.n_columns), dtype=np.float64)
+
+        column = 0
+        numeric = 0
+        for block, category_index in zip(self.blocks, self._category_index):
+            for j, name in enumerate(block["columns"]):
+                if block["kind"] == "numeric":
+                    values = np.array(columns[name], dtype=np.float64)
+                    values[np.isnan(values)] = self.numeric_fill[numeric]
+                    X[:, column] = (values - self.numeric_mean[numeric]) / self.numeric_scale[numeric]
+                    numeric += 1
+                    column += 1
+                else:
+                    # Float NaN is imputed; other unknown values (including None) encode as all zeros
+                    fill = block["fill"][j]
+                    lookup = category_index[j]
+                    indices = np.fromiter(
+                        (lookup.get(fill if value != value else value, -1) for value in columns[name]),
+                        dtype=np.int64, count=n_rows
+                    )
+                    known = indices >= 0
+                    X[np.nonzero(known)[0], column + indices[known]] = 1.0
+                    column += len(lookup)
+
+        # The forest compares float32 features against its thresholds, like sklearn does
+        return X.astype(np.float32)
+
+    def leaf_indices(self, X):
+        """Walk every tree for every row; returns a (n_trees, n_rows) array of leaf node ids"""
+        rows = np.arange(X.shape[0])
+        nodes = np.repeat(self.roots[:, None], X.shape[0], axis=1)
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes
+
+    def predict_transformed(self, X):
+        """Predict from an already preprocessed float32 matrix"""
+        total = self.value[self.leaf_indices(X)].sum(axis=0, dtype=np.float64)
+        return self.value_offset + self.value_scale * total / self.n_trees
+
+    def predict(self, columns):
+        """Predict raw well-being scores for a batch of inputs (see transform for the format)"""
+        return self.predict_transformed(self.transform(columns))
+
+    def contributions_transformed(self, X):
+        """
+        Split predictions for an already preprocessed float32 matrix into per-feature contributions
+
+        Returns:
+            (bias, contributions) where bias is the forest's mean root value and contributions is an
+            (n_rows, n_input_features) matrix in input_features order; bias + row sum = prediction
+        """
+        n_rows = X.shape[0]
+        n_features = len(self.input_features)
+        rows = np.arange(n_rows)
+        # Flat (row, feature) bins, so each level of all trees is accumulated with one bincount
+        row_offsets = rows * n_features
+        totals = np.zeros(n_rows * n_features)
+        nodes = np.repeat(self.roots[:, None], n_rows, axis=1)
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            children = np.where(go_left, self.left[nodes], self.right[nodes])
+            # Leaves point at themselves, so rows that already stopped add zero
+            totals += np.bincount((row_offsets + self._node_input_feature[nodes]).ravel(),
+                                  weights=np.subtract(self.value[children], self.value[nodes],
+                                                      dtype=np.float64).ravel(),
+                                  minlength=totals.size)
+            nodes = children
+        bias = self.value_offset + self.value_scale * float(self.value[self.roots].sum(dtype=np.float64)) / self.n_trees
+        return bias, totals.reshape(n_rows, n_features) * (self.value_scale / self.n_trees)
+
+    def contributions(self, columns):
+        """Per-feature contributions to the raw scores of a batch of inputs (see contributions_transformed)"""
+        return self.contributions_transformed(self.transform(columns))
+
+
+def compile_model_files(model_path, scaler_path, output_path, source=None, compact=False):
+    """Load the joblib files, flatten them (and compact them if asked) and write the compiled model"""
+    import joblib
+
+    pipeline = joblib.load(model_path)
+    scaler = joblib.load(scaler_path) if scaler_path else None
+    header, arrays = export_compiled_model(pipeline, scaler, source=source)
+    if compact:
+        header, arrays = compact_model(header, arrays)
+    save_compiled_model(output_path, header, arrays)
+    return header, arrays
+
+
+def verify(model_path, scaler_path, compiled_path, rows=2000, seed=0):
+    """
+    Compare compiled predictions with the sklearn pipeline on random inputs
+
+    Also checks that the per-feature contributions add up to each prediction.
+
+    Returns:
+        Maximum absolute difference in raw score
+    """
+    import joblib
+    from serve_model import parse_record, build_feature_frame, build_feature_columns
+
+    pipeline = joblib.load(model_path)
+    scaler = joblib.load(scaler_path) if scaler_path else None
+    compiled = load_compiled_model(compiled_path)
+
+    rng = np.random.default_rng(seed)
+    ages = [15.0, 25.0, 40.0, 60.0, "21 to 35", "36 to 50", "Less than 20", "51 or more"]
+    records = []
+    for _ in range(rows):
+        record = {
+            "DAILY_STRESS": int(rng.integers(0, 6)),
+            "FLOW": float(rng.integers(0, 11)),
+            "TODO_COMPLETED": float(rng.uniform(0, 10)),
+            "SLEEP_HOURS": float(rng.integers(1, 11)),
+            "GENDER": str(rng.choice(["Male", "Female"])),
+            "AGE": ages[rng.integers(len(ages))],
+        }
+        # Exercise the imputers too
+        for name in list(record):
+            if rng.random() < 0.1:
+                del record[name]
+        records.append(parse_record(record))
+
+    expected = pipeline.predict(build_feature_frame(records))
+    if scaler is not None:
+        expected = scaler.inverse_transform(expected.reshape(-1, 1)).flatten()
+    columns = build_feature_columns(records)
+    actual = compiled.predict(columns)
+    # The contributions have to add back up to the prediction
+    bias, contributions = compiled.contributions(columns)
+    explained = bias + contributions.sum(axis=1)
+    return float(max(np.max(np.abs(expected - actual)), np.max(np.abs(explained - actual))))
+
+
+if __name__ == "__main__":
+    from serve_model import model_source, model_fingerprint
+
+    # Defaults to the model the server answers with (the registry's CURRENT version, if there is one)
+    served = model_source()
+    parser = argparse.ArgumentParser(description="Compile the well-being model to plain NumPy arrays")
+    parser.add_argument("command", choices=["export", "verify"])
+    parser.add_argument("--model", default=served["model_path"])
+    parser.add_argument("--scaler", default=served["scaler_path"])
+    parser.add_argument("--output", default=served["compiled_path"])
+    parser.add_argument("--rows", type=int, default=2000, help="Random inputs used by verify")
+    parser.add_argument("--compact", action="store_true",
+                        help="Export float32 thresholds, int16 values and shared subtrees")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        source = {"model_fingerprint": model_fingerprint(args.model, args.scaler)}
+        header, arrays = compile_model_files(args.model, args.scaler, args.output, source=source,
+                                             compact=args.compact)
+        print(f"Wrote {args.output}: {header['n_trees']} trees, {len(arrays['feature'])} nodes, "
+              f"max depth {header['max_depth']}, {os.path.getsize(args.output) / 1024:.0f}KB")
+    else:
+        max_error = verify(args.model, args.scaler, args.output, rows=args.rows)
+        # A compact export may be off by up to half a quantization step
+        compiled = load_compiled_model(args.output)
+        tolerance = compiled.value_scale if "compact" in compiled.header else 1e-6
+        print(f"Max absolute difference from sklearn: {max_error:.3e}")
+        sys.exit(0 if max_error < tolerance else 1)
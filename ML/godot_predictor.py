@@ -1,7 +1,8 @@
 #!/usr/bin/env python
 import sys
 import json
-from serve_model import do_mood_prediction
+from serve_model import do_mood_prediction, predict_record, load_model, active_backend
+from instrumentation import stage, write_cli_metrics
 
 """
 Simple wrapper script to call the ML model from Godot using OS.execute
@@ -9,19 +10,64 @@ Usage from Godot:
    var output = []
    var exit_code = OS.execute("python", ["path/to/godot_predictor.py", json_file_path], output)
    var prediction_result = JSON.parse_string(output[0])
+
+Worker mode keeps the process (and the loaded model) alive between predictions:
+   var pipe = OS.execute_with_pipe("python", ["path/to/godot_predictor.py", "--worker"])
+   pipe["stdio"].store_line(JSON.stringify({"id": 1, "input": features}))
+   var prediction_result = JSON.parse_string(pipe["stdio"].get_line())
+Each request line is {"id": ..., "input": {...}}; each response line is the
+prediction with the same "id". The worker exits when stdin is closed. Its
+stderr (warnings, tracebacks) has to be read too, or the worker blocks once the
+pipe is full; MoodPredictor.gd uses non-blocking pipes, reads both and gives up
+on the worker after a timeout.
 """
 
+
+def handle_request(line):
+    """Answer one worker request line, always returning a response dictionary"""
+    try:
+        message = json.loads(line)
+    except json.JSONDecodeError as e:
+        return {"id": None, "error": "Invalid JSON input", "details": str(e)}
+
+    if not isinstance(message, dict):
+        return {"id": None, "error": "Request must be a JSON object"}
+
+    request_id = message.get("id")
+    if "input" not in message:
+        return {"id": request_id, "error": "No input data provided"}
+
+    return {"id": request_id, **predict_record(message["input"])}
+
+
+def run_worker(stdin=sys.stdin, stdout=sys.stdout):
+    """Serve JSON-lines requests from stdin until it is closed"""
+    # Load the model before the first request so it doesn't pay for the cold start
+    if active_backend() != "compiled":
+        load_model()
+    stdout.write(json.dumps({"id": None, "status": "ready"}) + "\n")
+    stdout.flush()
+
+    for line in stdin:
+        if not line.strip():
+            continue
+        stdout.write(json.dumps(handle_request(line)) + "\n")
+        stdout.flush()
+
+
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
+    if len(sys.argv) > 1 and sys.argv[1] == "--worker":
+        run_worker()
+    elif len(sys.argv) > 1:
         # Get the JSON input from command line argument
         try:
             input_file_path = sys.argv[1]
-            
+
             # Check if argument is a file path
             if input_file_path.endswith('.json'):
                 # Read from file
                 try:
-                    with open(input_file_path, 'r') as f:
+                    with open(input_file_path, 'r') as f, stage("input_json"):
                         input_data = json.load(f)
                     result = do_mood_prediction(input_data)
                     print(result)  # Print to stdout for Godot to capture
@@ -30,7 +76,8 @@ if __name__ == "__main__":
             else:
                 # Try to parse the argument directly as JSON
                 try:
-                    input_data = json.loads(sys.argv[1])
+                    with stage("input_json"):
+                        input_data = json.loads(sys.argv[1])
                     result = do_mood_prediction(input_data)
                     print(result)  # Print to stdout for Godot to capture
                 except json.JSONDecodeError as e:
@@ -38,4 +85,8 @@ if __name__ == "__main__":
         except Exception as e:
             print(json.dumps({"error": f"Unexpected error: {str(e)}"}))
     else:
-        print(json.dumps({"error": "No input data provided"})) 
\ No newline at end of file
+        print(json.dumps({"error": "No input data provided"}))
+
+    if len(sys.argv) <= 1 or sys.argv[1] != "--worker":
+        # Only with MOOD_METRICS set; the prediction above stays the first line of the output
+        write_cli_metrics()
@@ -0,0 +1,546 @@
+#!/usr/bin/env python
+import os
+import json
+import time
+import bisect
+import argparse
+import threading
+import numpy as np
+
+"""
+Append-only per-user history log for the app's mood, sleep, stress, flow and todo entries.
+
+Entries are appended as JSON lines to the newest segment file; nothing is ever
+rewritten in place. Once a segment reaches SEGMENT_BYTES it is sealed: an index
+sidecar (.npz arrays of every entry's time, offset and length, grouped by user
+and series) is written next to it and a new segment is started. Opening the
+store loads the sidecars and parses only the unsealed segment. In memory every
+(user, series) keeps its entry times sorted, so a time-range read is a binary
+search plus one read per run of adjacent entries. manifest.json lists the live segments in order and is
+replaced atomically, so readers in other processes pick up new segments and
+compactions on their next read.
+
+Compaction seals the current segment and merges all sealed segments into one,
+sorted by user, series and time (so a user's range is contiguous on disk), with
+exact duplicates dropped. Run one writing process at a time.
+
+Usage:
+   python history_store.py import mental_health_data.json --user me
+   python history_store.py append me sleep_data '{"duration": 7.5, "quality": 4}'
+   python history_store.py query me sleep_data --days 7
+   python history_store.py compact
+
+   from history_store import HistoryStore
+   store = HistoryStore(root)
+   sleep = store.recent("me", "sleep_data", days=7)
+"""
+
+STORE_VERSION = 1
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_HISTORY_DIR = os.path.join(PROJECT_ROOT, "history_store")
+
+# Segments are sealed (indexed and no longer appended to) at this size
+SEGMENT_BYTES = 4 * 1024 * 1024
+
+DAY_SECONDS = 24 * 60 * 60
+
+# Lists in the app's mental_health_data.json and the field holding each entry's time
+APP_SERIES = {
+    "mood_scores": "timestamp",
+    "sleep_data": "timestamp",
+    "daily_stress": "timestamp",
+    "activities": "timestamp",
+    "survey_responses": "timestamp",
+    "flow_sessions": "end_time",
+    "todos": "creation_timestamp",
+}
+
+# Completed todos are also logged at their completion time, which is what TODO_COMPLETED counts
+TODO_COMPLETIONS = "todo_completions"
+PROFILE = "user_profile"
+
+EMPTY_INDEX = ([], [], [], [])
+
+
+def encode_entry(user, series, t, data):
+    """One log line; keys are sorted so identical entries encode identically"""
+    return (json.dumps({"user": user, "series": series, "t": t, "data": data},
+                       sort_keys=True, separators=(",", ":")) + "\n").encode()
+
+
+def scan_segment(path, offset=0):
+    """
+    Parse the entries of a segment file from a byte offset
+
+    Returns:
+        (entries, end) with entries as [user, series, t, offset, length] and end the offset after the
+        last complete line; a line still being written (no newline yet) is left for the next scan
+    """
+    with open(path, "rb") as f:
+        f.seek(offset)
+        chunk = f.read()
+    entries = []
+    position = offset
+    for line in chunk.split(b"\n")[:-1]:
+        try:
+            entry = json.loads(line)
+            entries.append([entry["user"], entry["series"], entry["t"], position, len(line) + 1])
+        except (ValueError, KeyError):
+            # A damaged line is skipped rather than hiding the rest of the segment
+            pass
+        position += len(line) + 1
+    return entries, position
+
+
+def group_entries(entries):
+    """Entries as (user, series, times, offsets, lengths) columns per (user, series), in log order"""
+    groups = {}
+    for user, series, t, offset, length in entries:
+        group = groups.get((user, series))
+        if group is None:
+            group = groups[(user, series)] = (user, series, [], [], [])
+        group[2].append(t)
+        group[3].append(offset)
+        group[4].append(length)
+    return list(groups.values())
+
+
+def write_sidecar(path, entries, size):
+    """Index of a sealed segment: times, offsets and lengths grouped by (user, series), as one .npz"""
+    groups = group_entries(entries)
+    bounds = np.cumsum([0] + [len(times) for _, _, times, _, _ in groups]).tolist()
+    header = {"size": size, "groups": [[user, series, start, stop] for (user, series, *_), start, stop
+                                       in zip(groups, bounds[:-1], bounds[1:])]}
+    tmp_path = path + ".tmp.npz"
+    np.savez(tmp_path, header=np.array(json.dumps(header)),
+             times=np.array([t for group in groups for t in group[2]], dtype=np.float64),
+             offsets=np.array([offset for group in groups for offset in group[3]], dtype=np.int64),
+             lengths=np.array([length for group in groups for length in group[4]], dtype=np.int64))
+    os.replace(tmp_path, path)
+
+
+def read_sidecar(path):
+    """(groups, size) from write_sidecar's file, in group_entries' format"""
+    with np.load(path, allow_pickle=False) as data:
+        header = json.loads(str(data["header"]))
+        times, offsets, lengths = data["times"].tolist(), data["offsets"].tolist(), data["lengths"].tolist()
+    groups = [(user, series, times[start:stop], offsets[start:stop], lengths[start:stop])
+              for user, series, start, stop in header["groups"]]
+    return groups, header["size"]
+
+
+def _write_atomic(path, text):
+    with open(path + ".tmp", "w") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+
+
+class HistoryStore:
+    def __init__(self, root=DEFAULT_HISTORY_DIR, segment_bytes=SEGMENT_BYTES):
+        self.root = root
+        self.segment_bytes = segment_bytes
+        self._lock = threading.Lock()
+        self._manifest_stamp = None
+        self._reset()
+
+    def _reset(self):
+        self.segments = []
+        self._index = {}    # (user, series) -> [sorted times, segment positions, offsets, lengths]
+        self._scanned = {}  # segment name -> bytes indexed so far
+        self._files = {}
+        self.next_segment = 1
+
+    def _path(self, name, suffix=".log"):
+        return os.path.join(self.root, name + suffix)
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.root, "manifest.json")
+
+    def _stamp(self):
+        try:
+            stat = os.stat(self.manifest_path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def _add_entries(self, position, entries):
+        for user, series, t, offset, length in entries:
+            columns = self._index.setdefault((user, series), ([], [], [], []))
+            # Equal times keep log order
+            at = bisect.bisect_right(columns[0], t)
+            for column, value in zip(columns, (t, position, offset, length)):
+                column.insert(at, value)
+
+    def _load(self):
+        """(Re)build the in-memory index from the manifest, the index sidecars and the unsealed segment"""
+        for f in self._files.values():
+            f.close()
+        self._reset()
+        self._manifest_stamp = self._stamp()
+        if self._manifest_stamp is None:
+            return
+        with open(self.manifest_path, "r") as f:
+            manifest = json.load(f)
+        if manifest.get("version") != STORE_VERSION:
+            raise ValueError(f"History store in {self.root} has an unknown layout version")
+        self.segments = manifest["segments"]
+        self.next_segment = manifest["next_segment"]
+
+        for position, name in enumerate(self.segments):
+            groups, end = [], 0
+            if os.path.exists(self._path(name, ".idx.npz")):
+                groups, end = read_sidecar(self._path(name, ".idx.npz"))
+            tail, end = scan_segment(self._path(name), end)
+            self._scanned[name] = end
+            for user, series, times, offsets, lengths in groups + group_entries(tail):
+                columns = self._index.setdefault((user, series), ([], [], [], []))
+                columns[0].extend(times)
+                columns[1].extend([position] * len(times))
+                columns[2].extend(offsets)
+                columns[3].extend(lengths)
+
+        # Segments are read in order, so a stable sort by time keeps log order for equal times;
+        # usually entries were logged in time order (or compacted) and nothing has to move
+        for key, columns in self._index.items():
+            times = np.array(columns[0])
+            if (np.diff(times) < 0).any():
+                order = np.argsort(times, kind="stable").tolist()
+                self._index[key] = tuple([column[i] for i in order] for column in columns)
+
+    def _catch_up(self):
+        """Pick up what other processes appended, sealed or compacted since the last call"""
+        if self._stamp() != self._manifest_stamp:
+            self._load()
+        elif self.segments:
+            position = len(self.segments) - 1
+            name = self.segments[position]
+            if os.path.getsize(self._path(name)) > self._scanned[name]:
+                entries, self._scanned[name] = scan_segment(self._path(name), self._scanned[name])
+                self._add_entries(position, entries)
+
+    def _write_manifest(self):
+        _write_atomic(self.manifest_path, json.dumps({
+            "version": STORE_VERSION,
+            "segments": self.segments,
+            "next_segment": self.next_segment,
+        }, indent=2))
+        self._manifest_stamp = self._stamp()
+
+    def _new_segment(self):
+        name = f"{self.next_segment:08d}"
+        self.next_segment += 1
+        open(self._path(name), "ab").close()
+        self._scanned[name] = 0
+        return name
+
+    def _seal(self):
+        """Index the newest segment in a sidecar and start appending to a fresh one"""
+        name = self.segments[-1]
+        entries, end = scan_segment(self._path(name))
+        write_sidecar(self._path(name, ".idx.npz"), entries, end)
+        self.segments.append(self._new_segment())
+        self._write_manifest()
+
+    def extend(self, entries):
+        """
+        Append entries with one write
+
+        Args:
+            entries: Iterable of (user, series, t, data) with t a Unix timestamp and data a JSON-serializable dict
+        """
+        lines = [(str(user), str(series), float(t), encode_entry(str(user), str(series), float(t), data))
+                 for user, series, t, data in entries]
+        if not lines:
+            return
+        with self._lock:
+            self._catch_up()
+            if not self.segments:
+                os.makedirs(self.root, exist_ok=True)
+                self.segments.append(self._new_segment())
+                self._write_manifest()
+
+            name = self.segments[-1]
+            path = self._path(name)
+            with open(path, "ab") as f:
+                # A line cut short by a crash was never indexed; drop it instead of appending onto it
+                if f.tell() > self._scanned[name]:
+                    f.truncate(self._scanned[name])
+                    f.seek(self._scanned[name])
+                offset = self._scanned[name]
+                indexed = []
+                for user, series, t, line in lines:
+                    indexed.append([user, series, t, offset, len(line)])
+                    offset += len(line)
+                f.write(b"".join(line for _, _, _, line in lines))
+            self._scanned[name] = offset
+            self._add_entries(len(self.segments) - 1, indexed)
+
+            if offset >= self.segment_bytes:
+                self._seal()
+
+    def append(self, user, series, t, data):
+        self.extend([(user, series, t, data)])
+
+    def _read(self, columns, lo, hi):
+        """Read the entries at index positions [lo, hi) of one key; adjacent entries in one segment are read together"""
+        _, positions, offsets, lengths = columns
+        records = []
+        start = lo
+        while start < hi:
+            position, offset, length = positions[start], offsets[start], lengths[start]
+            stop = start + 1
+            while stop < hi and positions[stop] == position and offsets[stop] == offset + length:
+                length += lengths[stop]
+                stop += 1
+
+            name = self.segments[position]
+            f = self._files.get(name)
+            if f is None:
+                f = self._files[name] = open(self._path(name), "rb")
+            f.seek(offset)
+            for line in f.read(length).split(b"\n")[:-1]:
+                entry = json.loads(line)
+                records.append((entry["t"], entry["data"]))
+            start = stop
+        return records
+
+    def _select(self, user, series, start, end, last=False):
+        with self._lock:
+            for attempt in range(2):
+                self._catch_up()
+                columns = self._index.get((user, series), EMPTY_INDEX)
+                times = columns[0]
+                lo = 0 if start is None else bisect.bisect_left(times, start)
+                hi = len(times) if end is None else bisect.bisect_left(times, end)
+                if last:
+                    lo = max(lo, hi - 1)
+                try:
+                    return self._read(columns, lo, hi)
+                except FileNotFoundError:
+                    # Compacted by another process since the last check
+                    if attempt:
+                        raise
+                    self._load()
+
+    def query(self, user, series, start=None, end=None):
+        """
+        Read one user's entries of a series within [start, end)
+
+        Args:
+            user: User id
+            series: Series name, e.g. "sleep_data"
+            start, end: Unix timestamps (None = unbounded)
+
+        Returns:
+            List of (t, data) in time order
+        """
+        return self._select(user, series, start, end)
+
+    def recent(self, user, series, days, end=None):
+        """Entries from the `days` days before `end` (default: now)"""
+        end = time.time() if end is None else end
+        return self.query(user, series, start=end - days * DAY_SECONDS, end=end)
+
+    def latest(self, user, series, end=None):
+        """The last (t, data) before `end` (default: ever), or None"""
+        entries = self._select(user, series, None, end, last=True)
+        return entries[0] if entries else None
+
+    def users(self):
+        with self._lock:
+            self._catch_up()
+            return sorted({user for user, _ in self._index})
+
+    def series(self, user):
+        with self._lock:
+            self._catch_up()
+            return sorted(series for key_user, series in self._index if key_user == user)
+
+    def count(self, user, series):
+        with self._lock:
+            self._catch_up()
+            return len(self._index.get((user, series), EMPTY_INDEX)[0])
+
+    def compact(self):
+        """
+        Merge all segments into one sorted by (user, series, time), dropping exact duplicates
+
+        New entries go to a fresh segment afterwards. Returns counts before and after.
+        """
+        with self._lock:
+            self._catch_up()
+            if not self.segments:
+                return {"segments": 0, "entries": 0, "kept": 0}
+            if os.path.getsize(self._path(self.segments[-1])) > 0:
+                self._seal()
+            sealed = self.segments[:-1]
+
+            lines = []
+            seen = set()
+            for name in sealed:
+                with open(self._path(name), "rb") as f:
+                    data = f.read()
+                for line in data.split(b"\n")[:-1]:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    lines.append((entry["user"], entry["series"], entry["t"], len(lines), line, line in seen))
+                    seen.add(line)
+            kept = [item for item in lines if not item[5]]
+            kept.sort(key=lambda item: item[:4])
+
+            name = self._new_segment()
+            with open(self._path(name) + ".tmp", "wb") as f:
+                f.write(b"".join(line + b"\n" for *_, line, _ in kept))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(self._path(name) + ".tmp", self._path(name))
+            entries, end = scan_segment(self._path(name))
+            write_sidecar(self._path(name, ".idx.npz"), entries, end)
+
+            self.segments = [name, self.segments[-1]]
+            self._write_manifest()
+            for old in sealed:
+                for suffix in (".log", ".idx.npz"):
+                    if os.path.exists(self._path(old, suffix)):
+                        os.remove(self._path(old, suffix))
+            self._load()
+            return {"segments": len(sealed), "entries": len(lines), "kept": len(kept)}
+
+    def stats(self):
+        with self._lock:
+            self._catch_up()
+            return {
+                "root": self.root,
+                "segments": len(self.segments),
+                "bytes": sum(os.path.getsize(self._path(name)) for name in self.segments),
+                "users": len({user for user, _ in self._index}),
+                "series": len(self._index),
+                "entries": sum(len(columns[0]) for columns in self._index.values()),
+            }
+
+
+def import_app_data(store, path, user, imported_at=None):
+    """
+    Import the app's mental_health_data.json for one user
+
+    Entries already in the store (same series, time and contents) are skipped, so
+    the same file can be imported again after every save to pick up what's new.
+
+    Returns:
+        Dictionary of series -> number of entries added
+    """
+    with open(path, "r") as f:
+        data = json.load(f)
+
+    pending = []
+    for series, time_field in APP_SERIES.items():
+        for item in data.get(series) or []:
+            if isinstance(item, dict) and isinstance(item.get(time_field), (int, float)):
+                pending.append((series, item[time_field], item))
+                if series == "todos" and item.get("completed") and item.get("completion_timestamp"):
+                    pending.append((TODO_COMPLETIONS, item["completion_timestamp"], {
+                        "title": item.get("title"),
+                        "creation_timestamp": item["creation_timestamp"],
+                    }))
+
+    profile = data.get(PROFILE)
+    latest_profile = store.latest(user, PROFILE)
+    if isinstance(profile, dict) and (latest_profile is None or latest_profile[1] != profile):
+        pending.append((PROFILE, time.time() if imported_at is None else imported_at, profile))
+
+    added = {}
+    new_entries = []
+    for series, t, item in pending:
+        t = float(t)
+        if any(existing == item for _, existing in store.query(user, series, start=t, end=t + 1e-6)):
+            continue
+        new_entries.append((user, series, t, item))
+        added[series] = added.get(series, 0) + 1
+    store.extend(new_entries)
+    return added
+
+
+def history_features(store, user, now=None):
+    """
+    Model inputs from a user's recent history, the way the app computes them
+
+    DAILY_STRESS and SLEEP_HOURS are the latest entries, FLOW the minutes of flow sessions
+    that ended in the last 24 hours and TODO_COMPLETED the todos completed in that time.
+    GENDER (when Female or Male) and AGE come from the latest profile. Inputs without history are left out.
+    """
+    now = time.time() if now is None else now
+    features = {}
+
+    stress = store.latest(user, "daily_stress", end=now)
+    if stress is not None and "score" in stress[1]:
+        features["DAILY_STRESS"] = stress[1]["score"]
+    sleep = store.latest(user, "sleep_data", end=now)
+    if sleep is not None and "duration" in sleep[1]:
+        features["SLEEP_HOURS"] = sleep[1]["duration"]
+
+    if store.count(user, "flow_sessions"):
+        sessions = store.query(user, "flow_sessions", start=now - DAY_SECONDS, end=now)
+        features["FLOW"] = sum(float(session.get("duration_minutes") or 0) for _, session in sessions)
+    if store.count(user, TODO_COMPLETIONS):
+        features["TODO_COMPLETED"] = len(store.query(user, TODO_COMPLETIONS, start=now - DAY_SECONDS, end=now))
+
+    profile = store.latest(user, PROFILE, end=now)
+    if profile is not None:
+        # Like the app, only answers the model was trained on; any other gender is left to the imputer
+        if profile[1].get("gender") in ("Female", "Male"):
+            features["GENDER"] = profile[1]["gender"]
+        if profile[1].get("age"):
+            features["AGE"] = profile[1]["age"]
+    return features
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Append-only per-user history of the app's entries")
+    parser.add_argument("--store", default=os.environ.get("MOOD_HISTORY_DIR", DEFAULT_HISTORY_DIR))
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import", help="Import the app's mental_health_data.json")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--user", required=True)
+
+    append_parser = subparsers.add_parser("append")
+    append_parser.add_argument("user")
+    append_parser.add_argument("series")
+    append_parser.add_argument("data", help="JSON object")
+    append_parser.add_argument("--time", type=float, help="Unix timestamp (default: now)")
+
+    query_parser = subparsers.add_parser("query")
+    query_parser.add_argument("user")
+    query_parser.add_argument("series")
+    query_parser.add_argument("--days", type=float, help="Only the last N days")
+
+    features_parser = subparsers.add_parser("features", help="Model inputs from a user's history")
+    features_parser.add_argument("user")
+
+    subparsers.add_parser("compact")
+    subparsers.add_parser("stats")
+    args = parser.parse_args()
+
+    store = HistoryStore(args.store)
+    if args.command == "import":
+        added = import_app_data(store, args.path, args.user)
+        print(json.dumps({"added": added, "total": sum(added.values())}))
+    elif args.command == "append":
+        store.append(args.user, args.series, time.time() if args.time is None else args.time, json.loads(args.data))
+    elif args.command == "query":
+        entries = (store.query(args.user, args.series) if args.days is None
+                   else store.recent(args.user, args.series, args.days))
+        for t, data in entries:
+            print(json.dumps({"t": t, **data}))
+    elif args.command == "features":
+        print(json.dumps(history_features(store, args.user)))
+    elif args.command == "compact":
+        print(json.dumps(store.compact()))
+    else:
+        print(json.dumps(store.stats()))
@@ -0,0 +1,133 @@
+import os
+import sys
+import json
+import time
+import threading
+from contextlib import nullcontext
+
+"""
+Optional stage timings and fallback counters for the predictor.
+
+Set MOOD_METRICS=1 to time each stage of a prediction (input parsing, model and
+scaler loading, AGE binning, DataFrame building, predict, inverse transform and
+serialization). When it is off, stage() hands back one shared no-op context
+manager, so an instrumented line costs a function call and nothing else.
+Fallbacks to the heuristic score, per-row retries and per-row errors are always
+counted by exception type; they are rare and are the thing to look for when
+users report odd scores.
+
+The server exposes everything at GET /metrics. In CLI mode, the stats are only
+written when MOOD_METRICS is set: as a trailing JSON line after the prediction,
+or appended to MOOD_METRICS_FILE when that is set, so Godot's output[0] stays
+the prediction alone.
+"""
+
+ENABLED = os.environ.get("MOOD_METRICS", "").lower() not in ("", "0", "off", "false")
+METRICS_FILE = os.environ.get("MOOD_METRICS_FILE")
+
+_NOT_TIMED = nullcontext()
+
+
+class _StageTimer:
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class PredictionMetrics:
+    def __init__(self, enabled=ENABLED):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.stages = {}  # name -> [count, total seconds, max seconds]
+            self.fallbacks = {}
+            self.retries = {}
+            self.errors = {}
+            self.started_at = time.time()
+
+    def stage(self, name):
+        """Context manager timing one stage (a shared no-op when metrics are disabled)"""
+        return _StageTimer(self, name) if self.enabled else _NOT_TIMED
+
+    def record(self, name, seconds):
+        with self._lock:
+            entry = self.stages.get(name)
+            if entry is None:
+                self.stages[name] = [1, seconds, seconds]
+            else:
+                entry[0] += 1
+                entry[1] += seconds
+                if seconds > entry[2]:
+                    entry[2] = seconds
+
+    def _count(self, counts, error):
+        name = type(error).__name__
+        with self._lock:
+            counts[name] = counts.get(name, 0) + 1
+
+    def fallback(self, error):
+        """A row was answered by the heuristic fallback because the model raised error"""
+        self._count(self.fallbacks, error)
+
+    def retry(self, error):
+        """A whole chunk failed with error and its rows were retried one at a time"""
+        self._count(self.retries, error)
+
+    def error(self, error):
+        """A row got an error response"""
+        self._count(self.errors, error)
+
+    def snapshot(self):
+        with self._lock:
+            stages = {
+                name: {
+                    "count": count,
+                    "total_ms": round(total * 1000, 4),
+                    "mean_ms": round(total * 1000 / count, 4),
+                    "max_ms": round(maximum * 1000, 4),
+                }
+                for name, (count, total, maximum) in self.stages.items()
+            }
+            return {
+                "enabled": self.enabled,
+                "pid": os.getpid(),
+                "since": self.started_at,
+                "stages": stages,
+                "fallbacks": dict(self.fallbacks),
+                "fallback_total": sum(self.fallbacks.values()),
+                "retries": dict(self.retries),
+                "errors": dict(self.errors),
+            }
+
+
+METRICS = PredictionMetrics()
+stage = METRICS.stage
+
+
+def write_cli_metrics(stdout=None):
+    """
+    After a one-shot CLI prediction: write the stats as one JSON line, if MOOD_METRICS is set
+
+    The line goes to MOOD_METRICS_FILE when that is set (appended), otherwise to stdout after the prediction.
+    """
+    if not METRICS.enabled:
+        return
+    line = json.dumps({"metrics": METRICS.snapshot()})
+    if METRICS_FILE:
+        with open(METRICS_FILE, "a") as f:
+            f.write(line + "\n")
+    else:
+        print(line, file=stdout or sys.stdout)
@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+import os
+import sys
+import glob
+import json
+import hashlib
+import argparse
+import numpy as np
+
+"""
+Precomputed predictions for every combination of the discrete survey answers.
+
+All inputs the app sends come from small bounded domains, so the whole grid
+(about 58k combinations) is scored once with the trained pipeline and stored as
+a flat array. The categorical axes hold the categories the model was trained on,
+as serve_model.build_feature_columns encodes them (stress "0" to "5" and the
+survey's four age groups), so no two grid points are the same model input. Any
+in-grid request is then answered with one index computation; off-grid or
+missing values fall back to the model.
+
+The scores are saved as <path>.<checksum>.npy and the JSON header naming that
+file is written last, so a reader always maps the array its header describes.
+The header records the fingerprint of the model files the table was built from
+and the table is ignored once they change.
+
+Usage:
+   python lookup_table.py build
+   python lookup_table.py check
+"""
+
+# Grid axes in index order: (feature, allowed values); categorical axes use the model's categories
+GRID_AXES = [
+    ("DAILY_STRESS", ["0", "1", "2", "3", "4", "5"]),
+    ("FLOW", list(range(0, 11))),
+    ("TODO_COMPLETED", list(range(0, 11))),
+    ("SLEEP_HOURS", list(range(1, 11))),
+    ("GENDER", ["Female", "Male"]),
+    ("AGE", ["Less than 20", "21 to 35", "36 to 50", "51 or more"]),
+]
+
+
+def grid_shape(axes=GRID_AXES):
+    return tuple(len(values) for _, values in axes)
+
+
+def grid_columns(axes=GRID_AXES):
+    """Every grid combination as feature columns, in flat index order"""
+    mesh = np.meshgrid(*[np.arange(len(values)) for _, values in axes], indexing="ij")
+    columns = {}
+    for (name, values), positions in zip(axes, mesh):
+        positions = positions.ravel()
+        if isinstance(values[0], str):
+            columns[name] = np.array(values, dtype=object)[positions]
+        else:
+            columns[name] = np.array(values, dtype=np.float64)[positions]
+    return columns
+
+
+class LookupTable:
+    def __init__(self, header, scores):
+        self.header = header
+        self.axes = [(axis["name"], axis["values"]) for axis in header["axes"]]
+        self.shape = grid_shape(self.axes)
+        self.scores = scores
+
+        # Numeric axes are contiguous integer ranges; categorical axes use a dictionary
+        self._axis_lookup = []
+        for _, values in self.axes:
+            if isinstance(values[0], str):
+                self._axis_lookup.append({value: i for i, value in enumerate(values)})
+            else:
+                self._axis_lookup.append((values[0], len(values)))
+
+    def lookup(self, columns):
+        """
+        Look up raw scores for a batch of inputs
+
+        Args:
+            columns: Dictionary mapping each feature name to a sequence of values (AGE already binned)
+
+        Returns:
+            (scores, hit) where hit marks rows found in the grid; scores are NaN elsewhere
+        """
+        n_rows = len(columns[self.axes[0][0]])
+        hit = np.ones(n_rows, dtype=bool)
+        positions = []
+        for (name, _), axis in zip(self.axes, self._axis_lookup):
+            if isinstance(axis, dict):
+                position = np.fromiter(
+                    (axis.get(value, -1) if isinstance(value, str) else -1 for value in columns[name]),
+                    dtype=np.int64, count=n_rows
+                )
+            else:
+                start, size = axis
+                values = np.array(columns[name], dtype=np.float64)
+                with np.errstate(invalid="ignore"):
+                    position = values - start
+                    on_grid = (position == np.floor(position)) & (position >= 0) & (position < size)
+                position = np.where(on_grid, position, -1).astype(np.int64)
+            hit &= position >= 0
+            positions.append(np.where(position >= 0, position, 0))
+
+        flat = np.ravel_multi_index(positions, self.shape)
+        scores = np.where(hit, self.scores[flat], np.nan)
+        return scores, hit
+
+
+def table_base(path):
+    """The table is stored as <base>.json (header) plus <base>.<checksum>.npy (memory-mapped scores)"""
+    return path[:-4] if path.endswith((".npy", ".json")) else path
+
+
+def build_lookup_table(predict_columns, path, fingerprint, axes=GRID_AXES):
+    """
+    Score every grid combination and write the table
+
+    Args:
+        predict_columns: Function taking feature columns and returning raw scores
+        path: Output path (without extension)
+        fingerprint: Fingerprint of the model files the scores come from
+    """
+    scores = np.asarray(predict_columns(grid_columns(axes)), dtype=np.float64)
+    if scores.shape != (int(np.prod(grid_shape(axes))),):
+        raise ValueError("Model returned the wrong number of scores for the grid")
+
+    base = table_base(path)
+    checksum = hashlib.sha256(scores.tobytes()).hexdigest()[:16]
+    array_path = f"{base}.{checksum}.npy"
+    header = {
+        "axes": [{"name": name, "values": values} for name, values in axes],
+        "model_fingerprint": fingerprint,
+        "size": int(scores.size),
+        "array": os.path.basename(array_path),
+        "checksum": checksum,
+    }
+    # The array file is never changed once written; swapping the header in last switches readers over
+    np.save(array_path + ".tmp.npy", scores)
+    os.replace(array_path + ".tmp.npy", array_path)
+    with open(base + ".json.tmp", "w") as f:
+        json.dump(header, f, indent=2)
+    os.replace(base + ".json.tmp", base + ".json")
+
+    # Arrays of earlier builds; a reader still holding their header just falls back to the model
+    for stale in glob.glob(glob.escape(base) + ".*.npy") + [base + ".npy"]:
+        if os.path.basename(stale) != header["array"] and os.path.exists(stale):
+            os.remove(stale)
+    header["path"] = array_path
+    return header
+
+
+def load_lookup_table(path, fingerprint=None):
+    """
+    Memory-map a lookup table
+
+    Returns:
+        LookupTable, or None if it doesn't exist or was built from different model files
+    """
+    base = table_base(path)
+    try:
+        with open(base + ".json", "r") as f:
+            header = json.load(f)
+    except FileNotFoundError:
+        return None
+    if fingerprint is not None and header.get("model_fingerprint") != fingerprint:
+        return None
+    if "array" not in header:
+        return None
+
+    try:
+        scores = np.load(os.path.join(os.path.dirname(base), header["array"]), mmap_mode="r")
+    except FileNotFoundError:
+        # Replaced by a newer build after the header was read
+        return None
+    if scores.shape != (header["size"],):
+        return None
+    # A plain ndarray view still reads from the mapped file but indexes much faster than np.memmap
+    return LookupTable(header, scores.view(np.ndarray))
+
+
+if __name__ == "__main__":
+    import serve_model
+
+    parser = argparse.ArgumentParser(description="Precompute predictions for the discrete input grid")
+    parser.add_argument("command", choices=["build", "check"])
+    parser.add_argument("--output", default=serve_model.active_models().source["lookup_path"])
+    args = parser.parse_args()
+
+    fingerprint = serve_model.active_models().fingerprint()
+    if args.command == "build":
+        header = build_lookup_table(serve_model.pipeline_raw_scores_from_columns, args.output, fingerprint)
+        print(f"Wrote {header['size']} predictions to {header['path']}")
+    else:
+        table = load_lookup_table(args.output, fingerprint)
+        if table is None:
+            print("Lookup table is missing or out of date; run 'python lookup_table.py build'")
+            sys.exit(1)
+        print(f"Lookup table is up to date ({table.header['size']} predictions)")
@@ -0,0 +1,326 @@
+#!/usr/bin/env python
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+
+"""
+Local registry of trained models.
+
+Every registered model gets its own version directory holding the pipeline, the
+scaler, and metadata.json: the feature list, training metrics, parameters and a
+content hash of the model files. Each model name has a CURRENT file naming the
+version in use. It is replaced atomically, so readers always see a complete
+version, and every promotion is logged to history.jsonl, which rollback replays.
+
+Layout:
+   model_registry/<name>/versions/<version>/model.joblib
+                                            scaler.joblib
+                                            model.npz       (compiled forest, when it can be compiled)
+                                            metadata.json
+                                            ...             (extra files, e.g. sensor_mood's feature_state.json)
+   model_registry/<name>/CURRENT
+   model_registry/<name>/history.jsonl
+
+The prediction server watches CURRENT and swaps to a newly promoted version
+without restarting (see serve_model.py). Promoting the served model first checks
+the version on the server's canary inputs, so CURRENT never names a version a
+server would reject; --force skips the check.
+Usage:
+   python model_registry.py list
+   python model_registry.py promote 20250406-142512-3f2a9c1d
+   python model_registry.py promote 20250406-142512-3f2a9c1d --force
+   python model_registry.py rollback
+"""
+
+ML_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(ML_DIR)
+
+DEFAULT_REGISTRY_DIR = os.environ.get("MOOD_MODEL_REGISTRY", os.path.join(PROJECT_ROOT, "model_registry"))
+
+# The model the prediction server answers with
+DEFAULT_MODEL_NAME = "wellbeing"
+
+MODEL_FILE = "model.joblib"
+SCALER_FILE = "scaler.joblib"
+COMPILED_FILE = "model.npz"
+LOOKUP_FILE = "lookup"
+METADATA_FILE = "metadata.json"
+
+
+def files_fingerprint(paths):
+    """SHA-256 of the concatenated files (missing or None paths are skipped), shortened to 16 hex digits"""
+    digest = hashlib.sha256()
+    for path in paths:
+        if path and os.path.exists(path):
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def _write_atomic(path, text):
+    with open(path + ".tmp", "w") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+
+
+class ModelRegistry:
+    def __init__(self, root=DEFAULT_REGISTRY_DIR):
+        self.root = root
+
+    def model_dir(self, name):
+        return os.path.join(self.root, name)
+
+    def version_dir(self, name, version):
+        return os.path.join(self.root, name, "versions", version)
+
+    def pointer_path(self, name):
+        return os.path.join(self.root, name, "CURRENT")
+
+    def register(self, name, model, scaler=None, features=None, metrics=None, params=None, source=None,
+                 promote=False, compile=True, validate=False, extra_files=None):
+        """
+        Store a trained model as a new version
+
+        Args:
+            name: Model name (one registry can hold several models)
+            model: Fitted pipeline or estimator
+            scaler: Fitted scaler saved next to it (None if there is none)
+            features: Input feature names, in order
+            metrics: Dictionary of evaluation results
+            params: Training parameters worth keeping
+            source: Where the model came from (script, data file)
+            promote: Make the new version CURRENT
+            compile: Also write the compiled forest next to the pipeline when it can be compiled
+            validate: Only promote if the version passes the canary check (see promote)
+            extra_files: Other files stored with the version, as file name -> function writing it to a path
+
+        Returns:
+            The version id; registering identical model files again returns the existing version
+        """
+        import joblib
+
+        versions = os.path.join(self.model_dir(name), "versions")
+        os.makedirs(versions, exist_ok=True)
+        staging = os.path.join(versions, f".staging-{os.getpid()}-{time.time_ns()}")
+        os.makedirs(staging)
+        try:
+            model_path = os.path.join(staging, MODEL_FILE)
+            scaler_path = os.path.join(staging, SCALER_FILE) if scaler is not None else None
+            joblib.dump(model, model_path)
+            if scaler is not None:
+                joblib.dump(scaler, scaler_path)
+            fingerprint = files_fingerprint([model_path, scaler_path])
+
+            for existing in self.versions(name):
+                if existing["hash"] == fingerprint:
+                    shutil.rmtree(staging)
+                    if promote:
+                        self.promote(name, existing["version"], validate=validate)
+                    return existing["version"]
+
+            version = f"{time.strftime('%Y%m%d-%H%M%S')}-{fingerprint[:8]}"
+            compiled = False
+            if compile:
+                try:
+                    from compiled_forest import export_compiled_model, save_compiled_model
+                    header, arrays = export_compiled_model(model, scaler, source={"model_fingerprint": fingerprint})
+                    save_compiled_model(os.path.join(staging, COMPILED_FILE), header, arrays)
+                    compiled = True
+                except (ValueError, TypeError, AttributeError, KeyError):
+                    # Not a pipeline compiled_forest understands; the server runs it with sklearn
+                    pass
+            for file_name, write in (extra_files or {}).items():
+                write(os.path.join(staging, file_name))
+
+            metadata = {
+                "name": name,
+                "version": version,
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "hash": fingerprint,
+                "model_type": type(model).__name__,
+                "features": list(features) if features is not None else None,
+                "metrics": metrics or {},
+                "params": params or {},
+                "source": source or {},
+                "files": {
+                    "model": MODEL_FILE,
+                    "scaler": SCALER_FILE if scaler is not None else None,
+                    "compiled": COMPILED_FILE if compiled else None,
+                    "extra": sorted(extra_files or {}),
+                },
+            }
+            with open(os.path.join(staging, METADATA_FILE), "w") as f:
+                json.dump(metadata, f, indent=2, default=float)
+            # The version appears all at once
+            os.rename(staging, self.version_dir(name, version))
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        if promote:
+            self.promote(name, version, validate=validate)
+        return version
+
+    def metadata(self, name, version):
+        try:
+            with open(os.path.join(self.version_dir(name, version), METADATA_FILE), "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise KeyError(f"Model '{name}' has no version '{version}'") from None
+
+    def versions(self, name):
+        """Metadata of every version of a model, oldest first"""
+        versions = os.path.join(self.model_dir(name), "versions")
+        if not os.path.isdir(versions):
+            return []
+        return [self.metadata(name, version) for version in sorted(os.listdir(versions))
+                if not version.startswith(".")]
+
+    def names(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, name, "versions")))
+
+    def current(self, name):
+        """The CURRENT version of a model, or None if none was promoted"""
+        try:
+            with open(self.pointer_path(name), "r") as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def paths(self, name, version):
+        """Files of one version, for loading: model, scaler, compiled and lookup paths plus the content hash"""
+        metadata = self.metadata(name, version)
+        directory = self.version_dir(name, version)
+        files = metadata["files"]
+        return {
+            "version": version,
+            "model_path": os.path.join(directory, files["model"]),
+            "scaler_path": os.path.join(directory, files["scaler"]) if files.get("scaler") else None,
+            "compiled_path": os.path.join(directory, files.get("compiled") or COMPILED_FILE),
+            "lookup_path": os.path.join(directory, LOOKUP_FILE),
+            "fingerprint": metadata["hash"],
+        }
+
+    def history(self, name):
+        try:
+            with open(os.path.join(self.model_dir(name), "history.jsonl"), "r") as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def _log(self, name, entry):
+        with open(os.path.join(self.model_dir(name), "history.jsonl"), "a") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    def _set_current(self, name, version):
+        if not os.path.isdir(self.version_dir(name, version)):
+            raise KeyError(f"Model '{name}' has no version '{version}'")
+        _write_atomic(self.pointer_path(name), version + "\n")
+
+    def promote(self, name, version, validate=False):
+        """
+        Make a version CURRENT
+
+        Args:
+            validate: First check the version on the prediction server's canary inputs against the
+                version servers answer with now (see serve_model.validate_promotion)
+
+        Raises:
+            ValueError: The version failed the canary check; CURRENT is left unchanged
+        """
+        previous = self.current(name)
+        if validate and version != previous:
+            from serve_model import validate_promotion
+
+            canary = validate_promotion(self, name, version)
+            if not canary["passed"]:
+                self._log(name, {"action": "reject", "version": version, "previous": previous,
+                                 "reason": canary["reason"], "at": time.time()})
+                raise ValueError(f"Version {version} failed the canary check: {canary['reason']}")
+        self._set_current(name, version)
+        self._log(name, {"action": "promote", "version": version, "previous": previous, "at": time.time()})
+        return version
+
+    def promotion_stack(self, name):
+        """Versions in promotion order with rolled-back ones removed; the last one is CURRENT"""
+        stack = []
+        for entry in self.history(name):
+            if entry["action"] == "promote":
+                stack.append(entry["version"])
+            elif entry["action"] == "rollback" and stack:
+                stack.pop()
+        return stack
+
+    def rollback(self, name):
+        """
+        Go back to the version that was CURRENT before the last promotion
+
+        Repeated rollbacks keep walking back through the promotions.
+        """
+        stack = self.promotion_stack(name)
+        if len(stack) < 2:
+            raise ValueError(f"Model '{name}' has no earlier version to roll back to")
+        version = stack[-2]
+        self._set_current(name, version)
+        self._log(name, {"action": "rollback", "version": version, "previous": stack[-1], "at": time.time()})
+        return version
+
+
+def format_versions(registry, name):
+    current = registry.current(name)
+    lines = [f"{name}:"]
+    for metadata in registry.versions(name):
+        metrics = ", ".join(f"{key} {value:.4g}" if isinstance(value, (int, float)) else f"{key} {value}"
+                            for key, value in metadata["metrics"].items())
+        marker = "*" if metadata["version"] == current else " "
+        lines.append(f" {marker} {metadata['version']}  {metadata['model_type']:<22} {metrics}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage registered model versions")
+    parser.add_argument("command", choices=["list", "show", "promote", "rollback", "current"])
+    parser.add_argument("version", nargs="?", help="Version for show/promote (show defaults to CURRENT)")
+    parser.add_argument("--name", default=DEFAULT_MODEL_NAME)
+    parser.add_argument("--registry", default=DEFAULT_REGISTRY_DIR)
+    parser.add_argument("--force", action="store_true", help="Promote without the canary check")
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.registry)
+    if args.command == "list":
+        for name in registry.names() or [args.name]:
+            print(format_versions(registry, name))
+    elif args.command == "show":
+        version = args.version or registry.current(args.name)
+        if version is None:
+            print(f"Model '{args.name}' has no CURRENT version")
+            sys.exit(1)
+        print(json.dumps(registry.metadata(args.name, version), indent=2))
+    elif args.command == "current":
+        print(registry.current(args.name) or "")
+    elif args.command == "promote":
+        if not args.version:
+            parser.error("promote needs a version")
+        try:
+            # The canary inputs are survey answers, so only the served model can be checked on them
+            registry.promote(args.name, args.version, validate=not args.force and args.name == DEFAULT_MODEL_NAME)
+        except ValueError as e:
+            print(e)
+            sys.exit(1)
+        print(f"{args.name}: CURRENT is now {args.version}")
+    else:
+        try:
+            version = registry.rollback(args.name)
+        except ValueError as e:
+            print(e)
+            sys.exit(1)
+        print(f"{args.name}: rolled back to {version}")
@@ -0,0 +1,202 @@
+import os
+import json
+import math
+import time
+import atexit
+import threading
+from collections import OrderedDict
+
+"""
+Result cache for raw model scores.
+
+Keys are the canonical model input (floats rounded, AGE already binned, missing
+features written out as None) together with the fingerprint of the model and
+scaler files, so retraining the model makes every old entry unreachable; such
+entries are no longer used and are evicted first. PredictionCache lives in
+memory; DiskPredictionCache keeps entries in a SQLite file so repeated CLI
+invocations, including ones still serving an older model version, can share them.
+"""
+
+# Inputs that differ by less than this many decimals share a cache entry
+ROUND_DIGITS = 6
+
+
+def canonical_key(values, fingerprint, round_digits=ROUND_DIGITS):
+    """
+    Build the cache key for one row of model inputs
+
+    Args:
+        values: Feature values in model order (AGE already binned, None for missing)
+        fingerprint: Fingerprint of the model files the score comes from
+    """
+    canonical = []
+    for value in values:
+        if isinstance(value, float):
+            value = "nan" if math.isnan(value) else round(value, round_digits) + 0.0
+        canonical.append(value)
+    return json.dumps([fingerprint, canonical], separators=(",", ":"))
+
+
+class PredictionCache:
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached score for key, or None"""
+        with self._lock:
+            score = self._entries.get(key)
+            if score is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return score
+
+    def put(self, key, score):
+        with self._lock:
+            self._entries[key] = float(score)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "type": "memory",
+            "size": len(self),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class DiskPredictionCache(PredictionCache):
+    """LRU cache stored in a SQLite file, shared by every process using the same path"""
+
+    # Hits only record their access time in memory; this many are written back in one transaction
+    TOUCH_BATCH = 256
+
+    def __init__(self, path, max_size=100000, fingerprint=None):
+        import sqlite3
+
+        super().__init__(max_size)
+        self.path = path
+        self._db = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS predictions "
+                "(key TEXT PRIMARY KEY, fingerprint TEXT, score REAL, last_used REAL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS predictions_last_used ON predictions (last_used)")
+            # Entry count kept up to date by triggers, so neither put nor len has to scan the table
+            self._db.execute("CREATE TABLE IF NOT EXISTS predictions_size (entries INTEGER)")
+            self._db.execute(
+                "INSERT INTO predictions_size SELECT (SELECT COUNT(*) FROM predictions) "
+                "WHERE NOT EXISTS (SELECT 1 FROM predictions_size)"
+            )
+            self._db.execute(
+                "CREATE TRIGGER IF NOT EXISTS predictions_inserted AFTER INSERT ON predictions "
+                "BEGIN UPDATE predictions_size SET entries = entries + 1; END"
+            )
+            self._db.execute(
+                "CREATE TRIGGER IF NOT EXISTS predictions_deleted AFTER DELETE ON predictions "
+                "BEGIN UPDATE predictions_size SET entries = entries - 1; END"
+            )
+        self.fingerprint = fingerprint
+        self._touched = {}
+        atexit.register(self.flush)
+
+    def get(self, key):
+        with self._lock:
+            row = self._db.execute("SELECT score FROM predictions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._touched[key] = time.time()
+            if len(self._touched) >= self.TOUCH_BATCH:
+                with self._db:
+                    self._write_touches()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, score):
+        with self._lock, self._db:
+            self._write_touches()
+            inserted = self._db.execute(
+                "INSERT OR IGNORE INTO predictions (key, fingerprint, score, last_used) VALUES (?, ?, ?, ?)",
+                (key, self.fingerprint, float(score), time.time())
+            ).rowcount
+            if not inserted:
+                self._db.execute(
+                    "UPDATE predictions SET fingerprint = ?, score = ?, last_used = ? WHERE key = ?",
+                    (self.fingerprint, float(score), time.time(), key)
+                )
+                return
+            # Only an insert can push the cache over its limit
+            excess = len(self) - self.max_size
+            if excess > 0:
+                self._db.execute(
+                    "DELETE FROM predictions WHERE key IN "
+                    "(SELECT key FROM predictions ORDER BY last_used LIMIT ?)", (excess,)
+                )
+                self.evictions += excess
+
+    def flush(self):
+        """Write back pending access times now"""
+        with self._lock, self._db:
+            self._write_touches()
+
+    def _write_touches(self):
+        """Write back the access times of recent hits (caller holds the lock and a transaction)"""
+        if self._touched:
+            self._db.executemany("UPDATE predictions SET last_used = ? WHERE key = ?",
+                                 [(last_used, key) for key, last_used in self._touched.items()])
+            self._touched.clear()
+
+    def clear(self):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM predictions")
+            self._touched.clear()
+
+    def __len__(self):
+        return self._db.execute("SELECT entries FROM predictions_size").fetchone()[0]
+
+    def stats(self):
+        stats = super().stats()
+        stats.update({"type": "disk", "path": self.path})
+        return stats
+
+
+def create_cache(kind, max_size, path=None, fingerprint=None):
+    """
+    Create the cache configured for this process
+
+    Args:
+        kind: "memory", "disk" or "off"
+        max_size: Maximum number of entries before the least recently used are evicted
+        path: SQLite file for the disk cache
+        fingerprint: Current model fingerprint; disk entries for other models are dropped
+    """
+    if kind == "off":
+        return None
+    if kind == "disk":
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        return DiskPredictionCache(path, max_size=max_size, fingerprint=fingerprint)
+    if kind == "memory":
+        return PredictionCache(max_size=max_size)
+    raise ValueError(f"Unknown cache type '{kind}'")
@@ -0,0 +1,149 @@
+import os
+import gc
+import sys
+import time
+import signal
+import socket
+
+"""
+Pre-fork server for the prediction app.
+
+The parent process builds the app (which loads the model), then forks the
+workers. Every worker accepts connections on the same listening socket and
+serves them with werkzeug, so the model's memory is shared between all workers
+instead of being loaded once per worker. The compiled model and the lookup
+table are memory-mapped from their files, so those pages stay shared for the
+life of the workers. The sklearn pipeline is shared copy-on-write; gc.freeze()
+keeps the garbage collector from writing to the objects loaded before the fork.
+Usage:
+   python serve_model.py --serve 5000 --workers 4
+"""
+
+# Seconds to wait for workers to exit on shutdown before killing them
+SHUTDOWN_TIMEOUT = 5
+
+
+def memory_stats(pid=None):
+    """
+    Memory of one process in MB: rss, pss (rss with shared pages split between their users),
+    shared and private; None where /proc isn't available
+    """
+    pid = pid or os.getpid()
+    fields = {"Rss": "rss_mb", "Pss": "pss_mb", "Shared_Clean": "shared_mb", "Shared_Dirty": "shared_mb",
+              "Private_Clean": "private_mb", "Private_Dirty": "private_mb"}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+            lines = f.readlines()
+    except OSError:
+        return None
+
+    stats = {"pid": pid, "rss_mb": 0.0, "pss_mb": 0.0, "shared_mb": 0.0, "private_mb": 0.0}
+    for line in lines:
+        parts = line.split()
+        key = parts[0].rstrip(":")
+        if key in fields:
+            stats[fields[key]] += int(parts[1]) / 1024
+    return {key: round(value, 2) if isinstance(value, float) else value for key, value in stats.items()}
+
+
+def format_memory(label, stats):
+    if stats is None:
+        return f"{label:<16}memory stats unavailable"
+    return (f"{label:<16}pid {stats['pid']:>7}  rss {stats['rss_mb']:>7.1f}MB  pss {stats['pss_mb']:>7.1f}MB"
+            f"  shared {stats['shared_mb']:>7.1f}MB  private {stats['private_mb']:>7.1f}MB")
+
+
+def listen(host, port, backlog=128):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app, host, port, sock):
+    """Serve requests from the shared socket until terminated (runs in the forked child)"""
+    from werkzeug.serving import make_server
+
+    signal.signal(signal.SIGTERM, lambda *_: os._exit(0))
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    server = make_server(host, port, app, threaded=True, fd=sock.fileno())
+    server.serve_forever()
+
+
+def serve_prefork(create_app, host, port, workers):
+    """
+    Load the app once and serve it from `workers` forked processes
+
+    Falls back to a single process where fork isn't available.
+    """
+    if not hasattr(os, "fork"):
+        print("Pre-fork workers need os.fork; serving from one process", file=sys.stderr)
+        create_app().run(host=host, port=port, threaded=True)
+        return
+
+    before = memory_stats()
+    app = create_app()
+    loaded = memory_stats()
+    print(format_memory("before load", before), file=sys.stderr)
+    print(format_memory("after load", loaded), file=sys.stderr)
+
+    sock = listen(host, port)
+    # Objects that exist now are never collected, so the collector won't dirty their shared pages
+    gc.collect()
+    gc.freeze()
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            try:
+                run_worker(app, host, port, sock)
+            finally:
+                os._exit(1)
+        return pid
+
+    children = {spawn() for _ in range(workers)}
+    print(f"Serving on http://{host}:{port} with {workers} workers", file=sys.stderr)
+
+    stopping = []
+
+    def stop(signum, frame):
+        stopping.append(signum)
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    time.sleep(1)
+    for pid in sorted(children):
+        print(format_memory("worker", memory_stats(pid)), file=sys.stderr)
+
+    # Replace workers that die until asked to stop
+    deadline = None
+    while children:
+        try:
+            pid, _ = os.waitpid(-1, os.WNOHANG if stopping else 0)
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        if pid == 0:
+            deadline = deadline or time.monotonic() + SHUTDOWN_TIMEOUT
+            if time.monotonic() > deadline:
+                for child in children:
+                    try:
+                        os.kill(child, signal.SIGKILL)
+                    except ProcessLookupError:
+                        pass
+            time.sleep(0.05)
+            continue
+        children.discard(pid)
+        if not stopping:
+            print(f"Worker {pid} exited; starting a new one", file=sys.stderr)
+            children.add(spawn())
+    sock.close()
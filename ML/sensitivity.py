@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+import sys
+import json
+import math
+import threading
+import numpy as np
+from collections import OrderedDict
+from prediction_cache import canonical_key
+from instrumentation import stage
+from serve_model import (FEATURES, CATEGORICAL_INPUTS, active_models, parse_record, build_feature_columns,
+                         encode_stress, backend_raw_scores, normalize_scores)
+
+"""
+What-if response curves and surfaces for one user's baseline.
+
+Sweeps one or two of the survey answers over their whole range while the rest
+stay at the user's values, and scores every combination in one batched model
+call (a single pass of the compiled forest when it is active). A 2-D sleep x
+stress surface is 60 rows in one predict instead of 60 separate predictions.
+Results are cached per (baseline, model version); answers for the swept
+features don't affect the result, so they aren't part of the key.
+Usage:
+   python sensitivity.py '{"baseline": {"DAILY_STRESS": 3, "FLOW": 5, "TODO_COMPLETED": 6, "SLEEP_HOURS": 7,
+                           "GENDER": "Female", "AGE": 28}, "features": ["SLEEP_HOURS", "DAILY_STRESS"]}'
+Served at POST /sensitivity by serve_model.py --serve with the same JSON body.
+"""
+
+# Values swept for each feature the user can change (the ranges the app's survey allows);
+# categorical features can only be swept over these values
+SWEEP_VALUES = {
+    "DAILY_STRESS": list(range(0, 6)),
+    "FLOW": list(range(0, 11)),
+    "TODO_COMPLETED": list(range(0, 11)),
+    "SLEEP_HOURS": list(range(1, 11)),
+}
+
+# Largest number of grid points one request may ask for
+MAX_GRID_SIZE = 10000
+
+# Surfaces kept in memory per process
+CACHE_SIZE = 256
+
+
+class SurfaceCache:
+    """Bounded LRU of computed surfaces"""
+
+    def __init__(self, max_size=CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            surface = self._entries.get(key)
+            if surface is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return surface
+
+    def put(self, key, surface):
+        with self._lock:
+            self._entries[key] = surface
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._entries), "max_size": self.max_size, "hits": self.hits, "misses": self.misses}
+
+
+_cache = SurfaceCache()
+
+
+def sweep_axes(features, values=None):
+    """
+    Validate the requested features and pick the values to sweep for each
+
+    Raises ValueError for unknown or repeated features, values that aren't lists of numbers,
+    categorical values the model wasn't trained on and grids that are too large.
+    """
+    if isinstance(features, str):
+        features = [features]
+    if not 1 <= len(features) <= 2 or len(set(features)) != len(features):
+        raise ValueError("Sweep one or two different features")
+    if values is None:
+        values = {}
+    if not isinstance(values, dict):
+        raise ValueError("values must be an object mapping features to lists of numbers")
+    axes = []
+    for name in features:
+        if name not in SWEEP_VALUES:
+            raise ValueError(f"Can't sweep '{name}'; choose from {', '.join(SWEEP_VALUES)}")
+        axis = values.get(name, SWEEP_VALUES[name])
+        if (not isinstance(axis, list) or not axis
+                or not all(isinstance(value, (int, float)) and not isinstance(value, bool)
+                           and math.isfinite(value) for value in axis)):
+            raise ValueError(f"values for '{name}' must be a non-empty list of numbers")
+        if name in CATEGORICAL_INPUTS and not all(value in SWEEP_VALUES[name] for value in axis):
+            # Any other value would be an unknown category and silently predict like a missing answer
+            raise ValueError(f"values for '{name}' must be whole numbers from {min(SWEEP_VALUES[name])} "
+                             f"to {max(SWEEP_VALUES[name])}")
+        axes.append((name, [float(value) for value in axis]))
+    if int(np.prod([len(axis) for _, axis in axes])) > MAX_GRID_SIZE:
+        raise ValueError(f"At most {MAX_GRID_SIZE} grid points per request")
+    return axes
+
+
+def sensitivity(baseline, features, values=None, models=None, cache=_cache):
+    """
+    Predicted well-being over a grid of what-if values for one or two features
+
+    Args:
+        baseline: The user's input dictionary (same format as for a prediction)
+        features: One feature name or a list of two, from SWEEP_VALUES
+        values: Optional dictionary of feature -> values to sweep instead of the full range
+        models: ModelSet to use (default: the active one)
+        cache: SurfaceCache, or None to always compute
+
+    Returns:
+        Dictionary with the swept features and their values, predictions (0-5) and raw_scores
+        shaped one axis per feature, the baseline prediction and the model version
+    """
+    models = models or active_models()
+    axes = sweep_axes(features, values)
+    record = parse_record(baseline)
+    base_columns = build_feature_columns([record])
+
+    key = None
+    if cache is not None:
+        swept = {name for name, _ in axes}
+        try:
+            key = canonical_key([None if name in swept else base_columns[name][0] for name in FEATURES],
+                                models.fingerprint()) + json.dumps(axes)
+        except TypeError:
+            key = None
+        cached = cache.get(key) if key is not None else None
+        if cached is not None:
+            return dict(cached, cached=True)
+
+    with stage("sensitivity"):
+        mesh = np.meshgrid(*[np.array(axis) for _, axis in axes], indexing="ij")
+        size = mesh[0].size
+        # The baseline row repeated once per grid point, with the swept features replaced, plus the baseline itself
+        columns = {name: np.repeat(column, size + 1) for name, column in base_columns.items()}
+        for (name, _), grid in zip(axes, mesh):
+            columns[name][:size] = grid.ravel().astype(object)
+        # Swept stress values need the same categories as the user's own answer
+        columns["DAILY_STRESS"] = encode_stress(columns["DAILY_STRESS"])
+        scores = np.asarray(backend_raw_scores(columns, models), dtype=np.float64)
+
+    shape = mesh[0].shape
+    surface = {
+        "features": [name for name, _ in axes],
+        "values": [axis for _, axis in axes],
+        "predictions": np.round(normalize_scores(scores[:size]), 2).reshape(shape).tolist(),
+        "raw_scores": np.round(scores[:size], 2).reshape(shape).tolist(),
+        "baseline": {"prediction": round(float(normalize_scores(scores[size:])[0]), 2),
+                     "raw_score": round(float(scores[size]), 2)},
+        "model_version": models.version,
+        "model_fingerprint": models.fingerprint(),
+        "cached": False,
+    }
+    if key is not None:
+        cache.put(key, surface)
+    return surface
+
+
+def cache_stats():
+    return _cache.stats()
+
+
+if __name__ == "__main__":
+    try:
+        request = json.loads(sys.argv[1]) if len(sys.argv) > 1 else None
+    except json.JSONDecodeError:
+        request = None
+    if not isinstance(request, dict) or "baseline" not in request or "features" not in request:
+        print(json.dumps({"error": "Pass a JSON object with baseline and features"}))
+        sys.exit(0)
+    try:
+        print(json.dumps(sensitivity(request["baseline"], request["features"], request.get("values"))))
+    except (ValueError, TypeError) as e:
+        print(json.dumps({"error": str(e)}))
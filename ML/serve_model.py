@@ -1,156 +1,1020 @@
-from flask import Flask, request, jsonify
-import joblib
 import os
 import numpy as np
 import sys
 import json
-import pandas as pd
+import time
+import threading
+from prediction_cache import canonical_key, create_cache
+from instrumentation import METRICS, stage, write_cli_metrics
+from model_registry import ModelRegistry, DEFAULT_REGISTRY_DIR, DEFAULT_MODEL_NAME, files_fingerprint
+from history_store import DEFAULT_HISTORY_DIR
+from check_csv import DEFAULT_PROFILE, load_profile, validate_record
+# Flask, joblib and pandas are imported where they are used so the one-shot CLI
+# only pays for them when it can't use the compiled model
 # Code based on https://github.com/DanielRJohnson/hackku-example-ml-project/blob/main/backend/serve_model.py
 
-def do_mood_prediction(input_data=None):
-    try:
-        # If input_data is provided as argument, use it
-        # Otherwise, check for JSON from command line
-        if input_data is None:
-            # Check if data is passed as command line argument
-            if len(sys.argv) > 1:
+# Get project root (parent of ML folder)
+ML_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(ML_DIR)
+
+# Set paths to model files
+MODEL_PATH = os.path.join(PROJECT_ROOT, "mood_prediction_model.joblib")
+SCALER_PATH = os.path.join(PROJECT_ROOT, "target_scaler.joblib")
+COMPILED_MODEL_PATH = os.path.join(PROJECT_ROOT, "mood_prediction_model.npz")
+LOOKUP_TABLE_PATH = os.path.join(PROJECT_ROOT, "mood_prediction_lookup")
+
+# "sklearn" runs the joblib pipeline, "compiled" runs the NumPy export from compiled_forest.py,
+# "lookup" answers in-grid inputs from the table built by lookup_table.py (and uses the pipeline otherwise),
+# "auto" uses the compiled model when its export is up to date and the pipeline otherwise
+PREDICTOR_BACKEND = os.environ.get("MOOD_PREDICTOR_BACKEND", "auto")
+
+# Features the model is trained on, in the order the pipeline expects them
+FEATURES = ["DAILY_STRESS", "FLOW", "TODO_COMPLETED", "SLEEP_HOURS", "GENDER", "AGE"]
+NUMERIC_INPUTS = ["DAILY_STRESS", "FLOW", "TODO_COMPLETED", "SLEEP_HOURS"]
+
+# Categorical answers are checked against the profile of the training data (check_csv.py), encoded
+# and binned the way the model sees them; MOOD_INPUT_PROFILE=off turns the check off
+CATEGORICAL_INPUTS = ["DAILY_STRESS", "GENDER", "AGE"]
+INPUT_PROFILE_PATH = os.environ.get("MOOD_INPUT_PROFILE", DEFAULT_PROFILE)
+
+# Numeric ages are binned into the survey's age groups the model was trained on (upper bounds are exclusive)
+AGE_BIN_EDGES = [21, 36, 51]
+AGE_LABELS = ["Less than 20", "21 to 35", "36 to 50", "51 or more"]
+
+# Assuming dataset range of 200-800 when normalizing to the 0-5 scale
+MIN_SCORE = 200
+MAX_SCORE = 800
+
+# Rows per model.predict call in batch mode
+DEFAULT_CHUNK_SIZE = 1024
+
+# Add per-feature contributions and advice to every response; one request can also ask with "explain": true
+EXPLAIN = os.environ.get("MOOD_EXPLAIN", "").lower() not in ("", "0", "off", "false")
+
+# Advice for the answer the user can change that lowers their predicted score the most
+ADVICE = {
+    "DAILY_STRESS": "Your stress level is pulling your predicted well-being down the most.",
+    "SLEEP_HOURS": "Your sleep is pulling your predicted well-being down the most.",
+    "FLOW": "Your time spent in flow is pulling your predicted well-being down the most.",
+    "TODO_COMPLETED": "The number of todos you complete is pulling your predicted well-being down the most.",
+}
+ADVICE_ALL_POSITIVE = "Your stress, sleep, flow and completed todos are all helping your predicted well-being."
+
+# Raw-score cache: "memory" (per process), "disk" (shared SQLite file) or "off"
+CACHE_TYPE = os.environ.get("MOOD_CACHE", "memory")
+CACHE_SIZE = int(os.environ.get("MOOD_CACHE_SIZE", 1024))
+CACHE_PATH = os.environ.get("MOOD_CACHE_PATH", os.path.join(PROJECT_ROOT, "prediction_cache.sqlite3"))
+
+# Per-user history log (history_store.py); inputs with a "user_id" get missing features from it
+HISTORY_DIR = os.environ.get("MOOD_HISTORY_DIR", DEFAULT_HISTORY_DIR)
+
+# Registry model the server answers with (MOOD_MODEL_REGISTRY moves the registry);
+# without a CURRENT version the files above are used
+REGISTRY_DIR = DEFAULT_REGISTRY_DIR
+REGISTRY_MODEL_NAME = os.environ.get("MOOD_MODEL_NAME", DEFAULT_MODEL_NAME)
+
+# Seconds between checks of the registry's CURRENT pointer in server mode
+REGISTRY_POLL_SECONDS = float(os.environ.get("MOOD_REGISTRY_POLL", 2))
+
+# A new version is rejected if its canary predictions move by more than this on average (0-5 scale)
+CANARY_MAX_DRIFT = float(os.environ.get("MOOD_CANARY_MAX_DRIFT", 1.0))
+CANARY_SIZE = 64
+
+# The model version answering predictions; replaced as a whole when a new version is swapped in
+_active = None
+_cache = None
+_history = None
+_input_profile = None
+_load_lock = threading.Lock()
+_swap_lock = threading.Lock()
+
+# Progress of the latest background swap, reported at GET /model
+_reload = {"state": "idle", "version": None, "error": None, "canary": None}
+_registry_checked_at = 0.0
+
+# Fingerprints are only recomputed when a file's size or modification time changes
+_fingerprints = {}
+
+
+def model_fingerprint(model_path=MODEL_PATH, scaler_path=SCALER_PATH):
+    """Hash of the model and scaler files, used to tell whether derived artifacts are stale"""
+    stamp = tuple(
+        (path, os.stat(path).st_size, os.stat(path).st_mtime_ns) if path and os.path.exists(path) else (path,)
+        for path in (model_path, scaler_path)
+    )
+    if stamp not in _fingerprints:
+        with stage("fingerprint"):
+            _fingerprints[stamp] = files_fingerprint([model_path, scaler_path])
+    return _fingerprints[stamp]
+
+
+def model_source(version=None):
+    """
+    Files of the model to serve
+
+    Args:
+        version: Registry version (default: the registry's CURRENT version)
+
+    Returns:
+        Dictionary with version (None for the files in the project root), model_path, scaler_path,
+        compiled_path, lookup_path and fingerprint (None when it has to be computed from the files)
+    """
+    registry = ModelRegistry(REGISTRY_DIR)
+    version = version or registry.current(REGISTRY_MODEL_NAME)
+    if version is not None:
+        return registry.paths(REGISTRY_MODEL_NAME, version)
+    return root_source()
+
+
+def root_source():
+    """The model files in the project root, served while the registry has no CURRENT version"""
+    return {
+        "version": None,
+        "model_path": MODEL_PATH,
+        "scaler_path": SCALER_PATH,
+        "compiled_path": COMPILED_MODEL_PATH,
+        "lookup_path": LOOKUP_TABLE_PATH,
+        "fingerprint": None,
+    }
+
+
+class ModelLoadError(RuntimeError):
+    """A model version's files are missing or can't be read, so none of its predictions can be made"""
+
+
+class ModelSet:
+    """
+    One model version: the pipeline and scaler plus the compiled model and lookup table built from them
+
+    Everything is loaded on first use. A request takes one ModelSet and uses it throughout,
+    so swapping in a new version never mixes two versions inside one request.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.version = source["version"]
+        self.compiled_load_seconds = None
+        self._model = None
+        self._compiled = None
+        self._lookup = None
+        self._explainer = None
+        self._lock = threading.Lock()
+
+    def fingerprint(self):
+        return self.source["fingerprint"] or model_fingerprint(self.source["model_path"], self.source["scaler_path"])
+
+    def model(self):
+        """
+        Load the prediction pipeline and target scaler, reusing them after the first call
+
+        Returns:
+            Dictionary with the model, the scaler (None if there is none) and load details
+        """
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    import joblib
+
+                    start = time.perf_counter()
+                    try:
+                        with stage("model_load"):
+                            model = joblib.load(self.source["model_path"])
+
+                        # The scaler is optional, but one that exists and can't be read is an error:
+                        # predicting without it would return scores on the wrong scale
+                        scaler_path = self.source["scaler_path"]
+                        with stage("scaler_load"):
+                            scaler = joblib.load(scaler_path) if scaler_path and os.path.exists(scaler_path) else None
+                    except Exception as e:
+                        raise ModelLoadError(f"Model could not be loaded: {e}") from e
+
+                    self._model = {
+                        "model": model,
+                        "scaler": scaler,
+                        "model_path": self.source["model_path"],
+                        "scaler_path": scaler_path if scaler is not None else None,
+                        "loaded_at": time.time(),
+                        "load_seconds": time.perf_counter() - start,
+                    }
+        return self._model
+
+    def compiled(self):
+        """
+        Load the compiled model once, if it exists and was exported from this version's model files
+
+        Returns:
+            CompiledForest, or None if the sklearn pipeline has to be used instead
+        """
+        if self._compiled is None:
+            with self._lock:
+                if self._compiled is None:
+                    start = time.perf_counter()
+                    compiled = None
+                    if os.path.exists(self.source["compiled_path"]):
+                        from compiled_forest import load_compiled_model
+                        # Memory-mapped, so forked or separate server processes share one copy of the arrays
+                        try:
+                            with stage("compiled_load"):
+                                compiled = load_compiled_model(self.source["compiled_path"], mmap=True)
+                        except Exception as e:
+                            raise ModelLoadError(f"Compiled model could not be loaded: {e}") from e
+                        # A compiled model from an older training run must not be used
+                        source = compiled.header.get("source", {})
+                        if source.get("model_fingerprint") != self.fingerprint():
+                            compiled = None
+                    self.compiled_load_seconds = time.perf_counter() - start
+                    self._compiled = {"compiled": compiled}
+        return self._compiled["compiled"]
+
+    def lookup(self):
+        """
+        Memory-map the lookup table once, if it was built from this version's model files
+
+        Returns:
+            LookupTable, or None if every prediction has to go through the model
+        """
+        if self._lookup is None:
+            with self._lock:
+                if self._lookup is None:
+                    from lookup_table import load_lookup_table
+                    try:
+                        table = load_lookup_table(self.source["lookup_path"], self.fingerprint())
+                    except Exception as e:
+                        raise ModelLoadError(f"Lookup table could not be loaded: {e}") from e
+                    self._lookup = {"table": table}
+        return self._lookup["table"]
+
+    def explainer(self):
+        """
+        CompiledForest used to split predictions into per-feature contributions
+
+        The exported model when it is up to date, otherwise the pipeline is flattened in memory once.
+
+        Returns:
+            CompiledForest, or None if this version's model isn't a forest that can be compiled
+        """
+        compiled = self.compiled()
+        if compiled is not None:
+            return compiled
+        if self._explainer is None:
+            loaded = self.model()
+            with self._lock:
+                if self._explainer is None:
+                    from compiled_forest import export_compiled_model, CompiledForest
+                    try:
+                        explainer = CompiledForest(*export_compiled_model(loaded["model"], loaded["scaler"]))
+                    except (ValueError, AttributeError):
+                        explainer = None
+                    self._explainer = {"explainer": explainer}
+        return self._explainer["explainer"]
+
+    def backend(self):
+        """Name of the backend actually answering predictions (falls back to sklearn if an export is stale)"""
+        if PREDICTOR_BACKEND in ("compiled", "auto") and self.compiled() is not None:
+            return "compiled"
+        if PREDICTOR_BACKEND == "lookup" and self.lookup() is not None:
+            return "lookup"
+        return "sklearn"
+
+    def warm(self):
+        """Load everything the configured backend needs before the first request"""
+        if self.backend() != "compiled":
+            self.model()
+        return self
+
+
+def active_models():
+    """The ModelSet answering predictions in this process"""
+    global _active
+    if _active is None:
+        with _load_lock:
+            if _active is None:
+                _active = ModelSet(model_source())
+    return _active
+
+
+def get_cache():
+    """The raw-score cache for this process (None when caching is off)"""
+    global _cache
+    if _cache is None:
+        with _load_lock:
+            if _cache is None:
+                _cache = {"cache": create_cache(CACHE_TYPE, CACHE_SIZE, CACHE_PATH, active_models().fingerprint())}
+    return _cache["cache"]
+
+
+def get_history():
+    """The history store for this process, or None until one has been created in HISTORY_DIR"""
+    global _history
+    if _history is None and os.path.isdir(HISTORY_DIR):
+        with _load_lock:
+            if _history is None:
+                from history_store import HistoryStore
+                _history = HistoryStore(HISTORY_DIR)
+    return _history
+
+
+def with_history(input_data):
+    """
+    Fill features an input leaves out from the recent history of its "user_id"
+
+    Values in the input always win; inputs without a user_id are returned unchanged.
+    """
+    if not isinstance(input_data, dict) or "user_id" not in input_data:
+        return input_data
+    history = get_history()
+    if history is None:
+        return input_data
+    from history_store import history_features
+
+    with stage("history"):
+        features = history_features(history, str(input_data["user_id"]))
+    return {**features, **input_data}
+
+
+def load_model():
+    """The active version's pipeline and scaler (see ModelSet.model)"""
+    return active_models().model()
+
+
+def load_compiled():
+    """The active version's compiled model, or None (see ModelSet.compiled)"""
+    return active_models().compiled()
+
+
+def load_lookup():
+    """The active version's lookup table, or None (see ModelSet.lookup)"""
+    return active_models().lookup()
+
+
+def parse_record(input_data):
+    """
+    Pick the model features out of one input dictionary
+
+    Missing features are kept as None so the pipeline's imputers handle them.
+    Raises ValueError or TypeError if the input can't be used.
+    """
+    if not isinstance(input_data, dict):
+        raise ValueError("Data must be a JSON object")
+
+    record = {}
+    for name in NUMERIC_INPUTS:
+        record[name] = float(input_data.get(name)) if name in input_data else None
+    record["GENDER"] = str(input_data.get("GENDER")) if "GENDER" in input_data else None
+    record["AGE"] = input_data.get("AGE") if "AGE" in input_data else None
+    check_categories(record)
+    return record
+
+
+def get_input_profile():
+    """The training data profile inputs are checked against, or None when the check is off"""
+    global _input_profile
+    if _input_profile is None:
+        with _load_lock:
+            if _input_profile is None:
+                path = INPUT_PROFILE_PATH
+                _input_profile = {"profile": load_profile(path) if path != "off" and os.path.exists(path) else None}
+    return _input_profile["profile"]
+
+
+def check_categories(record):
+    """
+    Reject categorical answers the model never saw
+
+    The one-hot encoder ignores unknown categories, so a stress of 2.5 or an unknown gender
+    would otherwise be scored as if the answer were missing. Missing answers are left to the imputers.
+
+    Raises:
+        ValueError: Describing every unknown answer
+    """
+    profile = get_input_profile()
+    if profile is None:
+        return
+    encoded = {
+        "DAILY_STRESS": encode_stress([record["DAILY_STRESS"]])[0],
+        "GENDER": record["GENDER"],
+        "AGE": bin_ages([record["AGE"]])[0],
+    }
+    present = [name for name in CATEGORICAL_INPUTS
+               if encoded[name] is not None and not (isinstance(encoded[name], float) and np.isnan(encoded[name]))]
+    problems = validate_record(encoded, profile, columns=present)
+    if problems:
+        raise ValueError("; ".join(problems))
+
+
+def bin_ages(ages):
+    """
+    Map numeric ages to AGE categories for a whole column at once
+
+    Args:
+        ages: Sequence of ages; non-numeric values (already a category, or None) are left unchanged
+
+    Returns:
+        Object array of AGE values
+    """
+    ages = np.asarray(ages, dtype=object)
+    is_numeric = np.fromiter(
+        (isinstance(age, (int, float)) and not isinstance(age, bool) for age in ages),
+        dtype=bool, count=len(ages)
+    )
+    if is_numeric.any():
+        numeric_ages = ages[is_numeric].astype(float)
+        # NaN compares False everywhere, so it lands in the last bin like before
+        bins = np.full(len(numeric_ages), len(AGE_LABELS) - 1)
+        for i, edge in reversed(list(enumerate(AGE_BIN_EDGES))):
+            bins[numeric_ages < edge] = i
+        ages = ages.copy()
+        ages[is_numeric] = np.array(AGE_LABELS, dtype=object)[bins]
+    return ages
+
+
+def encode_stress(values):
+    """
+    Map DAILY_STRESS answers to the categories the model was trained on for a whole column
+
+    The training data stores stress as the strings "0" to "5", so whole numbers become their
+    category. Strings are left as they are; fractions stay numbers and, like other unknown
+    categories, don't match any of them. Missing values stay missing for the imputer.
+
+    Returns:
+        Object array of DAILY_STRESS values
+    """
+    return np.array([
+        str(int(value)) if isinstance(value, float) and value.is_integer() else value
+        for value in np.asarray(values, dtype=object)
+    ], dtype=object)
+
+
+def build_feature_columns(records):
+    """
+    Turn a list of parsed records into one object array per feature, encoding DAILY_STRESS
+    and binning AGE across the whole column
+    """
+    columns = {name: np.array([record[name] for record in records], dtype=object) for name in FEATURES}
+    columns["DAILY_STRESS"] = encode_stress(columns["DAILY_STRESS"])
+    with stage("age_binning"):
+        columns["AGE"] = bin_ages(columns["AGE"])
+    return columns
+
+
+def build_feature_frame(records):
+    """Build one DataFrame for a list of parsed records"""
+    return frame_from_columns(build_feature_columns(records))
+
+
+def frame_from_columns(columns):
+    import pandas as pd
+
+    # Object columns keep None as-is (pandas would otherwise turn it into NaN once a column
+    # mixes strings and None), so a row predicts the same alone or inside a batch
+    return pd.DataFrame(columns, columns=FEATURES, dtype=object)
+
+
+def pipeline_raw_scores_from_columns(columns, models=None):
+    """Run one model.predict (and one inverse_transform) with the sklearn pipeline"""
+    loaded = (models or active_models()).model()
+    model = loaded["model"]
+    scaler = loaded["scaler"]
+
+    with stage("dataframe"):
+        frame = frame_from_columns(columns)
+    with stage("predict"):
+        prediction = model.predict(frame)
+
+    # Scale back to original range if needed
+    if scaler:
+        with stage("inverse_transform"):
+            prediction = scaler.inverse_transform(prediction.reshape(-1, 1)).flatten()
+
+    return prediction
+
+
+def backend_raw_scores(columns, models=None):
+    """Predict raw scores for feature columns with the configured backend"""
+    models = models or active_models()
+    if PREDICTOR_BACKEND in ("compiled", "auto"):
+        compiled = models.compiled()
+        if compiled is not None:
+            # The compiled model applies the target scaler itself
+            with stage("predict"):
+                return compiled.predict(columns)
+
+    elif PREDICTOR_BACKEND == "lookup":
+        table = models.lookup()
+        if table is not None:
+            with stage("lookup"):
+                scores, hit = table.lookup(columns)
+            if not hit.all():
+                # Off-grid or missing values go through the model
+                missing = {name: values[~hit] for name, values in columns.items()}
+                scores[~hit] = pipeline_raw_scores_from_columns(missing, models)
+            return scores
+
+    return pipeline_raw_scores_from_columns(columns, models)
+
+
+def predict_raw_scores(records, models=None):
+    """Predict raw scores for a list of parsed records, answering repeated inputs from the cache"""
+    models = models or active_models()
+    columns = build_feature_columns(records)
+    cache = get_cache()
+    if cache is None:
+        return backend_raw_scores(columns, models)
+
+    fingerprint = models.fingerprint()
+    keys = []
+    scores = np.full(len(records), np.nan)
+    for i, values in enumerate(zip(*(columns[name] for name in FEATURES))):
+        try:
+            key = canonical_key(values, fingerprint)
+        except TypeError:
+            # Inputs that can't be written as JSON just aren't cached
+            key = None
+        keys.append(key)
+        cached = cache.get(key) if key is not None else None
+        if cached is not None:
+            scores[i] = cached
+
+    missing = np.isnan(scores)
+    if missing.any():
+        computed = backend_raw_scores({name: values[missing] for name, values in columns.items()}, models)
+        scores[missing] = computed
+        for i, score in zip(np.nonzero(missing)[0], computed):
+            if keys[i] is not None:
+                cache.put(keys[i], score)
+    return scores
+
+
+def score_message(normalized_score):
+    """Pick the message shown to the user for a 0-5 score"""
+    if normalized_score < 1.5:
+        return "Your predicted well-being score is low. Consider reducing stress and improving sleep."
+    elif normalized_score < 3.5:
+        return "Your predicted well-being score is moderate. You're doing okay, but there's room for improvement."
+    else:
+        return "Your predicted well-being score is high. Keep up the good work!"
+
+
+def explain_records(records, models=None):
+    """
+    Per-feature contributions to the predictions for a list of parsed records
+
+    Each tree's decision path is decomposed (see compiled_forest.py), for all trees and rows at once.
+
+    Returns:
+        List with one explanation dictionary per record, or None if the model can't be explained
+    """
+    explainer = (models or active_models()).explainer()
+    if explainer is None:
+        return None
+    with stage("explain"):
+        bias, contributions = explainer.contributions(build_feature_columns(records))
+    return [format_explanation(bias, dict(zip(explainer.input_features, row))) for row in contributions]
+
+
+def format_explanation(bias, contributions):
+    """
+    Turn raw-score contributions into the explanation added to a response
+
+    Contributions are on the same 0-5 scale as the prediction; the baseline plus all
+    contributions equals the prediction, unless it had to be clipped to 0-5.
+    """
+    scale = 5 / (MAX_SCORE - MIN_SCORE)
+    changeable = min(ADVICE, key=lambda name: contributions[name])
+    return {
+        "baseline": round(5 * (bias - MIN_SCORE) / (MAX_SCORE - MIN_SCORE), 3),
+        "contributions": {name: round(float(contributions[name]) * scale, 3) for name in FEATURES},
+        "advice": ADVICE[changeable] if contributions[changeable] < 0 else ADVICE_ALL_POSITIVE,
+    }
+
+
+def wants_explanation(input_data):
+    return EXPLAIN or (isinstance(input_data, dict) and input_data.get("explain") is True)
+
+
+def normalize_scores(raw_scores):
+    """Raw scores to the 0-5 scale for a whole array (as format_prediction does for one)"""
+    return np.clip(5 * (np.asarray(raw_scores, dtype=np.float64) - MIN_SCORE) / (MAX_SCORE - MIN_SCORE), 0, 5)
+
+
+def format_prediction(raw_score):
+    """Turn a raw model score (typically in 200-800 range) into the response dictionary"""
+    raw_score = float(raw_score)
+
+    # Normalize to 0-5 scale
+    normalized_score = 5 * (raw_score - MIN_SCORE) / (MAX_SCORE - MIN_SCORE)
+    normalized_score = max(0, min(5, normalized_score))  # Ensure it's in range 0-5
+
+    return {
+        "prediction": round(normalized_score, 2),
+        "raw_score": round(raw_score, 2),
+        "message": score_message(normalized_score),
+        "status": "success"
+    }
+
+
+def fallback_prediction(input_data, error):
+    """Custom calculation used when the loaded model fails to predict one row"""
+    daily_stress = float(input_data.get("DAILY_STRESS", 0))
+    flow = float(input_data.get("FLOW", 0))
+    todo_completed = float(input_data.get("TODO_COMPLETED", 0))
+    sleep_hours = float(input_data.get("SLEEP_HOURS", 0))
+
+    # Stress reduces well-being (inverse relationship)
+    stress_component = max(0, 10 - daily_stress * 2)
+
+    # Flow state is good for well-being
+    flow_component = flow * 2
+
+    # Completing tasks is good for well-being
+    todo_component = todo_completed / 10
+
+    # Sleep is critical for well-being
+    if sleep_hours < 5:
+        sleep_component = sleep_hours * 1.5
+    elif sleep_hours <= 8:
+        sleep_component = 7.5 + (sleep_hours - 5) * 0.5
+    else:
+        sleep_component = 9 - (sleep_hours - 8) * 0.5
+
+    # Calculate weighted score (0-10 scale)
+    raw_score = (
+        stress_component * 0.35 +
+        flow_component * 0.25 +
+        todo_component * 0.15 +
+        sleep_component * 0.25
+    )
+
+    # Normalize to 0-5 scale
+    normalized_score = raw_score * 0.5
+
+    return {
+        "prediction": round(normalized_score, 2),
+        "message": score_message(normalized_score),
+        "status": "success",
+        "note": "Fallback calculation used due to error: " + str(error)
+    }
+
+
+def predict_record(input_data):
+    """
+    Predict the well-being score for one dictionary of survey answers
+
+    Args:
+        input_data: Dictionary with DAILY_STRESS, FLOW, TODO_COMPLETED, SLEEP_HOURS, GENDER and AGE;
+            with a "user_id", missing ones are taken from that user's recent history
+
+    Returns:
+        Dictionary with prediction, raw_score, message and status (or error)
+    """
+    return predict_batch([input_data])[0]
+
+
+def predict_batch(records, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Predict well-being scores for many inputs with one model call per chunk
+
+    Args:
+        records: List of input dictionaries (same format as predict_record)
+        chunk_size: Maximum number of rows per model.predict call
+
+    Returns:
+        List of result dictionaries in input order; rows that can't be used get an "error" entry
+    """
+    with stage("predict_batch"):
+        results = [None] * len(records)
+        # One model version for the whole batch, even if a new one is swapped in meanwhile
+        models = active_models()
+
+        for start in range(0, len(records), chunk_size):
+            indices = []
+            inputs = []
+            parsed = []
+            with stage("parse"):
+                for i in range(start, min(start + chunk_size, len(records))):
+                    try:
+                        input_data = with_history(records[i])
+                        parsed.append(parse_record(input_data))
+                        inputs.append(input_data)
+                        indices.append(i)
+                    except Exception as e:
+                        METRICS.error(e)
+                        results[i] = {"error": str(e)}
+
+            if not parsed:
+                continue
+
+            # Make prediction using the original model
+            try:
+                raw_scores = predict_raw_scores(parsed, models)
+                for i, raw_score in zip(indices, raw_scores):
+                    results[i] = format_prediction(raw_score)
+            except ModelLoadError as e:
+                # Without the model no row can be answered; a made-up score would hide the problem
+                METRICS.error(e)
+                for i in indices:
+                    results[i] = {"error": str(e)}
+            except Exception as chunk_error:
+                # Retry rows one at a time so a single bad row doesn't affect the rest of the chunk
+                METRICS.retry(chunk_error)
+                for i, record, input_data in zip(indices, parsed, inputs):
+                    try:
+                        try:
+                            results[i] = format_prediction(predict_raw_scores([record], models)[0])
+                        except ModelLoadError:
+                            raise
+                        except Exception as model_error:
+                            # If model prediction fails, fall back to our custom calculation
+                            METRICS.fallback(model_error)
+                            results[i] = fallback_prediction(input_data, model_error)
+                    except Exception as e:
+                        METRICS.error(e)
+                        results[i] = {"error": str(e)}
+
+            # Fallback answers don't come from the model, so they aren't explained
+            explained = [(i, record) for i, record in zip(indices, parsed)
+                         if "raw_score" in results[i] and wants_explanation(records[i])]
+            if explained:
                 try:
+                    explanations = explain_records([record for _, record in explained], models)
+                except Exception as e:
+                    # The prediction itself is still fine
+                    METRICS.error(e)
+                    explanations = None
+                if explanations is not None:
+                    for (i, _), explanation in zip(explained, explanations):
+                        results[i]["explanation"] = explanation
+
+    return results
+
+
+def do_mood_prediction(input_data=None):
+    # If input_data is provided as argument, use it
+    # Otherwise, check for JSON from command line
+    if input_data is None:
+        # Check if data is passed as command line argument
+        if len(sys.argv) > 1:
+            try:
+                with stage("input_json"):
                     input_data = json.loads(sys.argv[1])
-                except json.JSONDecodeError:
-                    return json.dumps({"error": "Invalid JSON input"})
-            else:
-                return json.dumps({"error": "No input data provided"})
-        
-        if not isinstance(input_data, dict):
-            return json.dumps({"error": "Data must be a JSON object"})
-            
-        # Get project root (parent of ML folder)
-        ml_dir = os.path.dirname(__file__)
-        project_root = os.path.dirname(ml_dir)
-        
-        # Set paths to model files
-        model_path = os.path.join(project_root, "mood_prediction_model.joblib")
-        scaler_path = os.path.join(project_root, "target_scaler.joblib")
-        
-        # Load model and scaler
-        model = joblib.load(model_path)
-        
+            except json.JSONDecodeError:
+                return json.dumps({"error": "Invalid JSON input"})
+        else:
+            return json.dumps({"error": "No input data provided"})
+
+    result = predict_record(input_data)
+    with stage("serialize"):
+        return json.dumps(result)
+
+
+def active_backend():
+    """Name of the backend actually answering predictions (falls back to sklearn if an export is stale)"""
+    return active_models().backend()
+
+
+def canary_records(size=CANARY_SIZE, seed=0):
+    """Fixed survey answers every new model version is checked on before it is swapped in"""
+    rng = np.random.RandomState(seed)
+    return [{
+        "DAILY_STRESS": int(rng.randint(0, 6)),
+        "FLOW": int(rng.randint(0, 11)),
+        "TODO_COMPLETED": int(rng.randint(0, 11)),
+        "SLEEP_HOURS": int(rng.randint(1, 11)),
+        "GENDER": ["Male", "Female"][rng.randint(2)],
+        "AGE": int(rng.randint(16, 70)),
+    } for _ in range(size)]
+
+
+def validate_canary(candidate, current=None, max_drift=CANARY_MAX_DRIFT):
+    """
+    Check a model version on the canary inputs
+
+    The candidate must return a finite score for every input and, compared with the current
+    version, move the 0-5 predictions by at most max_drift on average.
+
+    Returns:
+        Dictionary with passed, max_drift, mean_drift and the reason when it fails
+    """
+    columns = build_feature_columns([parse_record(record) for record in canary_records()])
+    scores = np.asarray(backend_raw_scores(columns, candidate), dtype=np.float64)
+    result = {"passed": True, "size": len(scores), "max_drift": max_drift, "mean_drift": None}
+    if scores.shape != (len(scores),) or not np.isfinite(scores).all():
+        result.update(passed=False, reason="Candidate returned missing or non-finite scores")
+        return result
+
+    if current is not None:
+        previous = np.asarray(backend_raw_scores(columns, current), dtype=np.float64)
+        drift = float(np.mean(np.abs(normalize_scores(scores) - normalize_scores(previous))))
+        result["mean_drift"] = round(drift, 4)
+        if drift > max_drift:
+            result.update(passed=False, reason=f"Predictions moved by {drift:.2f} on average (limit {max_drift})")
+    return result
+
+
+def validate_promotion(registry, name, version):
+    """
+    Canary check a registry version before it becomes CURRENT (see ModelRegistry.promote)
+
+    The version is compared with the one servers answer with now: the CURRENT version, or the
+    files in the project root while nothing has been promoted.
+
+    Returns:
+        validate_canary's result
+    """
+    previous = registry.current(name)
+    if previous is not None:
+        current = ModelSet(registry.paths(name, previous))
+    elif os.path.exists(MODEL_PATH):
+        current = ModelSet(root_source())
+    else:
+        current = None
+    try:
+        return validate_canary(ModelSet(registry.paths(name, version)).warm(), current)
+    except Exception as e:
+        return {"passed": False, "reason": f"Canary check could not run: {e}"}
+
+
+def swap_model(version=None):
+    """
+    Warm-load a registry version, validate it on the canary inputs and make it the active model
+
+    Requests already running finish with the version they started with.
+
+    Args:
+        version: Registry version (default: the registry's CURRENT version)
+
+    Returns:
+        The swap status (also reported at GET /model)
+    """
+    global _active
+    with _swap_lock:
+        current = active_models()
+        source = model_source(version)
+        if source["version"] == current.version:
+            return {"state": "active", "version": current.version, "error": None}
+
+        _reload.update(state="loading", version=source["version"], error=None, canary=None)
         try:
-            scaler = joblib.load(scaler_path)
-        except:
-            scaler = None
-        
-        # Create a dataframe with only the required features
-        # The model's pipeline will handle missing values through imputation
-        df = pd.DataFrame([{
-            "DAILY_STRESS": float(input_data.get("DAILY_STRESS")) if "DAILY_STRESS" in input_data else None,
-            "FLOW": float(input_data.get("FLOW")) if "FLOW" in input_data else None,
-            "TODO_COMPLETED": float(input_data.get("TODO_COMPLETED")) if "TODO_COMPLETED" in input_data else None,
-            "SLEEP_HOURS": float(input_data.get("SLEEP_HOURS")) if "SLEEP_HOURS" in input_data else None,
-            "GENDER": str(input_data.get("GENDER")) if "GENDER" in input_data else None,
-            "AGE": input_data.get("AGE") if "AGE" in input_data else None
-        }])
-
-        # Handle AGE as a category if it's numeric
-        if isinstance(df["AGE"].iloc[0], (int, float)) and df["AGE"].iloc[0] is not None:
-            if df["AGE"].iloc[0] < 20:
-                df["AGE"] = "Under 20"
-            elif df["AGE"].iloc[0] < 35:
-                df["AGE"] = "20 to 35"
-            elif df["AGE"].iloc[0] < 50:
-                df["AGE"] = "36 to 50"
-            else:
-                df["AGE"] = "Above 50"
-        
-        # Make prediction using the original model
+            candidate = ModelSet(source).warm()
+            canary = validate_canary(candidate, current)
+        except Exception as e:
+            _reload.update(state="failed", error=str(e))
+            return dict(_reload)
+
+        _reload["canary"] = canary
+        if not canary["passed"]:
+            _reload.update(state="rejected", error=canary["reason"])
+            return dict(_reload)
+
+        # One reference assignment: later requests see the new version, running ones keep the old one
+        _active = candidate
+        _reload.update(state="active", swapped_at=time.time(), previous_version=current.version)
+        return dict(_reload)
+
+
+def check_for_new_version():
+    """
+    Swap to a newly promoted registry version in the background
+
+    Called for every server request; reads the CURRENT pointer at most once per REGISTRY_POLL_SECONDS.
+    A version that failed validation isn't retried until it's requested at POST /model/reload.
+    """
+    global _registry_checked_at
+    now = time.monotonic()
+    if now - _registry_checked_at < REGISTRY_POLL_SECONDS:
+        return
+    _registry_checked_at = now
+    version = ModelRegistry(REGISTRY_DIR).current(REGISTRY_MODEL_NAME)
+    if version is None or version == active_models().version or version == _reload["version"]:
+        return
+    _reload.update(state="loading", version=version)
+    threading.Thread(target=swap_model, args=(version,), daemon=True).start()
+
+
+def create_app():
+    """Create the Flask app that serves predictions from a model loaded once at startup"""
+    from flask import Flask, request, jsonify
+
+    app = Flask(__name__)
+
+    # Load eagerly so the first request doesn't pay for unpickling the model
+    active_models().warm()
+
+    @app.before_request
+    def watch_registry():
+        check_for_new_version()
+
+    @app.route("/predict", methods=["POST"])
+    def predict():
+        input_data = request.get_json(silent=True)
+        if input_data is None:
+            return jsonify({"error": "Invalid JSON input"}), 400
+
+        result = predict_record(input_data)
+        return jsonify(result), (400 if "error" in result else 200)
+
+    @app.route("/predict/batch", methods=["POST"])
+    def predict_many():
+        records = request.get_json(silent=True)
+        if not isinstance(records, list):
+            return jsonify({"error": "Data must be a JSON array of objects"}), 400
+
+        return jsonify(predict_batch(records))
+
+    @app.route("/sensitivity", methods=["POST"])
+    def sensitivity_surface():
+        from sensitivity import sensitivity
+
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict) or "baseline" not in body or "features" not in body:
+            return jsonify({"error": "Data must be a JSON object with baseline and features"}), 400
         try:
-            prediction = model.predict(df)
-            
-            # Scale back to original range if needed
-            if scaler:
-                prediction = scaler.inverse_transform(prediction.reshape(-1, 1)).flatten()
-            
-            # Raw score from model (typically in 200-800 range)
-            raw_score = float(prediction[0])
-            
-            # Normalize to 0-5 scale
-            # Assuming dataset range of 200-800
-            min_score = 200
-            max_score = 800
-            normalized_score = 5 * (raw_score - min_score) / (max_score - min_score)
-            normalized_score = max(0, min(5, normalized_score))  # Ensure it's in range 0-5
-            
-            # Return prediction as JSON
-            message = ""
-            if normalized_score < 1.5:
-                message = "Your predicted well-being score is low. Consider reducing stress and improving sleep."
-            elif normalized_score < 3.5:
-                message = "Your predicted well-being score is moderate. You're doing okay, but there's room for improvement."
-            else:
-                message = "Your predicted well-being score is high. Keep up the good work!"
-                
-            return json.dumps({
-                "prediction": round(normalized_score, 2),
-                "raw_score": round(raw_score, 2),
-                "message": message,
-                "status": "success"
+            return jsonify(sensitivity(body["baseline"], body["features"], body.get("values")))
+        except (ValueError, TypeError) as e:
+            return jsonify({"error": str(e)}), 400
+
+    @app.route("/health", methods=["GET"])
+    def health():
+        return jsonify({"status": "ok"})
+
+    @app.route("/cache", methods=["GET"])
+    def cache_info():
+        cache = get_cache()
+        return jsonify(cache.stats() if cache is not None else {"type": "off"})
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics_info():
+        return jsonify(METRICS.snapshot())
+
+    @app.route("/memory", methods=["GET"])
+    def memory_info():
+        from prefork import memory_stats
+        return jsonify(memory_stats() or {"pid": os.getpid()})
+
+    @app.route("/model", methods=["GET"])
+    def model_info():
+        models = active_models()
+        backend = models.backend()
+        info = {
+            "backend": backend,
+            "version": models.version,
+            "model_path": models.source["model_path"],
+            "model_fingerprint": models.fingerprint(),
+            "reload": dict(_reload),
+        }
+        if backend == "compiled":
+            compiled = models.compiled()
+            info.update({
+                "model_type": "CompiledForest",
+                "features": compiled.header["features"],
+                "compiled_path": models.source["compiled_path"],
+                "n_trees": compiled.n_trees,
+                "load_seconds": round(models.compiled_load_seconds, 4),
             })
-            
-        except Exception as e:
-            # If model prediction fails, fall back to our custom calculation
-            daily_stress = float(input_data.get("DAILY_STRESS", 0))
-            flow = float(input_data.get("FLOW", 0))
-            todo_completed = float(input_data.get("TODO_COMPLETED", 0))
-            sleep_hours = float(input_data.get("SLEEP_HOURS", 0))
-            
-            # Stress reduces well-being (inverse relationship)
-            stress_component = max(0, 10 - daily_stress * 2)
-            
-            # Flow state is good for well-being
-            flow_component = flow * 2
-            
-            # Completing tasks is good for well-being
-            todo_component = todo_completed / 10
-            
-            # Sleep is critical for well-being
-            if sleep_hours < 5:
-                sleep_component = sleep_hours * 1.5
-            elif sleep_hours <= 8:
-                sleep_component = 7.5 + (sleep_hours - 5) * 0.5
-            else:
-                sleep_component = 9 - (sleep_hours - 8) * 0.5
-            
-            # Calculate weighted score (0-10 scale)
-            raw_score = (
-                stress_component * 0.35 +
-                flow_component * 0.25 +
-                todo_component * 0.15 +
-                sleep_component * 0.25
-            )
-            
-            # Normalize to 0-5 scale
-            normalized_score = raw_score * 0.5
-            
-            # Add message based on prediction value
-            message = ""
-            if normalized_score < 1.5:
-                message = "Your predicted well-being score is low. Consider reducing stress and improving sleep."
-            elif normalized_score < 3.5:
-                message = "Your predicted well-being score is moderate. You're doing okay, but there's room for improvement."
-            else:
-                message = "Your predicted well-being score is high. Keep up the good work!"
-                
-            return json.dumps({
-                "prediction": round(normalized_score, 2),
-                "message": message,
-                "status": "success",
-                "note": "Fallback calculation used due to error: " + str(e)
+        else:
+            loaded = models.model()
+            model = loaded["model"]
+            info.update({
+                "model_type": type(model).__name__,
+                "steps": [name for name, _ in getattr(model, "steps", [])],
+                "features": [str(name) for name in getattr(model, "feature_names_in_", [])],
+                "scaler_path": loaded["scaler_path"],
+                "loaded_at": loaded["loaded_at"],
+                "load_seconds": round(loaded["load_seconds"], 4),
             })
-    
-    except Exception as e:
-        return json.dumps({"error": str(e)})
+        return jsonify(info)
+
+    @app.route("/model/reload", methods=["POST"])
+    def reload_model():
+        # Swap to the given registry version (default: CURRENT) now instead of at the next poll
+        version = (request.get_json(silent=True) or {}).get("version")
+        try:
+            status = swap_model(version)
+        except KeyError as e:
+            return jsonify({"error": str(e)}), 404
+        return jsonify(status), (200 if status["state"] in ("active", "idle") else 409)
+
+    return app
+
 
 # If called directly (not imported), run prediction with args
+# Use "--serve [port]" to keep the model loaded in a long-running server instead,
+# and "--serve [port] --workers N" to share one loaded model between N forked worker processes
 if __name__ == "__main__":
-    result = do_mood_prediction()
-    print(result)
\ No newline at end of file
+    if len(sys.argv) > 1 and sys.argv[1] == "--serve":
+        args = sys.argv[2:]
+        workers = int(os.environ.get("WORKERS", 1))
+        if "--workers" in args:
+            workers = int(args[args.index("--workers") + 1])
+            del args[args.index("--workers"):args.index("--workers") + 2]
+        port = int(args[0]) if args else int(os.environ.get("PORT", 5000))
+        host = os.environ.get("HOST", "127.0.0.1")
+        if workers > 1:
+            from prefork import serve_prefork
+            serve_prefork(create_app, host, port, workers)
+        else:
+            create_app().run(host=host, port=port, threaded=True)
+    else:
+        result = do_mood_prediction()
+        print(result)
+        write_cli_metrics()
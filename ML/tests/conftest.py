@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The ML scripts import each other as top-level modules
+ML_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ML_DIR)
+sys.path.insert(0, os.path.join(ML_DIR, "training"))
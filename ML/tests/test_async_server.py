@@ -0,0 +1,50 @@
+import asyncio
+import json
+
+import pytest
+
+from async_server import MAX_BODY_SIZE, MicroBatcher, serve_connection
+
+
+async def exchange(batcher, raw):
+    """Send raw bytes to one connection and return the status and JSON body of the reply"""
+    server = await asyncio.start_server(lambda r, w: serve_connection(batcher, r, w), "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    async with server:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(raw)
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    return int(head.split(b" ")[1]), json.loads(body)
+
+
+@pytest.mark.parametrize("raw", [
+    b"GARBAGE\r\n\r\n",
+    b"POST /predict HTTP/1.1\r\nContent-Length: ten\r\n\r\n",
+    b"POST /predict HTTP/1.1\r\nContent-Length: -5\r\n\r\n",
+    b"POST /predict HTTP/1.1\r\nno colon here\r\n\r\n",
+])
+def test_malformed_requests_are_400(raw):
+    status, payload = asyncio.run(exchange(MicroBatcher(lambda records: []), raw))
+    assert status == 400
+    assert "error" in payload
+
+
+def test_oversized_body_is_413():
+    raw = f"POST /predict HTTP/1.1\r\nContent-Length: {MAX_BODY_SIZE + 1}\r\n\r\n".encode()
+    status, _ = asyncio.run(exchange(MicroBatcher(lambda records: []), raw))
+    assert status == 413
+
+
+def test_short_results_fail_every_request():
+    async def run():
+        batcher = MicroBatcher(lambda records: [{"prediction": 1.0}], max_batch=2, max_wait_ms=50)
+        batcher.start()
+        results = await asyncio.wait_for(asyncio.gather(batcher.submit({}), batcher.submit({})), 5)
+        batcher.task.cancel()
+        return results
+
+    results = asyncio.run(run())
+    assert all("error" in result for result in results)
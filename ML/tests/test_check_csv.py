@@ -0,0 +1,54 @@
+import pandas as pd
+import pytest
+
+from check_csv import load_profile, profile_csv, validate_frame, validate_record
+from serve_model import parse_record, predict_record
+
+SURVEY = {"DAILY_STRESS": 3, "FLOW": 2, "TODO_COMPLETED": 5, "SLEEP_HOURS": 7, "GENDER": "Male", "AGE": 40}
+
+
+@pytest.fixture
+def profile(tmp_path):
+    path = tmp_path / "survey.csv"
+    pd.DataFrame({"SLEEP_HOURS": [5, 7, 9], "GENDER": ["Female", "Male", "Male"]}).to_csv(path, index=False)
+    return profile_csv(str(path))
+
+
+def test_validate_record(profile):
+    assert validate_record({"SLEEP_HOURS": 8, "GENDER": "Female"}, profile) == []
+    assert validate_record({"SLEEP_HOURS": 12, "GENDER": "Other"}, profile) == [
+        "SLEEP_HOURS: 12.0 outside the profiled range [5.0, 9.0]",
+        "GENDER: unknown value 'Other'",
+    ]
+
+
+def test_validate_frame_counts_rows(profile):
+    df = pd.DataFrame({"SLEEP_HOURS": [5, 12, 13, None], "GENDER": ["Male", "Other", "Male", "Female"]})
+    assert validate_frame(df, profile) == [
+        "SLEEP_HOURS: 1 missing, but never missing in the profiled data",
+        "SLEEP_HOURS: 2 values outside the profiled range [5.0, 9.0]",
+        "GENDER: 1 unknown values, e.g. 'Other'",
+    ]
+
+
+def test_stored_profile_matches_training_categories():
+    columns = load_profile()["columns"]
+    assert set(columns["GENDER"]["categories"]) == {"Female", "Male"}
+    assert set(columns["AGE"]["categories"]) == {"Less than 20", "21 to 35", "36 to 50", "51 or more"}
+
+
+@pytest.mark.parametrize("change, problem", [
+    ({"DAILY_STRESS": 2.5}, "DAILY_STRESS"),
+    ({"DAILY_STRESS": 7}, "DAILY_STRESS"),
+    ({"GENDER": "Other"}, "GENDER"),
+    ({"AGE": "Under 20"}, "AGE"),
+])
+def test_serving_rejects_unknown_categories(change, problem):
+    with pytest.raises(ValueError, match=problem):
+        parse_record({**SURVEY, **change})
+    assert problem in predict_record({**SURVEY, **change})["error"]
+
+
+def test_serving_checks_binned_ages_and_allows_missing_answers():
+    assert parse_record({**SURVEY, "AGE": 67})["AGE"] == 67
+    assert parse_record({"FLOW": 2})["GENDER"] is None
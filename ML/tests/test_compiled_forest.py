@@ -0,0 +1,77 @@
+import joblib
+import numpy as np
+import pytest
+
+from compiled_forest import (CompiledForest, compact_model, compile_model_files, export_compiled_model,
+                             load_compiled_model)
+from serve_model import MODEL_PATH, SCALER_PATH, build_feature_columns, build_feature_frame, parse_record
+
+AGES = [15.0, 25.0, 40.0, 60.0, "21 to 35", "36 to 50", "Less than 20", "51 or more"]
+
+
+@pytest.fixture(scope="module")
+def served():
+    """The pipeline and target scaler in the project root"""
+    return joblib.load(MODEL_PATH), joblib.load(SCALER_PATH)
+
+
+@pytest.fixture(scope="module")
+def records():
+    """Parsed random inputs over the survey ranges, some with answers left out for the imputers"""
+    rng = np.random.default_rng(0)
+    records = []
+    for _ in range(500):
+        record = {
+            "DAILY_STRESS": int(rng.integers(0, 6)),
+            "FLOW": float(rng.integers(0, 11)),
+            "TODO_COMPLETED": float(rng.uniform(0, 10)),
+            "SLEEP_HOURS": float(rng.integers(1, 11)),
+            "GENDER": str(rng.choice(["Male", "Female"])),
+            "AGE": AGES[rng.integers(len(AGES))],
+        }
+        for name in list(record):
+            if rng.random() < 0.1:
+                del record[name]
+        records.append(parse_record(record))
+    return records
+
+
+@pytest.fixture(scope="module")
+def expected(served, records):
+    """Raw scores from the sklearn pipeline"""
+    pipeline, scaler = served
+    return scaler.inverse_transform(pipeline.predict(build_feature_frame(records)).reshape(-1, 1)).flatten()
+
+
+def test_predict_matches_sklearn(served, records, expected):
+    compiled = CompiledForest(*export_compiled_model(*served))
+    np.testing.assert_allclose(compiled.predict(build_feature_columns(records)), expected, atol=1e-6)
+
+
+def test_compact_export_matches_sklearn(tmp_path, served, records, expected):
+    path = str(tmp_path / "model.npz")
+    compile_model_files(MODEL_PATH, SCALER_PATH, path, compact=True)
+    compiled = load_compiled_model(path, mmap=True)
+    assert "compact" in compiled.header
+
+    # Quantized values are at most half a step off each tree's value
+    np.testing.assert_allclose(compiled.predict(build_feature_columns(records)), expected,
+                               atol=compiled.value_scale)
+    full = CompiledForest(*export_compiled_model(*served))
+    assert compiled.header["n_trees"] == full.header["n_trees"]
+    assert len(compiled.feature) < len(full.feature)
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_contributions_add_up_to_the_prediction(served, records, expected, compact):
+    header, arrays = export_compiled_model(*served)
+    if compact:
+        header, arrays = compact_model(header, arrays)
+    compiled = CompiledForest(header, arrays)
+    columns = build_feature_columns(records)
+
+    bias, contributions = compiled.contributions(columns)
+    assert contributions.shape == (len(records), len(compiled.input_features))
+    np.testing.assert_allclose(bias + contributions.sum(axis=1), compiled.predict(columns), atol=1e-6)
+    np.testing.assert_allclose(bias + contributions.sum(axis=1), expected,
+                               atol=compiled.value_scale if compact else 1e-6)
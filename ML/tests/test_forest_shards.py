@@ -0,0 +1,51 @@
+import os
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from forest_shards import fit_shard, merge_job, prepare_job, run_worker, shard_path
+
+
+def pipeline():
+    return Pipeline(steps=[
+        ("preprocessor", StandardScaler()),
+        ("regressor", RandomForestRegressor(n_estimators=4, max_depth=3, random_state=0)),
+    ])
+
+
+def data(seed):
+    rng = np.random.RandomState(seed)
+    X = rng.rand(60, 3)
+    return X, X.sum(axis=1)
+
+
+def test_rerun_starts_from_a_clean_job(tmp_path):
+    job_dir = str(tmp_path)
+    prepare_job(pipeline(), *data(0), job_dir, n_shards=2)
+    assert run_worker(job_dir) == [0, 1]
+
+    X, y = data(1)
+    prepare_job(pipeline(), X, y, job_dir, n_shards=2)
+    assert not any(name.startswith("shard_") for name in os.listdir(job_dir))
+    assert run_worker(job_dir) == [0, 1]
+
+    merged = merge_job(job_dir)
+    np.testing.assert_allclose(merged.predict(X), pipeline().fit(X, y).predict(X))
+
+
+def test_merge_refuses_shards_of_another_job(tmp_path):
+    old_dir, job_dir = str(tmp_path / "old"), str(tmp_path / "job")
+    prepare_job(pipeline(), *data(0), old_dir, n_shards=2)
+    fit_shard(old_dir, 0)
+
+    prepare_job(pipeline(), *data(1), job_dir, n_shards=2)
+    run_worker(job_dir)
+    # A worker still running the earlier job writes its shard late
+    joblib.dump(joblib.load(shard_path(old_dir, 0)), shard_path(job_dir, 0))
+
+    with pytest.raises(ValueError, match="different job"):
+        merge_job(job_dir)
@@ -0,0 +1,86 @@
+import json
+import os
+
+from history_store import TODO_COMPLETIONS, HistoryStore, import_app_data
+
+DAY = 24 * 60 * 60
+T0 = 1700000000.0
+
+
+def sleep(hours):
+    return {"duration": hours, "quality": 4}
+
+
+def test_append_and_query(tmp_path):
+    store = HistoryStore(str(tmp_path))
+    store.append("me", "sleep_data", T0 + DAY, sleep(7))
+    store.extend([("me", "sleep_data", T0, sleep(6)), ("you", "sleep_data", T0, sleep(9)),
+                  ("me", "daily_stress", T0, {"level": 2})])
+
+    # Entries come back in time order, whatever order they were logged in
+    assert store.query("me", "sleep_data") == [(T0, sleep(6)), (T0 + DAY, sleep(7))]
+    assert store.query("me", "sleep_data", start=T0 + 1) == [(T0 + DAY, sleep(7))]
+    assert store.recent("me", "sleep_data", days=1, end=T0 + DAY + 1) == [(T0 + DAY, sleep(7))]
+    assert store.latest("me", "sleep_data") == (T0 + DAY, sleep(7))
+    assert store.latest("me", "flow_sessions") is None
+    assert store.users() == ["me", "you"]
+    assert store.series("me") == ["daily_stress", "sleep_data"]
+
+
+def test_sealed_segments_reload_from_sidecars(tmp_path):
+    store = HistoryStore(str(tmp_path), segment_bytes=200)
+    for day in range(10):
+        store.append("me", "sleep_data", T0 + day * DAY, sleep(day))
+    assert len(store.segments) > 2
+    sidecars = [name for name in os.listdir(tmp_path) if name.endswith(".idx.npz")]
+    assert len(sidecars) == len(store.segments) - 1
+
+    reopened = HistoryStore(str(tmp_path), segment_bytes=200)
+    assert reopened.query("me", "sleep_data") == [(T0 + day * DAY, sleep(day)) for day in range(10)]
+    assert reopened.count("me", "sleep_data") == 10
+
+    # A reader in another process picks up entries appended after it opened the store
+    store.append("me", "sleep_data", T0 + 10 * DAY, sleep(10))
+    assert reopened.latest("me", "sleep_data") == (T0 + 10 * DAY, sleep(10))
+
+
+def test_compaction_drops_duplicates(tmp_path):
+    store = HistoryStore(str(tmp_path), segment_bytes=200)
+    for _ in range(2):
+        for day in range(5):
+            store.append("me", "sleep_data", T0 + day * DAY, sleep(day))
+    store.append("me", "sleep_data", T0, sleep(1.5))
+
+    result = store.compact()
+    assert result["entries"] == 11
+    assert result["kept"] == 6
+    assert len(store.segments) == 2
+
+    # Same time with different contents is not a duplicate
+    expected = [(T0, sleep(0)), (T0, sleep(1.5))] + [(T0 + day * DAY, sleep(day)) for day in range(1, 5)]
+    assert store.query("me", "sleep_data") == expected
+    assert HistoryStore(str(tmp_path)).query("me", "sleep_data") == expected
+    assert sorted(name for name in os.listdir(tmp_path) if name.endswith(".log")) == \
+        sorted(name + ".log" for name in store.segments)
+
+
+def test_reimport_adds_only_new_entries(tmp_path):
+    app_file = tmp_path / "mental_health_data.json"
+    data = {
+        "sleep_data": [{"timestamp": T0, "duration": 7}],
+        "todos": [{"title": "walk", "creation_timestamp": T0, "completed": True,
+                   "completion_timestamp": T0 + 60}],
+        "user_profile": {"gender": "Female", "age": 30},
+    }
+    app_file.write_text(json.dumps(data))
+    store = HistoryStore(str(tmp_path / "store"))
+
+    added = import_app_data(store, str(app_file), "me", imported_at=T0)
+    assert added == {"sleep_data": 1, "todos": 1, TODO_COMPLETIONS: 1, "user_profile": 1}
+    assert import_app_data(store, str(app_file), "me", imported_at=T0 + DAY) == {}
+
+    data["sleep_data"].append({"timestamp": T0 + DAY, "duration": 8})
+    app_file.write_text(json.dumps(data))
+    assert import_app_data(store, str(app_file), "me", imported_at=T0 + DAY) == {"sleep_data": 1}
+    assert store.count("me", "sleep_data") == 2
+    assert store.count("me", "user_profile") == 1
@@ -0,0 +1,67 @@
+import json
+
+import pandas as pd
+import pytest
+
+from ingest import load_stream
+
+
+def old_latitude(x):
+    """train.py's per-row parsing before ingest.py"""
+    return (float(x.split(',')[0]) if isinstance(x, str) and x != 'Unknown'
+            else float(x) if isinstance(x, (int, float))
+            else None)
+
+
+def old_longitude(x):
+    return float(x.split(',')[1]) if isinstance(x, str) and x != 'Unknown' else None
+
+
+MOOD_FILES = {
+    "u00": ["43.7,-72.2", "Unknown", "43.8,-72.3"],
+    "u01": ["Unknown", "Unknown"],
+    "u02": [43.5, "Unknown"],
+    "u03": [None, "43.9,-72.1"],
+}
+
+
+def old_mood_locations(data_dir):
+    """Latitude and longitude as the old loader built them: one apply per file, then concat"""
+    frames = []
+    for file in sorted((data_dir / "Mood").glob("*.json")):
+        df = pd.DataFrame(json.loads(file.read_text()))
+        df["latitude"] = df["location"].apply(old_latitude)
+        df["longitude"] = df["location"].apply(old_longitude)
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True)
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    (tmp_path / "Mood").mkdir()
+    for uid, locations in MOOD_FILES.items():
+        rows = [{"happy": "2", "sad": "1", "happyornot": "1", "sadornot": "0", "location": location,
+                 "resp_time": 1364000000 + i} for i, location in enumerate(locations)]
+        (tmp_path / "Mood" / f"Mood_{uid}.json").write_text(json.dumps(rows))
+    return tmp_path
+
+
+def assert_same_column(new, old):
+    assert new.dtype == old.dtype
+    assert [type(value) for value in new] == [type(value) for value in old]
+    assert new.equals(old)
+
+
+@pytest.mark.parametrize("cached", [False, True])
+def test_locations_match_old_loader(data_dir, cached):
+    old = old_mood_locations(data_dir)
+    cache_dir = str(data_dir / "cache") if cached else False
+    if cached:
+        load_stream(str(data_dir), "Mood", n_jobs=1, cache_dir=cache_dir)
+    new = load_stream(str(data_dir), "Mood", n_jobs=1, cache_dir=cache_dir)
+    # Compare by user so the result doesn't depend on glob order
+    new = new.sort_values(["uid", "resp_time"], ignore_index=True)
+
+    assert old["latitude"].dtype == object
+    assert_same_column(new["latitude"], old["latitude"])
+    assert_same_column(new["longitude"], old["longitude"])
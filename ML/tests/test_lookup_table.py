@@ -0,0 +1,52 @@
+import os
+
+import numpy as np
+
+from lookup_table import GRID_AXES, build_lookup_table, grid_columns, load_lookup_table
+from serve_model import AGE_LABELS, build_feature_columns
+
+
+def flat_index(columns):
+    """Deterministic fake model: a different score for every grid point"""
+    return np.arange(len(columns["FLOW"]), dtype=np.float64)
+
+
+def test_axes_are_the_trained_categories():
+    axes = dict(GRID_AXES)
+    assert axes["DAILY_STRESS"] == ["0", "1", "2", "3", "4", "5"]
+    assert axes["AGE"] == AGE_LABELS == ["Less than 20", "21 to 35", "36 to 50", "51 or more"]
+
+
+def test_encoded_requests_hit_the_table(tmp_path):
+    path = str(tmp_path / "lookup")
+    build_lookup_table(flat_index, path, "fp")
+    table = load_lookup_table(path, "fp")
+
+    # Parsed records, as parse_record returns them
+    records = [
+        {"DAILY_STRESS": 3.0, "FLOW": 2.0, "TODO_COMPLETED": 5.0, "SLEEP_HOURS": 7.0, "GENDER": "Male", "AGE": 40.0},
+        {"DAILY_STRESS": 4.0, "FLOW": 2.0, "TODO_COMPLETED": 5.0, "SLEEP_HOURS": 7.0, "GENDER": "Male", "AGE": 20.0},
+    ]
+    scores, hit = table.lookup(build_feature_columns(records))
+    assert hit.all()
+    assert scores[0] != scores[1]
+
+
+def test_rebuild_switches_array_with_header(tmp_path):
+    path = str(tmp_path / "lookup")
+    first = build_lookup_table(flat_index, path, "fp")
+    second = build_lookup_table(lambda columns: flat_index(columns) * 2, path, "fp")
+
+    assert first["array"] != second["array"]
+    assert sorted(os.listdir(tmp_path)) == sorted(["lookup.json", second["array"]])
+    table = load_lookup_table(path, "fp")
+    assert table.scores[1] == 2.0
+    assert load_lookup_table(path, "other") is None
+
+
+def test_missing_array_falls_back(tmp_path):
+    path = str(tmp_path / "lookup")
+    header = build_lookup_table(flat_index, path, "fp")
+    os.remove(tmp_path / header["array"])
+    assert load_lookup_table(path, "fp") is None
+    assert len(grid_columns()["FLOW"]) == header["size"]
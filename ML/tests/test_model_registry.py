@@ -0,0 +1,125 @@
+import copy
+import os
+
+import joblib
+import pytest
+
+import serve_model
+from model_registry import ModelRegistry
+from serve_model import MODEL_PATH, SCALER_PATH, ModelSet, swap_model
+
+NAME = "wellbeing"
+
+
+@pytest.fixture(scope="module")
+def served():
+    """The pipeline and target scaler in the project root"""
+    return joblib.load(MODEL_PATH), joblib.load(SCALER_PATH)
+
+
+def rescaled(served, factor):
+    """The same pipeline with its predictions spread 1/factor times wider"""
+    model, scaler = served
+    scaler = copy.deepcopy(scaler)
+    scaler.scale_ = scaler.scale_ * factor
+    return model, scaler
+
+
+@pytest.fixture(scope="module")
+def drifting(served):
+    return rescaled(served, 1 / 4)
+
+
+def register(registry, model_and_scaler, **kwargs):
+    model, scaler = model_and_scaler
+    return registry.register(NAME, model, scaler, compile=False, **kwargs)
+
+
+def test_validated_promotion(tmp_path, served, drifting):
+    registry = ModelRegistry(str(tmp_path))
+    good = register(registry, served, promote=True, validate=True)
+    assert registry.current(NAME) == good
+
+    bad = register(registry, drifting)
+    with pytest.raises(ValueError, match="canary"):
+        registry.promote(NAME, bad, validate=True)
+    assert registry.current(NAME) == good
+    assert registry.history(NAME)[-1]["action"] == "reject"
+    assert registry.promotion_stack(NAME) == [good]
+
+    # Without validation the version is promoted as asked
+    registry.promote(NAME, bad)
+    assert registry.current(NAME) == bad
+
+
+def test_register_stores_a_version(tmp_path, served):
+    registry = ModelRegistry(str(tmp_path))
+    version = register(registry, served, features=["SLEEP_HOURS"], metrics={"r2": 0.5})
+
+    assert registry.current(NAME) is None
+    assert [metadata["version"] for metadata in registry.versions(NAME)] == [version]
+    assert registry.metadata(NAME, version)["metrics"] == {"r2": 0.5}
+    paths = registry.paths(NAME, version)
+    assert (joblib.load(paths["scaler_path"]).scale_ == served[1].scale_).all()
+    # The same files again are the same version
+    assert register(registry, served) == version
+
+
+def test_rollback_walks_back_through_promotions(tmp_path, served):
+    registry = ModelRegistry(str(tmp_path))
+    first, second, third = (register(registry, rescaled(served, factor), promote=True)
+                            for factor in (1.0, 1.01, 1.02))
+    assert registry.current(NAME) == third
+    assert registry.promotion_stack(NAME) == [first, second, third]
+
+    assert registry.rollback(NAME) == second
+    assert registry.rollback(NAME) == first
+    assert registry.current(NAME) == first
+    assert registry.promotion_stack(NAME) == [first]
+    with pytest.raises(ValueError, match="no earlier version"):
+        registry.rollback(NAME)
+
+    # A promotion after rolling back goes on top of what is left
+    registry.promote(NAME, third)
+    assert registry.promotion_stack(NAME) == [first, third]
+    assert registry.rollback(NAME) == first
+
+
+def test_promoting_an_unknown_version_fails(tmp_path, served):
+    registry = ModelRegistry(str(tmp_path))
+    register(registry, served)
+    with pytest.raises(KeyError):
+        registry.promote(NAME, "missing")
+    assert registry.current(NAME) is None
+
+
+def test_swap_rejects_a_drifting_version(tmp_path, monkeypatch, served, drifting):
+    registry = ModelRegistry(str(tmp_path))
+    good = register(registry, served, promote=True)
+    bad = register(registry, drifting)
+    monkeypatch.setattr(serve_model, "REGISTRY_DIR", str(tmp_path))
+    monkeypatch.setattr(serve_model, "REGISTRY_MODEL_NAME", NAME)
+    monkeypatch.setattr(serve_model, "_active", ModelSet(registry.paths(NAME, good)))
+    monkeypatch.setattr(serve_model, "_reload", {"state": "idle", "version": None, "error": None, "canary": None})
+
+    status = swap_model(bad)
+    assert status["state"] == "rejected"
+    assert not status["canary"]["passed"]
+    assert serve_model.active_models().version == good
+
+    close = register(registry, rescaled(served, 1.01))
+    assert swap_model(close)["state"] == "active"
+    assert serve_model.active_models().version == close
+
+
+def test_extra_files_are_stored_with_the_version(tmp_path, served):
+    from feature_engine import STATE_FILE, FeatureEngine
+
+    engine = FeatureEngine()
+    engine.update("u00", "Mood", {"mood_score": 0.625})
+    registry = ModelRegistry(str(tmp_path))
+    version = register(registry, served, extra_files={STATE_FILE: engine.checkpoint})
+
+    assert registry.metadata(NAME, version)["files"]["extra"] == [STATE_FILE]
+    restored = FeatureEngine.restore(os.path.join(registry.version_dir(NAME, version), STATE_FILE))
+    assert restored.features("u00") == engine.features("u00")
@@ -0,0 +1,61 @@
+from prediction_cache import DiskPredictionCache
+
+
+def last_used(cache, key):
+    return cache._db.execute("SELECT last_used FROM predictions WHERE key = ?", (key,)).fetchone()[0]
+
+
+def test_eviction_keeps_recently_hit_entries(tmp_path):
+    cache = DiskPredictionCache(str(tmp_path / "cache.sqlite3"), max_size=3, fingerprint="fp")
+    for key in ("a", "b", "c"):
+        cache.put(key, 1.0)
+    assert cache.get("a") == 1.0
+    cache.put("d", 2.0)
+
+    assert len(cache) == 3
+    assert cache.get("b") is None
+    assert cache.get("a") == 1.0
+    assert cache.evictions == 1
+
+
+def test_hits_are_written_back_in_batches(tmp_path):
+    cache = DiskPredictionCache(str(tmp_path / "cache.sqlite3"), fingerprint="fp")
+    cache.put("a", 1.0)
+    before = last_used(cache, "a")
+
+    cache.get("a")
+    assert last_used(cache, "a") == before
+    cache.flush()
+    assert last_used(cache, "a") > before
+
+
+def test_size_is_shared_between_processes(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    first = DiskPredictionCache(path, max_size=4, fingerprint="fp")
+    second = DiskPredictionCache(path, max_size=4, fingerprint="fp")
+    for i in range(4):
+        first.put(f"first{i}", 1.0)
+        second.put(f"second{i}", 1.0)
+    # Overwriting an entry is not an insert
+    first.put("first3", 2.0)
+
+    assert len(first) == len(second) == 4
+    assert first._db.execute("SELECT COUNT(*) FROM predictions").fetchone()[0] == 4
+    assert first._db.execute("SELECT COUNT(*) FROM predictions_size").fetchone()[0] == 1
+    assert first.get("first3") == 2.0
+
+
+def test_other_model_versions_keep_their_entries(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    old = DiskPredictionCache(path, max_size=3, fingerprint="old")
+    old.put("old-a", 1.0)
+    old.flush()
+
+    # A process serving a newer version doesn't wipe the entries of one still serving the old version
+    new = DiskPredictionCache(path, max_size=3, fingerprint="new")
+    assert old.get("old-a") == 1.0
+    for key in ("new-a", "new-b", "new-c"):
+        new.put(key, 2.0)
+    # Unused entries of the old version are evicted like any other
+    assert len(new) == 3
+    assert new.get("old-a") is None
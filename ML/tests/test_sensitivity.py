@@ -0,0 +1,53 @@
+import pytest
+
+from sensitivity import sweep_axes
+
+BASELINE = {"DAILY_STRESS": 3, "FLOW": 5, "TODO_COMPLETED": 6, "SLEEP_HOURS": 7, "GENDER": "Female", "AGE": 28}
+
+
+@pytest.mark.parametrize("values", [[6, 7, 8], "SLEEP_HOURS", {"SLEEP_HOURS": "7"}, {"SLEEP_HOURS": []},
+                                    {"SLEEP_HOURS": [7, "8"]}, {"SLEEP_HOURS": [True]}])
+def test_bad_values_raise_value_error(values):
+    with pytest.raises(ValueError):
+        sweep_axes(["SLEEP_HOURS"], values)
+
+
+@pytest.mark.parametrize("stress", [[2.5], [1, 6], [-1]])
+def test_stress_values_must_be_categories(stress):
+    with pytest.raises(ValueError, match="whole numbers"):
+        sweep_axes(["DAILY_STRESS"], {"DAILY_STRESS": stress})
+
+
+def test_whole_stress_values_are_accepted():
+    assert sweep_axes(["DAILY_STRESS"], {"DAILY_STRESS": [0, 2.0, 5]}) == [("DAILY_STRESS", [0.0, 2.0, 5.0])]
+
+
+def test_bad_values_are_a_client_error():
+    from serve_model import create_app
+
+    client = create_app().test_client()
+    response = client.post("/sensitivity", json={"baseline": BASELINE, "features": ["SLEEP_HOURS"],
+                                                 "values": [6, 7, 8]})
+    assert response.status_code == 400
+    assert "values" in response.get_json()["error"]
+
+    response = client.post("/sensitivity", json={"baseline": BASELINE, "features": ["SLEEP_HOURS"],
+                                                 "values": {"SLEEP_HOURS": [6, 7, 8]}})
+    assert response.status_code == 200
+    assert len(response.get_json()["predictions"]) == 3
+
+
+def test_stress_moves_the_score():
+    from sensitivity import sensitivity
+
+    surface = sensitivity(BASELINE, ["DAILY_STRESS"], cache=None)
+    raw_scores = surface["raw_scores"]
+    assert len(set(raw_scores)) == len(raw_scores)
+    # The swept point at the user's own answer is the user's prediction
+    assert raw_scores[BASELINE["DAILY_STRESS"]] == surface["baseline"]["raw_score"]
+
+
+def test_stress_is_encoded_like_training():
+    from serve_model import encode_stress
+
+    assert encode_stress([0.0, 3.0, 2.5, None, "4"]).tolist() == ["0", "3", 2.5, None, "4"]
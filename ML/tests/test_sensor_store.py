@@ -0,0 +1,44 @@
+import json
+
+import numpy as np
+import pytest
+
+from sensor_store import SensorStore, build_store
+
+
+@pytest.fixture
+def store(tmp_path):
+    (tmp_path / "Stress").mkdir()
+    (tmp_path / "Mood").mkdir()
+    stress = [
+        {"level": "2", "resp_time": 1364000200},
+        {"level": "3", "resp_time": "1364000100"},
+        {"level": "4", "resp_time": "not a time"},
+        {"level": "5"},
+        {"level": "1", "resp_time": None},
+    ]
+    (tmp_path / "Stress" / "Stress_u00.json").write_text(json.dumps(stress))
+    # The same file in another stream is stored once, under the stream that has it first
+    (tmp_path / "Mood" / "Mood_u00.json").write_text(json.dumps(stress))
+    (tmp_path / "Mood" / "Mood_u01.json").write_text(json.dumps([{"happy": "2", "resp_time": 1364000000}]))
+    build_store(str(tmp_path), str(tmp_path / "store"), streams=["Mood", "Stress"], n_jobs=1)
+    return SensorStore(str(tmp_path / "store"))
+
+
+def test_bad_times_are_skipped_and_counted(store):
+    rows = store.query("Stress", "u00")
+    assert rows["resp_time"].tolist() == [1364000100, 1364000200]
+    assert rows["level"].tolist() == [3.0, 2.0]
+    assert store.manifest["streams"]["Stress"]["users"]["u00"]["skipped"] == 3
+
+
+def test_columns_include_shared_files(store):
+    # Stress's only file is stored under Mood, whose columns it shares
+    assert store.manifest["streams"]["Stress"]["users"]["u00"]["source"] == "Mood"
+    assert store.columns("Stress") == ["level", "resp_time"]
+    assert store.columns("Mood") == ["happy", "level", "resp_time"]
+
+    rows = store.query("Mood", "u00")
+    assert set(rows) == {"happy", "level", "resp_time"}
+    assert np.isnan(rows["happy"]).all()
+    assert store.query("Mood", "u01")["happy"].tolist() == [2.0]
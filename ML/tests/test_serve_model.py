@@ -0,0 +1,48 @@
+import json
+
+import pytest
+
+import serve_model
+from serve_model import ModelSet, do_mood_prediction, predict_batch, root_source
+
+RECORD = {"DAILY_STRESS": 2, "FLOW": 3, "TODO_COMPLETED": 5, "SLEEP_HOURS": 7, "GENDER": "Female", "AGE": 30}
+
+
+def serve_files(monkeypatch, **paths):
+    """Answer predictions from the root model files, with some of them replaced"""
+    monkeypatch.setattr(serve_model, "_active", ModelSet({**root_source(), **paths}))
+    monkeypatch.setattr(serve_model, "_cache", {"cache": None})
+
+
+@pytest.mark.parametrize("backend", ["sklearn", "auto"])
+def test_missing_model_is_an_error(tmp_path, monkeypatch, backend):
+    monkeypatch.setattr(serve_model, "PREDICTOR_BACKEND", backend)
+    serve_files(monkeypatch, model_path=str(tmp_path / "missing.joblib"),
+                compiled_path=str(tmp_path / "missing.npz"))
+
+    results = predict_batch([RECORD, RECORD])
+    assert all("error" in result and "status" not in result for result in results)
+    assert "error" in json.loads(do_mood_prediction(RECORD))
+
+
+def test_corrupt_model_is_an_error(tmp_path, monkeypatch):
+    monkeypatch.setattr(serve_model, "PREDICTOR_BACKEND", "sklearn")
+    corrupt = tmp_path / "corrupt.joblib"
+    corrupt.write_bytes(b"not a model")
+    serve_files(monkeypatch, model_path=str(corrupt))
+
+    result = json.loads(do_mood_prediction(RECORD))
+    assert "error" in result and "note" not in result
+
+
+def test_row_errors_still_fall_back(monkeypatch):
+    monkeypatch.setattr(serve_model, "PREDICTOR_BACKEND", "sklearn")
+    serve_files(monkeypatch)
+
+    def fail(columns, models=None):
+        raise ValueError("bad row")
+
+    monkeypatch.setattr(serve_model, "pipeline_raw_scores_from_columns", fail)
+    result = json.loads(do_mood_prediction(RECORD))
+    assert result["status"] == "success"
+    assert "bad row" in result["note"]
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+
+import streaming
+from streaming import TARGET_COLUMN, train_streaming
+
+CHUNK_SIZE = 7
+
+
+def write_survey(path, n_rows=50):
+    rng = np.random.RandomState(0)
+    pd.DataFrame({
+        "FLOW": rng.randint(0, 11, n_rows).astype(float),
+        "TODO_COMPLETED": rng.randint(0, 11, n_rows).astype(float),
+        "SLEEP_HOURS": rng.randint(1, 11, n_rows).astype(float),
+        "DAILY_STRESS": rng.randint(0, 6, n_rows).astype(str),
+        "GENDER": rng.choice(["Female", "Male"], n_rows),
+        "AGE": rng.choice(["Less than 20", "21 to 35", "36 to 50", "51 or more"], n_rows),
+        TARGET_COLUMN: rng.uniform(500, 800, n_rows),
+    }).to_csv(path, index=False)
+
+
+def held_out(n_rows, random_state=42):
+    """The held-out mask train_streaming draws, chunk by chunk"""
+    split = np.random.RandomState(random_state)
+    return np.concatenate([streaming.test_rows(min(CHUNK_SIZE, n_rows - start), split)
+                           for start in range(0, n_rows, CHUNK_SIZE)])
+
+
+def test_preprocessing_ignores_held_out_rows(tmp_path):
+    path = tmp_path / "survey.csv"
+    write_survey(path)
+    pipeline, target_scaler, metrics = train_streaming(str(path), CHUNK_SIZE, epochs=1, verbose=False)
+
+    df = pd.read_csv(path)
+    train = df[~held_out(len(df))]
+    assert metrics["train_rows"] == len(train)
+    assert metrics["test_rows"] == len(df) - len(train)
+
+    scaler = pipeline.named_steps["preprocessor"].named_transformers_["num"].named_steps["scaler"]
+    np.testing.assert_allclose(scaler.mean_, train[["FLOW", "TODO_COMPLETED", "SLEEP_HOURS"]].mean())
+    assert target_scaler.data_min_[0] == train[TARGET_COLUMN].min()
+    assert target_scaler.data_max_[0] == train[TARGET_COLUMN].max()
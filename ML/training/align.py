@@ -0,0 +1,107 @@
+import os
+import numpy as np
+import pandas as pd
+from ingest import process_pool
+
+"""
+Per-user alignment of sensor streams.
+
+train.py used to chain global pd.merge_asof(..., by='uid') calls, each sorting
+the whole dataset and matching every user on one core. Readings are only ever
+matched within a user, so align_streams splits the users into shards, merges
+each shard in a worker process and reassembles the rows. Only the datetime key
+column is sorted globally, to reproduce the row order (and the matches between
+equal timestamps) of the chained merges exactly.
+
+Usage:
+   from align import align_streams
+   merged_data = align_streams(mood_data, [activity_data, sleep_data])
+"""
+
+
+def sort_positions(keys, on):
+    """Row positions in the order frame.sort_values(on) puts them (same algorithm, key column only)"""
+    return pd.DataFrame({on: keys}).sort_values(on).index.to_numpy()
+
+
+def shard_users(counts, n_shards):
+    """Assign users to shards with roughly equal row counts (largest users first)"""
+    shards = [[] for _ in range(n_shards)]
+    loads = [0] * n_shards
+    for uid, count in sorted(counts.items(), key=lambda item: (-item[1], str(item[0]))):
+        target = loads.index(min(loads))
+        shards[target].append(uid)
+        loads[target] += count
+    return [shard for shard in shards if shard]
+
+
+def merge_shard(left, rights, on, by, direction, tolerances):
+    """Run the chained merge_asof for one shard of users (runs in a worker process)"""
+    merged = left
+    for right, tolerance in zip(rights, tolerances):
+        merged = pd.merge_asof(merged, right, on=on, by=by, direction=direction, tolerance=tolerance)
+    return merged
+
+
+def align_streams(left, rights, on="datetime", by="uid", direction="nearest", tolerances=None,
+                  n_jobs=None, n_shards=None):
+    """
+    Attach the nearest reading of each stream in `rights` to every row of `left`
+
+    Equivalent to chaining pd.merge_asof(left.sort_values(on), right.sort_values(on), on=on,
+    by=by, direction=direction) for each right frame, including the order of the result.
+
+    Args:
+        left: Frame whose rows are kept (e.g. mood readings)
+        rights: Frames to merge in, in order
+        tolerances: Optional maximum distance per right frame (e.g. pd.Timedelta("1D")), None for no limit
+        n_jobs: Worker processes (None = one per CPU, 1 = no pool)
+        n_shards: Number of user shards (default: one per worker)
+
+    Returns:
+        Merged frame with a fresh RangeIndex
+    """
+    tolerances = list(tolerances) if tolerances is not None else [None] * len(rights)
+    if len(tolerances) != len(rights):
+        raise ValueError("Need one tolerance per right frame")
+
+    # Row order of the chained merges: each one re-sorts the previous result by `on`
+    left_keys = left[on].to_numpy()
+    order = np.arange(len(left))
+    for _ in rights:
+        order = order[sort_positions(left_keys[order], on)]
+
+    # Right rows in the order their global sort would put them, so ties resolve the same way
+    rights = [right.iloc[sort_positions(right[on].to_numpy(), on)] for right in rights]
+
+    if len(left) == 0:
+        return merge_shard(left, rights, on, by, direction, tolerances)
+
+    if n_shards is None:
+        n_shards = n_jobs or os.cpu_count() or 1
+    shards = shard_users(left[by].value_counts().to_dict(), n_shards)
+    shard_of = {uid: i for i, shard in enumerate(shards) for uid in shard}
+
+    # Users only in a right frame can't match anything and are dropped
+    left_shards = left[by].map(shard_of).to_numpy()[order]
+    right_shards = [right[by].map(shard_of).to_numpy() for right in rights]
+    tasks = []
+    for i in range(len(shards)):
+        positions = order[left_shards == i]
+        shard_rights = [right[shard == i] for right, shard in zip(rights, right_shards)]
+        tasks.append((positions, left.iloc[positions], shard_rights))
+
+    args = ([task[1] for task in tasks], [task[2] for task in tasks], [on] * len(tasks), [by] * len(tasks),
+            [direction] * len(tasks), [tolerances] * len(tasks))
+    pool = process_pool(n_jobs) if len(tasks) > 1 else None
+    if pool is None:
+        results = list(map(merge_shard, *args))
+    else:
+        with pool:
+            results = list(pool.map(merge_shard, *args))
+
+    # Put every left row back where the chained merges would have placed it
+    merged = pd.concat(results, ignore_index=True)
+    row_of = np.empty(len(left), dtype=np.int64)
+    row_of[np.concatenate([task[0] for task in tasks])] = np.arange(len(merged))
+    return merged.iloc[row_of[order]].reset_index(drop=True)
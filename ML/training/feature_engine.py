@@ -0,0 +1,283 @@
+import json
+import math
+from collections import deque
+
+"""
+Incremental per-user rolling features.
+
+train.py's rolling-window and diff features (mood_3day_avg, sleep_quality_trend,
+activity_7day_avg, ...) are recomputed with groupby('uid').rolling(...) over the
+whole history. FeatureEngine keeps a small state per user and feature instead,
+so each new reading is folded in with O(1) work. The running mean uses the same
+compensated add/remove summation as pandas' rolling mean, so replaying history
+reproduces the batch values exactly. The state can be checkpointed to JSON and
+restored, which lets the same engine serve both training and live prediction.
+
+train.py stores the checkpoint as STATE_FILE in the sensor_mood registry version
+it trained, so the state always matches the model it was trained with.
+
+Usage:
+   engine = FeatureEngine()
+   engine.update("u00", "Mood", {"mood_score": 0.625})
+   graph.predict_mood_improvement(engine.features("u00"))
+"""
+
+# Stream -> [(source column, feature name, window)]; windows count readings, like train.py
+ROLLING_FEATURES = {
+    "Mood": [
+        ("mood_score", "mood_3day_avg", 3),
+        ("mood_score", "mood_7day_avg", 7),
+    ],
+    "Activity": [
+        ("total_activity_score", "activity_3day_avg", 3),
+        ("total_activity_score", "activity_7day_avg", 7),
+    ],
+    "Sleep": [
+        ("sleep_quality", "sleep_quality_3day_avg", 3),
+        ("sleep_duration", "sleep_duration_3day_avg", 3),
+    ],
+}
+
+# Stream -> [(source column, feature name)]; change since the user's previous reading
+DIFF_FEATURES = {
+    "Mood": [("mood_score", "mood_trend")],
+    "Activity": [("total_activity_score", "activity_trend")],
+    "Sleep": [
+        ("sleep_quality", "sleep_quality_trend"),
+        ("sleep_duration", "sleep_duration_trend"),
+    ],
+}
+
+CHECKPOINT_VERSION = 1
+
+# Name of the checkpoint inside a sensor_mood registry version
+STATE_FILE = "feature_state.json"
+
+
+def stream_columns(stream):
+    """Source columns a stream's readings need to provide"""
+    columns = [source for source, _, _ in ROLLING_FEATURES.get(stream, [])]
+    columns += [source for source, _ in DIFF_FEATURES.get(stream, [])]
+    return list(dict.fromkeys(columns))
+
+
+class RollingMean:
+    """
+    Mean of the last `window` readings, NaN until the window is full or while it holds a NaN
+
+    Mirrors pandas' roll_mean: Kahan-compensated sums for values entering and
+    leaving the window, plus its corrections for runs of equal values and sign.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.values = deque()
+        self.nobs = 0
+        self.sum_x = 0.0
+        self.neg_ct = 0
+        self.compensation_add = 0.0
+        self.compensation_remove = 0.0
+        self.num_consecutive_same_value = 0
+        self.prev_value = None
+
+    def _add(self, value):
+        if value == value:
+            self.nobs += 1
+            y = value - self.compensation_add
+            t = self.sum_x + y
+            self.compensation_add = t - self.sum_x - y
+            self.sum_x = t
+            if math.copysign(1.0, value) < 0:
+                self.neg_ct += 1
+            if value == self.prev_value:
+                self.num_consecutive_same_value += 1
+            else:
+                self.num_consecutive_same_value = 1
+            self.prev_value = value
+
+    def _remove(self, value):
+        if value == value:
+            self.nobs -= 1
+            y = -value - self.compensation_remove
+            t = self.sum_x + y
+            self.compensation_remove = t - self.sum_x - y
+            self.sum_x = t
+            if math.copysign(1.0, value) < 0:
+                self.neg_ct -= 1
+
+    def update(self, value):
+        """Add the newest reading and return the window mean"""
+        value = float(value)
+        if self.prev_value is None:
+            self.prev_value = value
+        if len(self.values) == self.window:
+            self._remove(self.values.popleft())
+        self.values.append(value)
+        self._add(value)
+
+        if self.nobs < self.window:
+            return math.nan
+        result = self.sum_x / self.nobs
+        if self.num_consecutive_same_value >= self.nobs:
+            result = self.prev_value
+        elif self.neg_ct == 0 and result < 0:
+            result = 0.0
+        elif self.neg_ct == self.nobs and result > 0:
+            result = 0.0
+        return result
+
+    def state(self):
+        return {
+            "window": self.window,
+            "values": list(self.values),
+            "nobs": self.nobs,
+            "sum_x": self.sum_x,
+            "neg_ct": self.neg_ct,
+            "compensation_add": self.compensation_add,
+            "compensation_remove": self.compensation_remove,
+            "num_consecutive_same_value": self.num_consecutive_same_value,
+            "prev_value": self.prev_value,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        rolling = cls(state["window"])
+        rolling.values = deque(state["values"])
+        for key in ("nobs", "sum_x", "neg_ct", "compensation_add", "compensation_remove",
+                    "num_consecutive_same_value", "prev_value"):
+            setattr(rolling, key, state[key])
+        return rolling
+
+
+class FeatureEngine:
+    def __init__(self):
+        # uid -> stream -> {"rolling": {feature: RollingMean}, "previous": {column: value}, "latest": {name: value}}
+        self.users = {}
+
+    def _stream_state(self, uid, stream):
+        if stream not in ROLLING_FEATURES and stream not in DIFF_FEATURES:
+            raise ValueError(f"Unknown stream '{stream}'")
+        streams = self.users.setdefault(uid, {})
+        if stream not in streams:
+            streams[stream] = {
+                "rolling": {feature: RollingMean(window)
+                            for _, feature, window in ROLLING_FEATURES.get(stream, [])},
+                "previous": {},
+                "latest": {},
+            }
+        return streams[stream]
+
+    def update(self, uid, stream, values):
+        """
+        Fold one reading into a user's state
+
+        Args:
+            uid: User id
+            stream: "Mood", "Activity" or "Sleep"
+            values: Dictionary with the stream's source columns (see stream_columns); other keys
+                are kept as the user's latest values for that stream
+
+        Returns:
+            Dictionary of the rolling and diff features for this reading
+        """
+        state = self._stream_state(uid, stream)
+        features = {}
+        for source, feature, _ in ROLLING_FEATURES.get(stream, []):
+            features[feature] = state["rolling"][feature].update(values.get(source, math.nan))
+        for source, feature in DIFF_FEATURES.get(stream, []):
+            value = float(values.get(source, math.nan))
+            features[feature] = value - state["previous"].get(source, math.nan)
+        for source in stream_columns(stream):
+            state["previous"][source] = float(values.get(source, math.nan))
+
+        state["latest"] = {**values, **features}
+        return features
+
+    def features(self, uid, fill_value=0.0):
+        """
+        The user's current feature values across all streams, for live prediction
+
+        Missing and NaN values are replaced with fill_value, as train.py does with fillna(0).
+        """
+        result = {}
+        for state in self.users.get(uid, {}).values():
+            for name, value in state["latest"].items():
+                if isinstance(value, float) and math.isnan(value):
+                    value = fill_value
+                result[name] = value
+        return result
+
+    def replay(self, df, stream):
+        """
+        Run a stream's history through the engine
+
+        Args:
+            df: Frame with uid, datetime and the stream's source columns
+            stream: Stream name
+
+        Returns:
+            Copy of df sorted by uid and datetime (like train.py) with the feature columns added
+        """
+        import pandas as pd
+
+        df = df.sort_values(["uid", "datetime"])
+        columns = stream_columns(stream)
+        names = [feature for _, feature, _ in ROLLING_FEATURES.get(stream, [])]
+        names += [feature for _, feature in DIFF_FEATURES.get(stream, [])]
+
+        rows = {name: [] for name in names}
+        for uid, *values in zip(df["uid"], *[df[column].astype(float) for column in columns]):
+            features = self.update(uid, stream, dict(zip(columns, values)))
+            for name in names:
+                rows[name].append(features[name])
+
+        df = df.copy()
+        for name in names:
+            df[name] = pd.Series(rows[name], index=df.index, dtype=float)
+        return df
+
+    def checkpoint(self, path):
+        """Write every user's state to a JSON file"""
+        users = {
+            uid: {
+                stream: {
+                    "rolling": {feature: rolling.state() for feature, rolling in state["rolling"].items()},
+                    "previous": state["previous"],
+                    "latest": state["latest"],
+                }
+                for stream, state in streams.items()
+            }
+            for uid, streams in self.users.items()
+        }
+        with open(path, "w") as f:
+            json.dump({"version": CHECKPOINT_VERSION, "users": users}, f, default=_json_value)
+
+    @classmethod
+    def restore(cls, path):
+        """Load an engine from a checkpoint written by checkpoint()"""
+        with open(path, "r") as f:
+            checkpoint = json.load(f)
+        if checkpoint.get("version") != CHECKPOINT_VERSION:
+            raise ValueError(f"Unsupported feature checkpoint version {checkpoint.get('version')}")
+
+        engine = cls()
+        for uid, streams in checkpoint["users"].items():
+            engine.users[uid] = {
+                stream: {
+                    "rolling": {feature: RollingMean.from_state(rolling)
+                                for feature, rolling in state["rolling"].items()},
+                    "previous": state["previous"],
+                    "latest": state["latest"],
+                }
+                for stream, state in streams.items()
+            }
+        return engine
+
+
+def _json_value(value):
+    """Convert numpy scalars and timestamps kept in "latest" to JSON values"""
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"Cannot store {type(value).__name__} in a feature checkpoint")
@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+import os
+import copy
+import glob
+import json
+import uuid
+import argparse
+import numpy as np
+import joblib
+from scipy import sparse
+from sklearn.base import clone
+from sklearn.pipeline import Pipeline
+from ingest import process_pool
+
+"""
+Sharded random forest training through a shared directory.
+
+The coordinator fits the preprocessor once and writes the transformed training
+data, the unfitted regressor and a shard plan to a job directory. Any number of
+workers (processes on this machine, or other machines that mount the same
+directory) claim shards, fit their share of the trees and write each sub-forest
+to disk. The merge step concatenates the sub-forests' estimators_ into one
+Pipeline that loads and predicts like mood_prediction_model.joblib.
+
+Each shard replays the forest's random state up to its first tree, so without
+row shards the merged forest is the exact forest a single fit would build.
+With --row-shards each shard's trees only see its own slice of the rows.
+
+Preparing a job clears the shards of any earlier job in the directory. Every job
+gets an id that each shard file records, and merging refuses shards from
+another job.
+
+Usage:
+   python wellbeing_train.py --shards 8                        # prepare, fit locally, merge
+   python wellbeing_train.py --shards 8 --job-dir /shared/job --prepare-only
+   python forest_shards.py work /shared/job                    # on every machine
+   python forest_shards.py merge /shared/job --output mood_prediction_model.joblib
+"""
+
+JOB_FILE = "job.json"
+TEMPLATE_FILE = "template.joblib"
+
+# Same bound sklearn uses when drawing per-tree seeds
+MAX_SEED = np.iinfo(np.int32).max
+
+
+def shard_path(job_dir, shard_id):
+    return os.path.join(job_dir, f"shard_{shard_id:04d}.joblib")
+
+
+def plan_shards(n_trees, n_shards, row_shards=1):
+    """Split n_trees into n_shards contiguous ranges; shard i trains on row shard i % row_shards"""
+    sizes = [n_trees // n_shards + (1 if i < n_trees % n_shards else 0) for i in range(n_shards)]
+    shards, start = [], 0
+    for i, size in enumerate(sizes):
+        if size:
+            shards.append({"id": i, "tree_start": start, "n_trees": size, "row_shard": i % row_shards})
+        start += size
+    return shards
+
+
+def prepare_job(pipeline, X, y, job_dir, n_shards, row_shards=1):
+    """
+    Fit the preprocessor and write everything workers need to the job directory
+
+    Args:
+        pipeline: Unfitted Pipeline with 'preprocessor' and a forest 'regressor' step
+        X, y: Training data
+        job_dir: Directory shared by the coordinator and all workers
+        n_shards: Number of sub-forests to train
+        row_shards: Number of row partitions (1 = every shard sees all rows)
+    """
+    os.makedirs(job_dir, exist_ok=True)
+    # Shards and claims of an earlier job would be skipped by workers and merged with the new preprocessor
+    for stale in glob.glob(os.path.join(job_dir, JOB_FILE)) + glob.glob(os.path.join(job_dir, "shard_*")):
+        os.remove(stale)
+
+    preprocessor = clone(pipeline.named_steps["preprocessor"]).fit(X, y)
+    regressor = clone(pipeline.named_steps["regressor"])
+
+    # Forests train on float32 anyway, so the stored matrix is exactly what every tree sees
+    X_transformed = preprocessor.transform(X)
+    if sparse.issparse(X_transformed):
+        X_transformed = X_transformed.toarray()
+    np.save(os.path.join(job_dir, "X.npy"), np.asarray(X_transformed, dtype=np.float32))
+    np.save(os.path.join(job_dir, "y.npy"), np.asarray(y, dtype=np.float64))
+
+    random_state = regressor.random_state
+    if not isinstance(random_state, (int, np.integer)):
+        random_state = int(np.random.randint(MAX_SEED))
+    rows = np.random.RandomState(random_state).permutation(len(y)) % row_shards
+    np.save(os.path.join(job_dir, "rows.npy"), rows.astype(np.int32))
+
+    joblib.dump({"preprocessor": preprocessor, "regressor": regressor}, os.path.join(job_dir, TEMPLATE_FILE))
+    job = {
+        "job_id": uuid.uuid4().hex,
+        "n_trees": regressor.n_estimators,
+        "random_state": int(random_state),
+        "row_shards": row_shards,
+        "shards": plan_shards(regressor.n_estimators, n_shards, row_shards),
+    }
+    # Written last: workers can't start on a job before all of its files are in place
+    with open(os.path.join(job_dir, JOB_FILE + ".tmp"), "w") as f:
+        json.dump(job, f, indent=2)
+    os.replace(os.path.join(job_dir, JOB_FILE + ".tmp"), os.path.join(job_dir, JOB_FILE))
+    return job
+
+
+def load_job(job_dir):
+    with open(os.path.join(job_dir, JOB_FILE), "r") as f:
+        return json.load(f)
+
+
+def fit_shard(job_dir, shard_id):
+    """Fit one sub-forest and write it next to the job (runs in a worker process)"""
+    job = load_job(job_dir)
+    shard = next(shard for shard in job["shards"] if shard["id"] == shard_id)
+    regressor = joblib.load(os.path.join(job_dir, TEMPLATE_FILE))["regressor"]
+
+    X = np.load(os.path.join(job_dir, "X.npy"), mmap_mode="r")
+    y = np.load(os.path.join(job_dir, "y.npy"), mmap_mode="r")
+    if job["row_shards"] > 1:
+        rows = np.flatnonzero(np.load(os.path.join(job_dir, "rows.npy")) == shard["row_shard"])
+        X, y = X[rows], y[rows]
+
+    # Skip the seeds of the trees before this shard so its trees match a single full fit
+    random_state = np.random.RandomState(job["random_state"])
+    random_state.randint(MAX_SEED, size=shard["tree_start"])
+    regressor.set_params(n_estimators=shard["n_trees"], random_state=random_state)
+    regressor.fit(np.asarray(X), np.asarray(y))
+
+    path = shard_path(job_dir, shard_id)
+    joblib.dump({"job_id": job["job_id"], "shard": shard_id, "forest": regressor}, path + ".tmp")
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def claim_shard(job_dir, shard_id):
+    """Atomically claim a shard so workers on other machines skip it"""
+    try:
+        os.close(os.open(shard_path(job_dir, shard_id) + ".lock", os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        return True
+    except FileExistsError:
+        return False
+
+
+def run_worker(job_dir):
+    """Fit every shard that no other worker has claimed yet; returns the shards this worker fitted"""
+    fitted = []
+    for shard in load_job(job_dir)["shards"]:
+        if not os.path.exists(shard_path(job_dir, shard["id"])) and claim_shard(job_dir, shard["id"]):
+            fit_shard(job_dir, shard["id"])
+            fitted.append(shard["id"])
+    return fitted
+
+
+def run_local(job_dir, n_jobs=None):
+    """Fit all shards in a process pool on this machine"""
+    shard_ids = [shard["id"] for shard in load_job(job_dir)["shards"]]
+    pool = process_pool(n_jobs) if len(shard_ids) > 1 else None
+    if pool is None:
+        return [fit_shard(job_dir, shard_id) for shard_id in shard_ids]
+    with pool:
+        return list(pool.map(fit_shard, [job_dir] * len(shard_ids), shard_ids))
+
+
+def merge_job(job_dir):
+    """
+    Combine the sub-forests into one fitted Pipeline
+
+    Returns:
+        Pipeline(preprocessor, regressor) equivalent to fitting the template in one process
+    """
+    job = load_job(job_dir)
+    missing = [shard["id"] for shard in job["shards"] if not os.path.exists(shard_path(job_dir, shard["id"]))]
+    if missing:
+        raise FileNotFoundError(f"Shards not finished yet: {', '.join(map(str, missing))}")
+
+    template = joblib.load(os.path.join(job_dir, TEMPLATE_FILE))
+    forests = []
+    for shard in job["shards"]:
+        fitted = joblib.load(shard_path(job_dir, shard["id"]))
+        if not isinstance(fitted, dict) or fitted.get("job_id") != job["job_id"]:
+            raise ValueError(f"Shard {shard['id']} was fitted for a different job; fit it again")
+        forests.append(fitted["forest"])
+
+    regressor = copy.deepcopy(forests[0])
+    regressor.estimators_ = [tree for forest in forests for tree in forest.estimators_]
+    regressor.set_params(**template["regressor"].get_params(deep=False))
+    if len(regressor.estimators_) != job["n_trees"]:
+        raise ValueError(f"Merged {len(regressor.estimators_)} trees, expected {job['n_trees']}")
+
+    return Pipeline(steps=[
+        ("preprocessor", template["preprocessor"]),
+        ("regressor", regressor),
+    ])
+
+
+def train_sharded(pipeline, X, y, job_dir, n_shards, row_shards=1, n_jobs=None):
+    """Prepare the job, fit every shard locally and return the merged Pipeline"""
+    prepare_job(pipeline, X, y, job_dir, n_shards, row_shards)
+    run_local(job_dir, n_jobs)
+    return merge_job(job_dir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fit or merge sharded forest training jobs")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    work_parser = subparsers.add_parser("work", help="Fit unclaimed shards of a job")
+    work_parser.add_argument("job_dir")
+    work_parser.add_argument("--shard", type=int, help="Fit only this shard (no claiming)")
+
+    merge_parser = subparsers.add_parser("merge", help="Merge finished shards into one model")
+    merge_parser.add_argument("job_dir")
+    merge_parser.add_argument("--output", default="mood_prediction_model.joblib")
+    args = parser.parse_args()
+
+    if args.command == "work":
+        if args.shard is not None:
+            fit_shard(args.job_dir, args.shard)
+            print(f"Fitted shard {args.shard}")
+        else:
+            fitted = run_worker(args.job_dir)
+            print(f"Fitted shards: {', '.join(map(str, fitted)) or 'none left'}")
+    else:
+        joblib.dump(merge_job(args.job_dir), args.output)
+        print(f"Wrote merged model to {args.output}")
@@ -0,0 +1,308 @@
+import os
+import json
+import glob
+import hashlib
+import multiprocessing
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+"""
+Parallel, cached loading of the StudentLife sensor JSON files.
+
+Every <stream>/*.json file is parsed in a process pool and turned into the same
+per-user DataFrame train.py used to build inline. The processed frame for each
+file is written to a columnar .npz cache keyed by the file's content hash, so
+reruns only reparse files that changed.
+Usage:
+   from ingest import load_stream
+   mood_data = load_stream(path, "Mood")
+"""
+
+CACHE_DIR_NAME = ".ingest_cache"
+
+# Bumped whenever the per-stream processing changes so old cache files are ignored
+CACHE_VERSION = 2
+
+# Null markers of text columns in the cache
+NULL_NONE = 1
+NULL_NAN = 2
+
+
+def to_float(values):
+    """Parse a text column exactly like float() would; malformed values become NaN"""
+    try:
+        return values.astype(float)
+    except (TypeError, ValueError):
+        # pd.to_numeric can differ from float() in the last digit, so only use it when needed
+        return pd.to_numeric(values, errors="coerce").astype(float)
+
+
+def split_location(location, missing=("Unknown",), require_comma=False):
+    """
+    Split "lat,long" strings into two float columns without a Python call per row
+
+    Numeric locations are used as the latitude. Anything else (missing markers,
+    NaN, None) becomes NaN in both columns. As with the per-row float()/None
+    parsing train.py used to do, a column where no row has a number is all None
+    (dtype object) instead of float64, so concatenated frames keep the same dtypes.
+    """
+    is_text = location.str.len().notna()
+    valid = is_text & ~location.isin(list(missing))
+    if require_comma:
+        valid &= location.str.contains(",", regex=False).fillna(False).astype(bool)
+
+    parts = location.where(valid).str.split(",", expand=True)
+    if parts.shape[1] < 2:
+        parts = parts.reindex(columns=[0, 1])
+    latitude = to_float(parts[0])
+    longitude = to_float(parts[1])
+
+    # Non-string locations that are numbers are used as the latitude
+    numeric = pd.to_numeric(location.where(~is_text), errors="coerce").astype(float)
+    latitude = latitude.where(valid, numeric)
+    if not valid.any():
+        # Only a numeric location (even NaN) can still give a latitude; None doesn't
+        if not any(isinstance(value, (int, float)) for value in location):
+            latitude = all_none(latitude)
+        longitude = all_none(longitude)
+    return latitude, longitude
+
+
+def all_none(values):
+    return pd.Series([None] * len(values), index=values.index, dtype=object)
+
+
+def process_mood(mood_df, file):
+    # Ensure all required columns exist
+    required_columns = ['happy', 'sad', 'happyornot', 'sadornot', 'location', 'resp_time']
+    for col in required_columns:
+        if col not in mood_df.columns:
+            print(f"Warning: Column {col} not found in {file}")
+
+    # Convert string values to numeric where appropriate
+    mood_df['happy'] = pd.to_numeric(mood_df['happy'], errors='coerce')
+    mood_df['sad'] = pd.to_numeric(mood_df['sad'], errors='coerce')
+    mood_df['happyornot'] = pd.to_numeric(mood_df['happyornot'], errors='coerce')
+    mood_df['sadornot'] = pd.to_numeric(mood_df['sadornot'], errors='coerce')
+
+    # Create composite mood score (normalized to 0-1 range)
+    # Higher happy and lower sad values indicate better mood
+    mood_df['mood_score'] = ((mood_df['happy'] / 4) - (mood_df['sad'] / 4) + 1) / 2
+
+    # Process location data
+    mood_df['has_location'] = mood_df['location'] != 'Unknown'
+    mood_df['latitude'], mood_df['longitude'] = split_location(mood_df['location'])
+
+    # Convert timestamp
+    mood_df['datetime'] = pd.to_datetime(mood_df['resp_time'], unit='s')
+    return mood_df
+
+
+def process_activity(activity_df, file):
+    # Convert string values to numeric where appropriate
+    numeric_columns = ['Social2', 'null', 'other_relaxing', 'other_working', 'relaxing', 'working']
+    for col in numeric_columns:
+        if col in activity_df.columns:
+            activity_df[col] = pd.to_numeric(activity_df[col], errors='coerce')
+
+    # Convert timestamp
+    activity_df['datetime'] = pd.to_datetime(activity_df['resp_time'], unit='s')
+
+    # Process location data
+    if 'location' in activity_df.columns:
+        activity_df['has_location'] = ~activity_df['location'].isin(['Unknown', 'null'])
+        activity_df['latitude'], activity_df['longitude'] = split_location(
+            activity_df['location'], missing=('Unknown', 'null'), require_comma=True
+        )
+    else:
+        activity_df['has_location'] = False
+        activity_df['latitude'] = None
+        activity_df['longitude'] = None
+
+    # Create activity categories with safe column access
+    activity_df['is_social'] = activity_df['Social2'].notna().astype(int) if 'Social2' in activity_df.columns else 0
+    activity_df['is_working'] = activity_df['working'].notna().astype(int) if 'working' in activity_df.columns else 0
+    activity_df['is_relaxing'] = activity_df['relaxing'].notna().astype(int) if 'relaxing' in activity_df.columns else 0
+
+    # Create activity intensity scores with safe column access
+    activity_df['social_intensity'] = activity_df['Social2'].fillna(0) if 'Social2' in activity_df.columns else 0
+    activity_df['work_intensity'] = activity_df['working'].fillna(0) if 'working' in activity_df.columns else 0
+    activity_df['relax_intensity'] = activity_df['relaxing'].fillna(0) if 'relaxing' in activity_df.columns else 0
+
+    # Calculate total activity score
+    activity_df['total_activity_score'] = (
+        activity_df['social_intensity'] +
+        activity_df['work_intensity'] +
+        activity_df['relax_intensity']
+    ) / 3
+    return activity_df
+
+
+def process_sleep(sleep_df, file):
+    # Convert string values to numeric where appropriate
+    numeric_columns = ['hour', 'rate', 'social']
+    for col in numeric_columns:
+        if col in sleep_df.columns:
+            sleep_df[col] = pd.to_numeric(sleep_df[col], errors='coerce')
+
+    # Process location data
+    sleep_df['has_location'] = sleep_df['location'] != 'Unknown'
+    sleep_df['latitude'], sleep_df['longitude'] = split_location(sleep_df['location'])
+
+    # Convert timestamp
+    sleep_df['datetime'] = pd.to_datetime(sleep_df['resp_time'], unit='s')
+
+    # Create sleep quality features
+    sleep_df['sleep_quality'] = sleep_df['rate'].fillna(0)
+    sleep_df['sleep_duration'] = sleep_df['hour'].fillna(0)
+
+    # Create sleep patterns
+    sleep_df['is_short_sleep'] = (sleep_df['sleep_duration'] < 6).astype(int)
+    sleep_df['is_long_sleep'] = (sleep_df['sleep_duration'] > 8).astype(int)
+    sleep_df['is_good_sleep'] = (sleep_df['sleep_quality'] >= 3).astype(int)
+    return sleep_df
+
+
+STREAM_PROCESSORS = {
+    "Mood": process_mood,
+    "Activity": process_activity,
+    "Sleep": process_sleep,
+}
+
+
+def process_pool(n_jobs=None):
+    """
+    Worker pool for the training scripts, or None if work should run in this process
+
+    The training scripts run top to bottom without a __main__ guard, so workers are
+    forked; where fork isn't available (Windows) the work runs serially instead.
+    """
+    if n_jobs == 1 or "fork" not in multiprocessing.get_all_start_methods():
+        return None
+    return ProcessPoolExecutor(max_workers=n_jobs, mp_context=multiprocessing.get_context("fork"))
+
+
+def file_uid(file):
+    # Extract user ID from filename (e.g., "Mood_u00.json" -> "u00")
+    return os.path.basename(file).split('.')[0].split('_')[1]
+
+
+def file_hash(file):
+    with open(file, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def parse_file(stream, file):
+    """Parse and process one sensor file (runs in a worker process); None if the file is empty"""
+    with open(file, "r") as f:
+        data = json.load(f)
+
+    # Skip empty files
+    if not data:
+        return None
+
+    df = pd.DataFrame(data)
+    df['uid'] = file_uid(file)
+    return STREAM_PROCESSORS[stream](df, file)
+
+
+def frame_to_npz(df, path, source_hash):
+    """
+    Store a DataFrame column by column; text columns get a separate mask telling None from NaN
+
+    Returns:
+        False (and writes nothing) if a text column holds values other than strings,
+        which the cache could not give back unchanged
+    """
+    arrays = {"__columns__": np.array(list(df.columns), dtype=str),
+              "__source__": np.array([source_hash, str(CACHE_VERSION)])}
+    for i, column in enumerate(df.columns):
+        values = df[column]
+        if values.dtype.kind in "biufM":
+            arrays[f"c{i}"] = values.to_numpy()
+        else:
+            objects = values.to_numpy(dtype=object)
+            nulls = np.array([NULL_NONE if value is None else NULL_NAN if pd.isna(value) else 0
+                              for value in objects], dtype=np.int8)
+            if not all(isinstance(value, str) for value in objects[nulls == 0]):
+                return False
+            arrays[f"c{i}"] = np.where(nulls > 0, "", objects).astype(str)
+            arrays[f"n{i}"] = nulls
+    tmp_path = path + ".tmp.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+    return True
+
+
+def frame_from_npz(path, source_hash):
+    """Load a cached frame, or None if it was built from a different version of the file"""
+    if not os.path.exists(path):
+        return None
+    with np.load(path, allow_pickle=False) as data:
+        if list(data["__source__"]) != [source_hash, str(CACHE_VERSION)]:
+            return None
+        columns = {}
+        for i, column in enumerate(data["__columns__"]):
+            values = data[f"c{i}"]
+            if f"n{i}" in data:
+                nulls = data[f"n{i}"]
+                values = values.astype(object)
+                values[nulls == NULL_NONE] = None
+                values[nulls == NULL_NAN] = np.nan
+            columns[str(column)] = values
+    return pd.DataFrame(columns)
+
+
+def load_stream(data_dir, stream, n_jobs=None, cache_dir=None):
+    """
+    Load every file of one sensor stream into a single DataFrame
+
+    Args:
+        data_dir: Directory containing the Mood/, Activity/, Sleep/ folders
+        stream: One of STREAM_PROCESSORS
+        n_jobs: Worker processes for parsing (None = one per CPU, 1 = no pool)
+        cache_dir: Where processed files are cached (default: <data_dir>/.ingest_cache, False disables)
+
+    Returns:
+        Concatenated DataFrame of all non-empty files, in the same order train.py used
+    """
+    files = glob.glob(os.path.join(data_dir, stream, "*.json"))
+    if cache_dir is None:
+        cache_dir = os.path.join(data_dir, CACHE_DIR_NAME)
+    if cache_dir:
+        os.makedirs(os.path.join(cache_dir, stream), exist_ok=True)
+
+    frames = [None] * len(files)
+    hashes = [file_hash(file) for file in files] if cache_dir else [None] * len(files)
+    cache_paths = [os.path.join(cache_dir, stream, os.path.basename(file)[:-5] + ".npz") if cache_dir else None
+                   for file in files]
+
+    # Reuse cached frames for files whose contents haven't changed
+    to_parse = []
+    for i, file in enumerate(files):
+        if cache_dir:
+            frames[i] = frame_from_npz(cache_paths[i], hashes[i])
+        if frames[i] is None:
+            to_parse.append(i)
+
+    pool = process_pool(n_jobs) if len(to_parse) > 1 else None
+    if pool is None:
+        parsed = [parse_file(stream, files[i]) for i in to_parse]
+    else:
+        with pool:
+            parsed = list(pool.map(parse_file, [stream] * len(to_parse), [files[i] for i in to_parse]))
+
+    empty = set()
+    for i, frame in zip(to_parse, parsed):
+        if frame is None:
+            empty.add(i)
+            continue
+        frames[i] = frame
+        if cache_dir:
+            frame_to_npz(frame, cache_paths[i], hashes[i])
+
+    for i in sorted(empty):
+        print(f"Warning: Empty JSON file found: {files[i]}")
+
+    return pd.concat([frame for frame in frames if frame is not None], ignore_index=True)
@@ -0,0 +1,151 @@
+import json
+import time
+import numpy as np
+from sklearn.base import clone
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import Ridge
+from sklearn.model_selection import KFold, ParameterGrid, ParameterSampler
+from sklearn.metrics import mean_squared_error, r2_score
+from ingest import process_pool
+
+"""
+Hyperparameter search with k-fold cross-validation for the wellbeing model.
+
+The preprocessor is fitted once per fold and its transformed train/validation
+arrays are reused by every candidate, so each task only fits the regressor.
+Tasks (candidate x fold) run in a forked process pool that inherits the cached
+fold arrays instead of receiving a copy of them.
+Usage:
+   python wellbeing_train.py --search grid
+   python wellbeing_train.py --search random --iterations 30 --space space.json
+"""
+
+# Parameter values per model; a JSON file with the same layout can replace it
+SEARCH_SPACE = {
+    "forest": {
+        "n_estimators": [50, 100, 200],
+        "max_depth": [6, 8, 12, None],
+        "min_samples_split": [2, 5, 10],
+        "min_samples_leaf": [1, 2, 4],
+    },
+    "ridge": {
+        "alpha": [0.01, 0.1, 1.0, 10.0, 100.0, 1000.0],
+    },
+}
+
+MODELS = {
+    "forest": lambda params: RandomForestRegressor(random_state=42, n_jobs=1, **params),
+    "ridge": lambda params: Ridge(**params),
+}
+
+# Transformed arrays per fold, set before the pool forks so workers share them
+_FOLDS = []
+
+
+def load_search_space(path):
+    with open(path, "r") as f:
+        space = json.load(f)
+    unknown = set(space) - set(MODELS)
+    if unknown:
+        raise ValueError(f"Unknown models in search space: {', '.join(sorted(unknown))}")
+    return space
+
+
+def candidates(space, mode="grid", iterations=20, random_state=42):
+    """List of (model name, parameters) to evaluate; random mode samples `iterations` per model"""
+    result = []
+    for name, grid in space.items():
+        if mode == "grid":
+            params = ParameterGrid(grid)
+        else:
+            size = len(ParameterGrid(grid))
+            params = ParameterSampler(grid, n_iter=min(iterations, size), random_state=random_state)
+        result.extend((name, dict(p)) for p in params)
+    return result
+
+
+def prepare_folds(preprocessor, X, y, n_folds=5, random_state=42):
+    """Fit the preprocessor on each training fold and cache the transformed arrays"""
+    folds = []
+    for train_index, val_index in KFold(n_splits=n_folds, shuffle=True, random_state=random_state).split(X):
+        fitted = clone(preprocessor).fit(X.iloc[train_index], y[train_index])
+        folds.append((fitted.transform(X.iloc[train_index]), y[train_index],
+                      fitted.transform(X.iloc[val_index]), y[val_index]))
+    return folds
+
+
+def evaluate(name, params, fold):
+    """Fit one candidate on one cached fold (runs in a worker process)"""
+    X_train, y_train, X_val, y_val = _FOLDS[fold]
+    model = MODELS[name](params)
+
+    start = time.perf_counter()
+    model.fit(X_train, y_train)
+    fitted = time.perf_counter()
+    y_pred = model.predict(X_val)
+    predicted = time.perf_counter()
+
+    return {
+        "r2": r2_score(y_val, y_pred),
+        "rmse": np.sqrt(mean_squared_error(y_val, y_pred)),
+        "fit_seconds": fitted - start,
+        "predict_seconds": predicted - fitted,
+    }
+
+
+def run_search(preprocessor, X, y, space=SEARCH_SPACE, mode="grid", iterations=20, n_folds=5, n_jobs=None):
+    """
+    Cross-validate every candidate
+
+    Args:
+        preprocessor: Unfitted ColumnTransformer applied before each model
+        X, y: Training features (DataFrame) and target
+        space: Parameter values per model (see SEARCH_SPACE)
+        mode: "grid" for every combination, "random" for `iterations` samples per model
+        n_folds: Number of cross-validation folds
+        n_jobs: Worker processes (None = one per CPU, 1 = no pool)
+
+    Returns:
+        List of result dictionaries, best mean R^2 first
+    """
+    global _FOLDS
+    _FOLDS = prepare_folds(preprocessor, X, np.asarray(y), n_folds)
+    jobs = [(name, params, fold) for name, params in candidates(space, mode, iterations)
+            for fold in range(n_folds)]
+
+    pool = process_pool(n_jobs) if len(jobs) > 1 else None
+    if pool is None:
+        scores = [evaluate(*job) for job in jobs]
+    else:
+        with pool:
+            scores = list(pool.map(evaluate, *zip(*jobs)))
+
+    results = []
+    for i in range(0, len(jobs), n_folds):
+        name, params, _ = jobs[i]
+        folds = scores[i:i + n_folds]
+        r2 = [score["r2"] for score in folds]
+        results.append({
+            "model": name,
+            "params": params,
+            "mean_r2": float(np.mean(r2)),
+            "std_r2": float(np.std(r2)),
+            "mean_rmse": float(np.mean([score["rmse"] for score in folds])),
+            "fit_seconds": float(np.mean([score["fit_seconds"] for score in folds])),
+            "predict_seconds": float(np.mean([score["predict_seconds"] for score in folds])),
+        })
+    results.sort(key=lambda result: -result["mean_r2"])
+    for rank, result in enumerate(results, 1):
+        result["rank"] = rank
+    return results
+
+
+def format_results(results, limit=None):
+    """Ranked results as a text table"""
+    lines = [f"{'rank':>4}  {'model':<7}{'mean R^2':>10}{'std':>8}{'RMSE':>9}{'fit':>10}{'predict':>10}  params"]
+    for result in results[:limit]:
+        params = ", ".join(f"{key}={value}" for key, value in sorted(result["params"].items()))
+        lines.append(f"{result['rank']:>4}  {result['model']:<7}{result['mean_r2']:>10.4f}{result['std_r2']:>8.4f}"
+                     f"{result['mean_rmse']:>9.4f}{result['fit_seconds'] * 1000:>8.1f}ms"
+                     f"{result['predict_seconds'] * 1000:>8.1f}ms  {params}")
+    return "\n".join(lines)
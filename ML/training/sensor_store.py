@@ -0,0 +1,323 @@
+#!/usr/bin/env python
+import os
+import json
+import glob
+import shutil
+import argparse
+import numpy as np
+from ingest import process_pool, file_uid, file_hash
+
+"""
+Memory-mapped per-user time-series store for all StudentLife sensor streams.
+
+Every <stream>/*.json file is parsed once into typed columns: resp_time as int64
+seconds, survey answers as float64 (NaN when missing or not a number) and
+"lat,long" locations split into latitude/longitude. Records without a usable
+resp_time are skipped and counted per user in the manifest. Rows are sorted by
+time per user and each column of a stream is saved as one .npy file, so a query
+only memory-maps the columns it asks for and reads the rows in its time range.
+manifest.json indexes every (stream, uid) by row offsets and time range; files
+with identical contents (in any stream directory) are stored once and shared;
+a stream's columns include those of the files it shares with other streams.
+
+Usage:
+   python sensor_store.py build
+   python sensor_store.py query Stress u17 --days 7
+
+   from sensor_store import SensorStore
+   store = SensorStore(store_dir)
+   stress = store.recent("Stress", "u17", days=7)
+"""
+
+STORE_DIR_NAME = ".sensor_store"
+
+# Bumped whenever the on-disk layout or column typing changes
+STORE_VERSION = 2
+
+STREAMS = ["Activity", "Behavior", "Exercise", "Mood", "Mood 1", "Mood 2", "Sleep", "Social", "Stress"]
+
+TIME_COLUMN = "resp_time"
+LOCATION_COLUMN = "location"
+
+DAY_SECONDS = 24 * 60 * 60
+
+
+def default_data_dir():
+    return os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+
+def parse_number(value):
+    """Survey answers are numeric strings; anything else ("null", "", locations) is NaN"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def parse_time(value):
+    """Whole-second response times (numbers or numeric strings); anything else is None"""
+    try:
+        return int(value)
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+def parse_location(value):
+    """Split "lat,long" into two floats; malformed or missing locations are NaN"""
+    if isinstance(value, str) and "," in value:
+        latitude, longitude = value.split(",", 1)
+        return parse_number(latitude), parse_number(longitude)
+    return np.nan, np.nan
+
+
+def parse_records(file):
+    """
+    Parse one sensor file into typed columns sorted by time (runs in a worker process)
+
+    Returns:
+        (columns, skipped): dictionary of column name -> array, empty if the file has no usable
+        records, and the number of records skipped for a missing or malformed resp_time
+    """
+    with open(file, "r") as f:
+        records = json.load(f)
+
+    records = [record for record in records if isinstance(record, dict)]
+    times = [parse_time(record.get(TIME_COLUMN)) for record in records]
+    usable = [(t, record) for t, record in zip(times, records) if t is not None]
+    skipped = len(records) - len(usable)
+    if not usable:
+        return {}, skipped
+
+    records = [record for _, record in usable]
+    names = sorted({key for record in records for key in record} - {TIME_COLUMN, LOCATION_COLUMN})
+    times = np.array([t for t, _ in usable], dtype=np.int64)
+    order = np.argsort(times, kind="stable")
+
+    columns = {TIME_COLUMN: times[order]}
+    for name in names:
+        values = np.array([parse_number(record.get(name)) for record in records], dtype=np.float64)
+        columns[name] = values[order]
+    if any(LOCATION_COLUMN in record for record in records):
+        location = np.array([parse_location(record.get(LOCATION_COLUMN)) for record in records],
+                            dtype=np.float64).reshape(-1, 2)
+        columns["latitude"] = location[order, 0]
+        columns["longitude"] = location[order, 1]
+    return columns, skipped
+
+
+def build_store(data_dir=None, store_dir=None, streams=STREAMS, n_jobs=None):
+    """
+    Parse every stream and write the store
+
+    Args:
+        data_dir: Directory containing one folder per stream (default: ML/data)
+        store_dir: Output directory (default: <data_dir>/.sensor_store)
+        streams: Stream folders to include
+        n_jobs: Worker processes for parsing (None = one per CPU, 1 = no pool)
+
+    Returns:
+        The manifest that was written
+    """
+    data_dir = data_dir or default_data_dir()
+    store_dir = store_dir or os.path.join(data_dir, STORE_DIR_NAME)
+
+    files = {stream: sorted(glob.glob(os.path.join(data_dir, stream, "*.json"))) for stream in streams}
+    hashes = {file: file_hash(file) for stream in streams for file in files[stream]}
+
+    # Parse each distinct file content once, wherever it appears
+    unique = {}
+    for stream in streams:
+        for file in files[stream]:
+            unique.setdefault(hashes[file], file)
+    pool = process_pool(n_jobs) if len(unique) > 1 else None
+    if pool is None:
+        parsed = [parse_records(file) for file in unique.values()]
+    else:
+        with pool:
+            parsed = list(pool.map(parse_records, unique.values(), chunksize=8))
+    skipped = {digest: count for digest, (_, count) in zip(unique, parsed)}
+    parsed = {digest: columns for digest, (columns, _) in zip(unique, parsed)}
+
+    tmp_dir = store_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    manifest = {"version": STORE_VERSION, "data_dir": os.path.abspath(data_dir), "streams": {}}
+    stored = {}  # content hash -> (stream, start, stop) where its rows were written
+    for stream in streams:
+        # Rows of contents seen for the first time are written to this stream's columns
+        owned = []
+        start = 0
+        for file in files[stream]:
+            digest = hashes[file]
+            if digest not in stored:
+                stop = start + len(parsed[digest].get(TIME_COLUMN, ()))
+                stored[digest] = (stream, start, stop)
+                owned.append(digest)
+                start = stop
+
+        stored_names = sorted({name for digest in owned for name in parsed[digest]})
+        os.makedirs(os.path.join(tmp_dir, stream))
+        for name in stored_names:
+            dtype = np.int64 if name == TIME_COLUMN else np.float64
+            blocks = [parsed[digest].get(name, np.full(stored[digest][2] - stored[digest][1], np.nan))
+                      for digest in owned]
+            np.save(os.path.join(tmp_dir, stream, name + ".npy"), np.concatenate(blocks).astype(dtype))
+
+        users = {}
+        for file in files[stream]:
+            digest = hashes[file]
+            source, first, last = stored[digest]
+            times = parsed[digest].get(TIME_COLUMN)
+            users[file_uid(file)] = {
+                "source": source,
+                "start": first,
+                "stop": last,
+                "t_min": int(times[0]) if last > first else None,
+                "t_max": int(times[-1]) if last > first else None,
+                "hash": digest,
+                "skipped": skipped[digest],
+            }
+        # Shared files count too: a stream's columns are every column its users' rows can have
+        names = sorted({name for file in files[stream] for name in parsed[hashes[file]]})
+        manifest["streams"][stream] = {"columns": names, "stored_columns": stored_names, "rows": start,
+                                       "users": users}
+
+    with open(os.path.join(tmp_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    # Swap the finished store in so readers never see a half-written one
+    old_dir = store_dir + ".old"
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(store_dir):
+        os.replace(store_dir, old_dir)
+    os.replace(tmp_dir, store_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return manifest
+
+
+class SensorStore:
+    def __init__(self, store_dir=None):
+        self.store_dir = store_dir or os.path.join(default_data_dir(), STORE_DIR_NAME)
+        with open(os.path.join(self.store_dir, "manifest.json"), "r") as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("version") != STORE_VERSION:
+            raise ValueError(f"Sensor store in {self.store_dir} is from an older version; rebuild it")
+        self._arrays = {}
+
+    @property
+    def streams(self):
+        return list(self.manifest["streams"])
+
+    def uids(self, stream):
+        return sorted(self.manifest["streams"][stream]["users"])
+
+    def columns(self, stream):
+        return list(self.manifest["streams"][stream]["columns"])
+
+    def time_range(self, stream, uid):
+        """(first, last) response time for a user, or (None, None) if they have no rows"""
+        entry = self._entry(stream, uid)
+        return entry["t_min"], entry["t_max"]
+
+    def _entry(self, stream, uid):
+        users = self.manifest["streams"][stream]["users"]
+        if uid not in users:
+            raise KeyError(f"No {stream} data for user {uid}")
+        return users[uid]
+
+    def _column(self, stream, name):
+        key = (stream, name)
+        if key not in self._arrays:
+            values = np.load(os.path.join(self.store_dir, stream, name + ".npy"), mmap_mode="r")
+            # A plain ndarray view still reads from the mapped file but slices faster than np.memmap
+            self._arrays[key] = values.view(np.ndarray)
+        return self._arrays[key]
+
+    def query(self, stream, uid, start=None, end=None, columns=None):
+        """
+        Read one user's rows of a stream within [start, end)
+
+        Args:
+            stream: Stream name, e.g. "Stress"
+            uid: User id, e.g. "u17"
+            start, end: Unix timestamps bounding resp_time (None = unbounded)
+            columns: Columns to return (default: all columns of the stream)
+
+        Returns:
+            Dictionary of column name -> read-only array, always including resp_time
+        """
+        entry = self._entry(stream, uid)
+        names = self.columns(stream) if columns is None else list(columns)
+        if TIME_COLUMN not in names:
+            names.insert(0, TIME_COLUMN)
+
+        source, lo, hi = entry["source"], entry["start"], entry["stop"]
+        if hi > lo:
+            times = self._column(source, TIME_COLUMN)[lo:hi]
+            first = 0 if start is None else int(np.searchsorted(times, start, side="left"))
+            last = len(times) if end is None else int(np.searchsorted(times, end, side="left"))
+            lo, hi = lo + first, lo + max(first, last)
+
+        source_columns = self.manifest["streams"][source]["stored_columns"]
+        result = {}
+        for name in names:
+            if name in source_columns:
+                result[name] = self._column(source, name)[lo:hi]
+            elif name in self.manifest["streams"][stream]["columns"]:
+                # Shared rows come from a stream without this column
+                result[name] = np.full(hi - lo, np.nan)
+            else:
+                raise KeyError(f"Stream {stream} has no column {name}")
+        return result
+
+    def recent(self, stream, uid, days, end=None, columns=None):
+        """Rows from the `days` days before `end` (default: the user's last response, inclusive)"""
+        if end is None:
+            t_max = self._entry(stream, uid)["t_max"]
+            end = 0 if t_max is None else t_max + 1
+        return self.query(stream, uid, start=end - days * DAY_SECONDS, end=end, columns=columns)
+
+    def query_frame(self, stream, uid, start=None, end=None, columns=None):
+        """Same as query, as a DataFrame with a datetime column like train.py's frames"""
+        import pandas as pd
+
+        df = pd.DataFrame(self.query(stream, uid, start, end, columns))
+        df["uid"] = uid
+        df["datetime"] = pd.to_datetime(df[TIME_COLUMN], unit="s")
+        return df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or query the per-user sensor time-series store")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build")
+    build_parser.add_argument("--data-dir", default=default_data_dir())
+    build_parser.add_argument("--output", help="Store directory (default: <data-dir>/.sensor_store)")
+    build_parser.add_argument("--jobs", type=int)
+
+    query_parser = subparsers.add_parser("query")
+    query_parser.add_argument("stream", choices=STREAMS)
+    query_parser.add_argument("uid")
+    query_parser.add_argument("--days", type=float, help="Only the last N days of the user's data")
+    query_parser.add_argument("--store", help="Store directory (default: ML/data/.sensor_store)")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        manifest = build_store(args.data_dir, args.output, n_jobs=args.jobs)
+        for stream, info in manifest["streams"].items():
+            shared = sum(1 for user in info["users"].values() if user["source"] != stream)
+            skipped = sum(user["skipped"] for user in info["users"].values())
+            print(f"{stream:<10}{info['rows']:>7} rows{len(info['users']):>5} users"
+                  f"{len(info['columns']):>4} columns  {shared} shared files  {skipped} skipped records")
+    else:
+        store = SensorStore(args.store)
+        if args.days is None:
+            rows = store.query(args.stream, args.uid)
+        else:
+            rows = store.recent(args.stream, args.uid, args.days)
+        names = list(rows)
+        print("\t".join(names))
+        for i in range(len(rows[names[0]])):
+            print("\t".join(str(rows[name][i]) for name in names))
@@ -0,0 +1,229 @@
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+from collections import Counter
+from sklearn.compose import ColumnTransformer
+from sklearn.impute import SimpleImputer
+from sklearn.linear_model import SGDRegressor
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler, OneHotEncoder, MinMaxScaler
+
+"""
+Out-of-core training for the wellbeing model.
+
+The CSV is read in chunks with explicit dtypes and never held in memory as a
+whole. 20% of the rows are held out for evaluation, drawn the same way on every
+pass. A first pass accumulates the imputer, scaler and encoder statistics
+(running means and variances, category counts, target range) over the training
+rows only; they are loaded into the same ColumnTransformer wellbeing_train.py
+fits on its training split, so the saved Pipeline loads and predicts like
+mood_prediction_model.joblib and the held-out rows don't leak into it. Later
+passes train an SGDRegressor with partial_fit and evaluate it on the held-out
+rows, reporting the process's RSS after every chunk.
+Usage:
+   python wellbeing_train.py --stream --chunk-size 100000 --epochs 5
+"""
+
+NUMERIC_COLUMNS = ["FLOW", "TODO_COMPLETED", "SLEEP_HOURS"]
+CATEGORICAL_COLUMNS = ["DAILY_STRESS", "GENDER", "AGE"]
+TARGET_COLUMN = "WORK_LIFE_BALANCE_SCORE"
+
+# Explicit dtypes so every chunk parses the same way (DAILY_STRESS contains values like "1/1/00")
+CSV_DTYPES = {
+    "FLOW": "float64",
+    "TODO_COMPLETED": "float64",
+    "SLEEP_HOURS": "float64",
+    "DAILY_STRESS": "object",
+    "GENDER": "object",
+    "AGE": "object",
+    TARGET_COLUMN: "float64",
+}
+
+
+def memory_usage():
+    """(current RSS, peak RSS) of this process in MB; None where the platform can't tell"""
+    current = peak = None
+    try:
+        with open("/proc/self/statm", "r") as f:
+            current = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes
+        peak = maxrss / 2 ** 20 if sys.platform == "darwin" else maxrss / 2 ** 10
+    except ImportError:
+        pass
+    return current, peak
+
+
+def read_chunks(csv_path, chunk_size):
+    """Yield chunks of the wellbeing CSV with rows missing the target dropped"""
+    for chunk in pd.read_csv(csv_path, usecols=list(CSV_DTYPES), dtype=CSV_DTYPES, chunksize=chunk_size):
+        yield chunk[chunk[TARGET_COLUMN].notna()]
+
+
+class StreamingStatistics:
+    """Preprocessing statistics accumulated one chunk at a time"""
+
+    def __init__(self):
+        self.n_rows = 0
+        self.numeric = {column: (0, 0.0, 0.0) for column in NUMERIC_COLUMNS}  # (count, mean, M2)
+        self.categories = {column: Counter() for column in CATEGORICAL_COLUMNS}
+        self.target_scaler = MinMaxScaler()
+
+    def partial_fit(self, chunk):
+        self.n_rows += len(chunk)
+        for column in NUMERIC_COLUMNS:
+            values = chunk[column].dropna().to_numpy(dtype=np.float64)
+            if not len(values):
+                continue
+            # Chan et al. parallel update of the running mean and sum of squared deviations
+            count, mean, m2 = self.numeric[column]
+            chunk_mean = values.mean()
+            chunk_m2 = ((values - chunk_mean) ** 2).sum()
+            total = count + len(values)
+            delta = chunk_mean - mean
+            mean += delta * len(values) / total
+            m2 += chunk_m2 + delta ** 2 * count * len(values) / total
+            self.numeric[column] = (total, mean, m2)
+        for column in CATEGORICAL_COLUMNS:
+            self.categories[column].update(chunk[column].dropna().to_list())
+        if len(chunk):
+            self.target_scaler.partial_fit(chunk[[TARGET_COLUMN]].to_numpy())
+        return self
+
+    def most_frequent(self, column):
+        """Most common value, smallest first on ties (like SimpleImputer)"""
+        counts = self.categories[column]
+        top = max(counts.values())
+        return min(value for value, count in counts.items() if count == top)
+
+    def build_preprocessor(self):
+        """
+        The ColumnTransformer wellbeing_train.py would fit on the rows passed to partial_fit
+
+        The transformers are fitted on a tiny frame holding every category, then given the
+        streamed statistics. Imputed values equal the mean, so the scaler's variance is the
+        sum of squared deviations of the observed values divided by all rows.
+        """
+        size = max(max(len(counts) for counts in self.categories.values()), 2)
+        sample = pd.DataFrame({column: np.zeros(size) for column in NUMERIC_COLUMNS})
+        for column in CATEGORICAL_COLUMNS:
+            values = sorted(self.categories[column])
+            sample[column] = pd.Series([values[i % len(values)] for i in range(size)], dtype=object)
+
+        preprocessor = ColumnTransformer(transformers=[
+            ("num", Pipeline(steps=[
+                ("imputer", SimpleImputer(strategy="mean")),
+                ("scaler", StandardScaler()),
+            ]), NUMERIC_COLUMNS),
+            ("cat", Pipeline(steps=[
+                ("imputer", SimpleImputer(strategy="most_frequent")),
+                ("onehot", OneHotEncoder(handle_unknown="ignore")),
+            ]), CATEGORICAL_COLUMNS),
+        ])
+        preprocessor.fit(sample[NUMERIC_COLUMNS + CATEGORICAL_COLUMNS])
+
+        numeric = preprocessor.named_transformers_["num"]
+        means = np.array([self.numeric[column][1] for column in NUMERIC_COLUMNS])
+        variances = np.array([self.numeric[column][2] for column in NUMERIC_COLUMNS]) / self.n_rows
+        numeric.named_steps["imputer"].statistics_ = means
+        scaler = numeric.named_steps["scaler"]
+        scaler.mean_ = means
+        scaler.var_ = variances
+        scaler.scale_ = np.where(variances > 0, np.sqrt(variances), 1.0)
+        scaler.n_samples_seen_ = self.n_rows
+
+        categorical = preprocessor.named_transformers_["cat"]
+        categorical.named_steps["imputer"].statistics_ = np.array(
+            [self.most_frequent(column) for column in CATEGORICAL_COLUMNS], dtype=object
+        )
+        return preprocessor
+
+
+def test_rows(n_rows, random_state, test_size=0.2):
+    """Held-out mask for the next rows; the same random_state sequence gives the same split every pass"""
+    return random_state.random_sample(n_rows) < test_size
+
+
+def report(stage, chunk_index, n_rows, start):
+    current, peak = memory_usage()
+    current = "?" if current is None else f"{current:.1f}MB"
+    peak = "?" if peak is None else f"{peak:.1f}MB"
+    print(f"{stage:<10} chunk {chunk_index:>4}: {n_rows:>8} rows  rss {current:>9}  peak {peak:>9}"
+          f"  {time.perf_counter() - start:7.2f}s")
+
+
+def train_streaming(csv_path, chunk_size=100000, epochs=5, random_state=42, verbose=True, profile=None):
+    """
+    Fit preprocessing statistics and an SGD regressor without loading the whole CSV
+
+    Args:
+        profile: Data profile (check_csv.load_profile) every chunk is compared with; differences are
+            printed as warnings
+
+    Returns:
+        (pipeline, target_scaler, metrics) where pipeline is Pipeline(preprocessor, regressor)
+    """
+    start = time.perf_counter()
+    stats = StreamingStatistics()
+    n_rows = 0
+    # Like wellbeing_train.py, preprocessing only learns from the training rows
+    split = np.random.RandomState(random_state)
+    for i, chunk in enumerate(read_chunks(csv_path, chunk_size)):
+        if profile is not None:
+            from check_csv import validate_frame
+            for problem in validate_frame(chunk, profile):
+                print(f"Warning: chunk {i}: {problem}")
+        train = ~test_rows(len(chunk), split)
+        stats.partial_fit(chunk[train])
+        n_rows += len(chunk)
+        if verbose:
+            report("statistics", i, int(train.sum()), start)
+    preprocessor = stats.build_preprocessor()
+    target_scaler = stats.target_scaler
+
+    regressor = SGDRegressor(random_state=random_state)
+    shuffle = np.random.RandomState(random_state)
+    for epoch in range(epochs):
+        split = np.random.RandomState(random_state)
+        for i, chunk in enumerate(read_chunks(csv_path, chunk_size)):
+            train = ~test_rows(len(chunk), split)
+            if not train.any():
+                continue
+            X = preprocessor.transform(chunk[NUMERIC_COLUMNS + CATEGORICAL_COLUMNS][train])
+            y = target_scaler.transform(chunk[[TARGET_COLUMN]][train].to_numpy()).ravel()
+            order = shuffle.permutation(len(y))
+            regressor.partial_fit(X[order], y[order])
+            if verbose:
+                report(f"epoch {epoch + 1}", i, int(train.sum()), start)
+
+    # Streaming R^2 and RMSE on the held-out rows
+    split = np.random.RandomState(random_state)
+    n = total = total_sq = error_sq = 0.0
+    for chunk in read_chunks(csv_path, chunk_size):
+        test = test_rows(len(chunk), split)
+        if not test.any():
+            continue
+        X = preprocessor.transform(chunk[NUMERIC_COLUMNS + CATEGORICAL_COLUMNS][test])
+        y = target_scaler.transform(chunk[[TARGET_COLUMN]][test].to_numpy()).ravel()
+        n += len(y)
+        total += y.sum()
+        total_sq += (y ** 2).sum()
+        error_sq += ((regressor.predict(X) - y) ** 2).sum()
+
+    metrics = {"rows": n_rows, "train_rows": stats.n_rows, "test_rows": int(n), "peak_rss_mb": memory_usage()[1],
+               "seconds": time.perf_counter() - start}
+    if n:
+        metrics["test_r2"] = 1 - error_sq / (total_sq - total ** 2 / n)
+        metrics["test_rmse"] = float(np.sqrt(error_sq / n))
+
+    pipeline = Pipeline(steps=[
+        ("preprocessor", preprocessor),
+        ("regressor", regressor),
+    ])
+    return pipeline, target_scaler, metrics
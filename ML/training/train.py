@@ -1,189 +1,33 @@
 import numpy as np
 import pandas as pd
-import json, glob
+import os, sys
 import matplotlib.pyplot as plt
 from sklearn.tree import DecisionTreeClassifier, DecisionTreeRegressor
 from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, f1_score, mean_squared_error, r2_score
 from imblearn.under_sampling import RandomUnderSampler
-import joblib
 from sklearn.preprocessing import StandardScaler, OneHotEncoder
 from sklearn.linear_model import LinearRegression
 from sklearn.model_selection import TimeSeriesSplit
+from ingest import load_stream
+from feature_engine import FeatureEngine, STATE_FILE
+from align import align_streams
 
-path = "/home/johnplatkowski/Documents/Projects/HackKU-2025/ML/data/"
-
-# Load and process mood data
-mood_dfs_json = glob.glob(path + "Mood/*.json")
-mood_dfs = []
-for file in mood_dfs_json:
-    with open(file, 'r') as f:
-        data = json.load(f)
-    
-    # Skip empty files
-    if not data:
-        print(f"Warning: Empty JSON file found: {file}")
-        continue
-        
-    mood_df = pd.DataFrame(data)
-    
-    # Ensure all required columns exist
-    required_columns = ['happy', 'sad', 'happyornot', 'sadornot', 'location', 'resp_time']
-    for col in required_columns:
-        if col not in mood_df.columns:
-            print(f"Warning: Column {col} not found in {file}")
-            continue
-    
-    # Extract user ID from filename (e.g., "Mood_u00.json" -> "u00")
-    uid = file.split('/')[-1].split('.')[0].split('_')[1]
-    mood_df['uid'] = uid
-    
-    # Convert string values to numeric where appropriate
-    mood_df['happy'] = pd.to_numeric(mood_df['happy'], errors='coerce')
-    mood_df['sad'] = pd.to_numeric(mood_df['sad'], errors='coerce')
-    mood_df['happyornot'] = pd.to_numeric(mood_df['happyornot'], errors='coerce')
-    mood_df['sadornot'] = pd.to_numeric(mood_df['sadornot'], errors='coerce')
-    
-    # Create composite mood score (normalized to 0-1 range)
-    # Higher happy and lower sad values indicate better mood
-    mood_df['mood_score'] = ((mood_df['happy'] / 4) - (mood_df['sad'] / 4) + 1) / 2
-    
-    # Process location data
-    mood_df['has_location'] = mood_df['location'] != 'Unknown'
-    mood_df['latitude'] = mood_df['location'].apply(
-        lambda x: float(x.split(',')[0]) if isinstance(x, str) and x != 'Unknown' 
-        else float(x) if isinstance(x, (int, float)) 
-        else None
-    )
-    mood_df['longitude'] = mood_df['location'].apply(
-        lambda x: float(x.split(',')[1]) if isinstance(x, str) and x != 'Unknown' 
-        else None
-    )
-    
-    # Convert timestamp
-    mood_df['datetime'] = pd.to_datetime(mood_df['resp_time'], unit='s')
-    
-    mood_dfs.append(mood_df)
-
-mood_data = pd.concat(mood_dfs, ignore_index=True)
-
-# Load and process activity data
-activity_dfs_json = glob.glob(path + "Activity/*.json")
-activity_dfs = []
-for file in activity_dfs_json:
-    with open(file, "r") as f:
-        data = json.load(f)
-    
-    # Skip empty files
-    if not data:
-        print(f"Warning: Empty JSON file found: {file}")
-        continue
-        
-    activity_df = pd.DataFrame(data)
-    
-    # Extract user ID from filename (e.g., "Activity_u00.json" -> "u00")
-    uid = file.split('/')[-1].split('.')[0].split('_')[1]
-    activity_df['uid'] = uid
-    
-    # Convert string values to numeric where appropriate
-    numeric_columns = ['Social2', 'null', 'other_relaxing', 'other_working', 'relaxing', 'working']
-    for col in numeric_columns:
-        if col in activity_df.columns:
-            activity_df[col] = pd.to_numeric(activity_df[col], errors='coerce')
-    
-    # Convert timestamp
-    activity_df['datetime'] = pd.to_datetime(activity_df['resp_time'], unit='s')
-    
-    # Process location data
-    if 'location' in activity_df.columns:
-        activity_df['has_location'] = ~activity_df['location'].isin(['Unknown', 'null'])
-        activity_df['latitude'] = activity_df['location'].apply(
-            lambda x: float(x.split(',')[0]) if isinstance(x, str) and x not in ['Unknown', 'null'] and ',' in x
-            else float(x) if isinstance(x, (int, float)) 
-            else None
-        )
-        activity_df['longitude'] = activity_df['location'].apply(
-            lambda x: float(x.split(',')[1]) if isinstance(x, str) and x not in ['Unknown', 'null'] and ',' in x
-            else None
-        )
-    else:
-        activity_df['has_location'] = False
-        activity_df['latitude'] = None
-        activity_df['longitude'] = None
-    
-    # Create activity categories with safe column access
-    activity_df['is_social'] = activity_df['Social2'].notna().astype(int) if 'Social2' in activity_df.columns else 0
-    activity_df['is_working'] = activity_df['working'].notna().astype(int) if 'working' in activity_df.columns else 0
-    activity_df['is_relaxing'] = activity_df['relaxing'].notna().astype(int) if 'relaxing' in activity_df.columns else 0
-    
-    # Create activity intensity scores with safe column access
-    activity_df['social_intensity'] = activity_df['Social2'].fillna(0) if 'Social2' in activity_df.columns else 0
-    activity_df['work_intensity'] = activity_df['working'].fillna(0) if 'working' in activity_df.columns else 0
-    activity_df['relax_intensity'] = activity_df['relaxing'].fillna(0) if 'relaxing' in activity_df.columns else 0
-    
-    # Calculate total activity score
-    activity_df['total_activity_score'] = (
-        activity_df['social_intensity'] + 
-        activity_df['work_intensity'] + 
-        activity_df['relax_intensity']
-    ) / 3
-    
-    activity_dfs.append(activity_df)
+# The model registry lives next to the serving code in ML/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from model_registry import ModelRegistry
 
-activity_data = pd.concat(activity_dfs, ignore_index=True)
+path = "/home/johnplatkowski/Documents/Projects/HackKU-2025/ML/data/"
 
-# Load and process sleep data
-sleep_dfs_json = glob.glob(path + "Sleep/*.json")
-sleep_dfs = []
-for file in sleep_dfs_json:
-    with open(file, "r") as f:
-        data = json.load(f)
-    
-    # Skip empty files
-    if not data:
-        print(f"Warning: Empty JSON file found: {file}")
-        continue
-        
-    sleep_df = pd.DataFrame(data)
-    
-    # Extract user ID from filename (e.g., "Sleep_u00.json" -> "u00")
-    uid = file.split('/')[-1].split('.')[0].split('_')[1]
-    sleep_df['uid'] = uid
-    
-    # Convert string values to numeric where appropriate
-    numeric_columns = ['hour', 'rate', 'social']
-    for col in numeric_columns:
-        if col in sleep_df.columns:
-            sleep_df[col] = pd.to_numeric(sleep_df[col], errors='coerce')
-    
-    # Process location data
-    sleep_df['has_location'] = sleep_df['location'] != 'Unknown'
-    sleep_df['latitude'] = sleep_df['location'].apply(
-        lambda x: float(x.split(',')[0]) if isinstance(x, str) and x != 'Unknown' 
-        else float(x) if isinstance(x, (int, float)) 
-        else None
-    )
-    sleep_df['longitude'] = sleep_df['location'].apply(
-        lambda x: float(x.split(',')[1]) if isinstance(x, str) and x != 'Unknown' 
-        else None
-    )
-    
-    # Convert timestamp
-    sleep_df['datetime'] = pd.to_datetime(sleep_df['resp_time'], unit='s')
-    
-    # Create sleep quality features
-    sleep_df['sleep_quality'] = sleep_df['rate'].fillna(0)
-    sleep_df['sleep_duration'] = sleep_df['hour'].fillna(0)
-    
-    # Create sleep patterns
-    sleep_df['is_short_sleep'] = (sleep_df['sleep_duration'] < 6).astype(int)
-    sleep_df['is_long_sleep'] = (sleep_df['sleep_duration'] > 8).astype(int)
-    sleep_df['is_good_sleep'] = (sleep_df['sleep_quality'] >= 3).astype(int)
-    
-    sleep_dfs.append(sleep_df)
+# Load and process mood, activity and sleep data
+# Files are parsed in parallel and cached per file (see ingest.py), so reruns only reparse changed files
+mood_data = load_stream(path, "Mood")
+activity_data = load_stream(path, "Activity")
+sleep_data = load_stream(path, "Sleep")
 
-sleep_data = pd.concat(sleep_dfs, ignore_index=True)
+# Rolling and trend features come from the incremental engine so live predictions can compute the same values
+feature_engine = FeatureEngine()
 
 # Create time-based features
 sleep_data['hour'] = sleep_data['datetime'].dt.hour
@@ -191,11 +35,7 @@ sleep_data['day_of_week'] = sleep_data['datetime'].dt.dayofweek
 sleep_data['is_weekend'] = sleep_data['day_of_week'].isin([5, 6]).astype(int)
 
 # Create sleep-based features
-sleep_data = sleep_data.sort_values(['uid', 'datetime'])
-sleep_data['sleep_quality_3day_avg'] = sleep_data.groupby('uid')['sleep_quality'].rolling(window=3).mean().reset_index(0, drop=True)
-sleep_data['sleep_duration_3day_avg'] = sleep_data.groupby('uid')['sleep_duration'].rolling(window=3).mean().reset_index(0, drop=True)
-sleep_data['sleep_quality_trend'] = sleep_data.groupby('uid')['sleep_quality'].diff()
-sleep_data['sleep_duration_trend'] = sleep_data.groupby('uid')['sleep_duration'].diff()
+sleep_data = feature_engine.replay(sleep_data, "Sleep")
 
 # Load and process PHQ-9 survey data
 phq9_data = pd.read_csv(path + 'survey/PHQ-9.csv')
@@ -223,10 +63,7 @@ mood_data['day_of_week'] = mood_data['datetime'].dt.dayofweek
 mood_data['is_weekend'] = mood_data['day_of_week'].isin([5, 6]).astype(int)
 
 # Create mood-based features
-mood_data = mood_data.sort_values(['uid', 'datetime'])
-mood_data['mood_3day_avg'] = mood_data.groupby('uid')['mood_score'].rolling(window=3).mean().reset_index(0, drop=True)
-mood_data['mood_7day_avg'] = mood_data.groupby('uid')['mood_score'].rolling(window=7).mean().reset_index(0, drop=True)
-mood_data['mood_trend'] = mood_data.groupby('uid')['mood_score'].diff()
+mood_data = feature_engine.replay(mood_data, "Mood")
 
 # Create time-based features
 activity_data['hour'] = activity_data['datetime'].dt.hour
@@ -234,27 +71,11 @@ activity_data['day_of_week'] = activity_data['datetime'].dt.dayofweek
 activity_data['is_weekend'] = activity_data['day_of_week'].isin([5, 6]).astype(int)
 
 # Create activity-based features
-activity_data = activity_data.sort_values(['uid', 'datetime'])
-activity_data['activity_3day_avg'] = activity_data.groupby('uid')['total_activity_score'].rolling(window=3).mean().reset_index(0, drop=True)
-activity_data['activity_7day_avg'] = activity_data.groupby('uid')['total_activity_score'].rolling(window=7).mean().reset_index(0, drop=True)
-activity_data['activity_trend'] = activity_data.groupby('uid')['total_activity_score'].diff()
+activity_data = feature_engine.replay(activity_data, "Activity")
 
 # Merge all datasets
-merged_data = pd.merge_asof(
-    mood_data.sort_values('datetime'),
-    activity_data.sort_values('datetime'),
-    on='datetime',
-    by='uid',
-    direction='nearest'
-)
-
-merged_data = pd.merge_asof(
-    merged_data.sort_values('datetime'),
-    sleep_data.sort_values('datetime'),
-    on='datetime',
-    by='uid',
-    direction='nearest'
-)
+# Each user's readings are matched to their nearest activity and sleep readings in parallel (see align.py)
+merged_data = align_streams(mood_data, [activity_data, sleep_data])
 
 # Create target variables
 merged_data['next_day_mood'] = merged_data.groupby('uid')['mood_score'].shift(-1)
@@ -336,6 +157,13 @@ print(f"Training RMSE: {train_rmse}")
 print(f"Testing RMSE: {test_rmse}")
 print(f"Model Function: f(x) = {test_m}X + {test_y_intercept}")
 
-# Save model and scaler
-joblib.dump(model, 'mood_prediction_model.joblib')
-joblib.dump(scaler, 'mood_prediction_scaler.joblib')
\ No newline at end of file
+# Register model and feature scaler under their own name so they don't replace the served wellbeing model.
+# Each user's feature state is stored with them, so live predictions continue from the training history
+registry = ModelRegistry()
+version = registry.register(
+    "sensor_mood", model, scaler, features=features,
+    metrics={"train_r2": train_score, "test_r2": test_score, "train_rmse": train_rmse, "test_rmse": test_rmse},
+    params={"model": "LinearRegression", "scaler": "features"}, source={"script": "train.py"},
+    promote=True, compile=False, extra_files={STATE_FILE: feature_engine.checkpoint},
+)
+print(f"Model registered as sensor_mood version {version} in {registry.root}")
\ No newline at end of file
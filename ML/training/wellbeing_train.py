@@ -1,21 +1,90 @@
+import os
+import sys
+import json
+import argparse
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.model_selection import train_test_split, cross_val_score
 from sklearn.metrics import mean_squared_error, r2_score
-import joblib
 from sklearn.preprocessing import StandardScaler, OneHotEncoder, MinMaxScaler
 from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
 from sklearn.impute import SimpleImputer
+from search import SEARCH_SPACE, load_search_space, run_search, format_results
+from forest_shards import prepare_job, train_sharded
+from streaming import train_streaming
+
+# The model registry lives next to the serving code in ML/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from model_registry import ModelRegistry, DEFAULT_MODEL_NAME
+from check_csv import load_profile, validate_frame
+
+parser = argparse.ArgumentParser(description="Train the work-life balance model")
+parser.add_argument("--search", choices=["grid", "random"],
+                    help="Cross-validate forest and ridge parameters instead of training the final model")
+parser.add_argument("--space", help="JSON file with the parameter values to search (default: search.SEARCH_SPACE)")
+parser.add_argument("--iterations", type=int, default=20, help="Samples per model for --search random")
+parser.add_argument("--folds", type=int, default=5)
+parser.add_argument("--jobs", type=int, help="Worker processes for the search or shards (default: one per CPU)")
+parser.add_argument("--output", help="Write the ranked search results to this JSON file")
+parser.add_argument("--shards", type=int, help="Fit the forest as this many sub-forests in parallel and merge them")
+parser.add_argument("--row-shards", type=int, default=1, help="Also split the rows across shards (approximate)")
+parser.add_argument("--job-dir", default="forest_job", help="Directory shared by the shard workers")
+parser.add_argument("--prepare-only", action="store_true",
+                    help="Only write the shard job; fit it with forest_shards.py work/merge")
+parser.add_argument("--stream", action="store_true",
+                    help="Train an SGD model reading the CSV in chunks, for data larger than memory")
+parser.add_argument("--chunk-size", type=int, default=100000, help="Rows per chunk for --stream")
+parser.add_argument("--epochs", type=int, default=5, help="Passes over the data for --stream")
+parser.add_argument("--promote", action="store_true",
+                    help="Also make the model the version the server answers with, if it passes the canary check")
+args = parser.parse_args()
 
 path = "/home/johnplatkowski/Documents/Projects/HackKU-2025/ML/data/    " 
 
+
+def register_model(model_pipeline, y_scaler, features, metrics, params):
+    """
+    Store the trained model as a new registry version
+
+    With --promote it also becomes CURRENT (the server picks it up by itself), but only after
+    passing the server's canary check; otherwise promote it with model_registry.py once reviewed.
+    """
+    registry = ModelRegistry()
+    version = registry.register(DEFAULT_MODEL_NAME, model_pipeline, y_scaler, features=features, metrics=metrics,
+                                params=params, source={"script": "wellbeing_train.py", "args": sys.argv[1:]})
+    print(f"Model registered as {DEFAULT_MODEL_NAME} version {version} in {registry.root}")
+    if args.promote:
+        try:
+            registry.promote(DEFAULT_MODEL_NAME, version, validate=True)
+        except ValueError as e:
+            print(f"Not promoted: {e}")
+            sys.exit(1)
+        print(f"Promoted {version} to CURRENT")
+    return version
+
+
+# Streaming mode: never load the whole CSV, register the chunk-trained model like the in-memory one
+if args.stream:
+    model_pipeline, y_scaler, metrics = train_streaming(path + "Wellbeing_and_lifestyle_data_Kaggle.csv",
+                                                        args.chunk_size, args.epochs, profile=load_profile())
+    print(f"Test R^2 score: {metrics.get('test_r2')}")
+    print(f"Test RMSE: {metrics.get('test_rmse')}")
+    print(f"Peak RSS: {metrics['peak_rss_mb']}MB")
+    register_model(model_pipeline, y_scaler, model_pipeline.feature_names_in_, metrics,
+                   {"mode": "stream", "chunk_size": args.chunk_size, "epochs": args.epochs})
+    sys.exit(0)
+
 # Load data
 df = pd.read_csv(path + "Wellbeing_and_lifestyle_data_Kaggle.csv")
 df_selected = df[["Timestamp", "DAILY_STRESS", "FLOW", "TODO_COMPLETED", "SLEEP_HOURS", "GENDER", "AGE", "WORK_LIFE_BALANCE_SCORE"]]
 
+# Compare the data with the stored profile of the Kaggle data the server validates inputs against
+for problem in validate_frame(df_selected.drop(columns=["Timestamp"]), load_profile()):
+    print(f"Warning: {problem}")
+
 
 X = df_selected.drop(columns=["WORK_LIFE_BALANCE_SCORE", "Timestamp"])
 y = df_selected["WORK_LIFE_BALANCE_SCORE"].copy()
@@ -66,8 +135,28 @@ model_pipeline = Pipeline(steps=[
 # Split data to test trained data against untrained data
 X_train, X_test, y_train_scaled, y_test_scaled = train_test_split(X, y_scaled, test_size=0.2, random_state=42)
 
+# Search mode: rank parameter candidates with k-fold CV on the training split, leaving the test split untouched
+if args.search:
+    space = load_search_space(args.space) if args.space else SEARCH_SPACE
+    results = run_search(preprocessor, X_train, y_train_scaled, space, args.search,
+                         args.iterations, args.folds, args.jobs)
+    print(format_results(results))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    sys.exit(0)
+
 # Train regression model
-model_pipeline.fit(X_train, y_train_scaled)
+if args.shards and args.prepare_only:
+    prepare_job(model_pipeline, X_train, y_train_scaled, args.job_dir, args.shards, args.row_shards)
+    print(f"Wrote shard job to {args.job_dir}; run 'python forest_shards.py work {args.job_dir}' on each worker")
+    sys.exit(0)
+elif args.shards:
+    # Sub-forests are fitted in separate processes and merged into the same Pipeline a single fit produces
+    model_pipeline = train_sharded(model_pipeline, X_train, y_train_scaled, args.job_dir,
+                                   args.shards, args.row_shards, args.jobs)
+else:
+    model_pipeline.fit(X_train, y_train_scaled)
 
 # Evaluate model on scaled data
 y_train_scaled_pred = model_pipeline.predict(X_train)
@@ -84,6 +173,10 @@ print(f"Test R^2 score: {test_score}")
 print(f"Training RMSE: {train_rmse}")
 print(f"Test RMSE: {test_rmse}")
 
-# Save model and scaler for later use
-joblib.dump(model_pipeline, 'mood_prediction_model.joblib')
-joblib.dump(y_scaler, 'target_scaler.joblib')
\ No newline at end of file
+# Register model and scaler as a new version instead of overwriting a file in the working directory
+regressor_params = model_pipeline.named_steps["regressor"].get_params()
+register_model(
+    model_pipeline, y_scaler, list(X.columns),
+    {"train_r2": train_score, "test_r2": test_score, "train_rmse": train_rmse, "test_rmse": test_rmse},
+    {name: value for name, value in regressor_params.items() if isinstance(value, (int, float, str, bool, type(None)))},
+)
\ No newline at end of file
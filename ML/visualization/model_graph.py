@@ -1,18 +1,62 @@
+import os
+import sys
 import numpy as np
 import matplotlib.pyplot as plt
 import joblib
 import pandas as pd
 from sklearn.preprocessing import StandardScaler
 
+# Registry name train.py registers the sensor mood model under
+REGISTRY_MODEL_NAME = "sensor_mood"
+
+
+def fuse_linear_model(coefficients, intercept, scaler):
+    """
+    Fold a StandardScaler into a linear model
+
+    intercept + ((x - mean) / scale) . coefficients == fused_intercept + x . fused_coefficients
+
+    Returns:
+        (fused_coefficients, fused_intercept) that take raw, unscaled features
+    """
+    coefficients = np.asarray(coefficients, dtype=np.float64)
+    mean = getattr(scaler, "mean_", None)
+    scale = getattr(scaler, "scale_", None)
+    fused = coefficients / scale if scale is not None else coefficients.copy()
+    fused_intercept = float(intercept) - (float(np.dot(mean, fused)) if mean is not None else 0.0)
+    return fused, fused_intercept
+
+
+def registered_model_paths(version=None, registry_dir=None):
+    """Model and scaler paths of the sensor mood model train.py registered (default: its CURRENT version)"""
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from model_registry import ModelRegistry, DEFAULT_REGISTRY_DIR
+
+    registry = ModelRegistry(registry_dir or DEFAULT_REGISTRY_DIR)
+    version = version or registry.current(REGISTRY_MODEL_NAME)
+    if version is None:
+        raise KeyError(f"No '{REGISTRY_MODEL_NAME}' model has been registered")
+    paths = registry.paths(REGISTRY_MODEL_NAME, version)
+    return paths["model_path"], paths["scaler_path"]
+
+
 class MoodPredictionGraph:
-    def __init__(self, model_path='mood_prediction_model.joblib', scaler_path='mood_prediction_scaler.joblib'):
-        # Load the trained model and scaler
+    def __init__(self, model_path=None, scaler_path=None):
+        # train.py no longer writes model files to the working directory; default to its registered model
+        if model_path is None:
+            model_path, scaler_path = registered_model_paths()
+        # Load the trained model and scaler (a model trained on raw features has none)
         self.model = joblib.load(model_path)
-        self.scaler = joblib.load(scaler_path)
+        self.scaler = joblib.load(scaler_path) if scaler_path else None
         
         # Extract model coefficients and intercept
         self.coefficients = self.model.coef_
         self.intercept = self.model.intercept_
+
+        # Same model on raw features: predictions are one dot product, without the scaler
+        self.fused_coefficients, self.fused_intercept = fuse_linear_model(
+            self.coefficients, self.intercept, self.scaler
+        )
         
         # Feature names from the training data
         self.feature_names = [
@@ -24,30 +68,88 @@ class MoodPredictionGraph:
             'sleep_quality_trend', 'sleep_duration_trend', 'hour', 'day_of_week',
             'is_weekend', 'has_location', 'latitude', 'longitude'
         ]
-    
+        self.feature_index = {name: i for i, name in enumerate(self.feature_names)}
+
+    @classmethod
+    def from_registry(cls, version=None, registry_dir=None):
+        """Load the sensor mood model train.py registered (default: its CURRENT version)"""
+        return cls(*registered_model_paths(version, registry_dir))
+
     def predict_mood_improvement(self, features_dict):
         """
         Use the extracted function to predict mood improvement
         
         Args:
-            features_dict: Dictionary of feature names and values
+            features_dict: Dictionary of feature names and values (missing features count as 0)
             
         Returns:
             Predicted mood improvement value
         """
-        # Create a feature array with the same structure as training data
-        features = np.zeros(len(self.feature_names))
-        for i, feature_name in enumerate(self.feature_names):
-            if feature_name in features_dict:
-                features[i] = features_dict[feature_name]
-        
-        # Scale the features
-        features_scaled = self.scaler.transform([features])
-        
-        # Apply the prediction function
-        prediction = self.intercept + np.dot(features_scaled, self.coefficients)
-        
-        return prediction[0]
+        # Only the given features contribute; a 0 contributes nothing to the fused model
+        prediction = self.fused_intercept
+        for feature_name, value in features_dict.items():
+            i = self.feature_index.get(feature_name)
+            if i is not None:
+                prediction += self.fused_coefficients[i] * value
+        return prediction
+
+    def feature_matrix(self, rows):
+        """
+        Raw feature matrix in model order
+
+        Args:
+            rows: DataFrame with the feature columns, list of feature dictionaries, or an
+                  (n, n_features) array already in model order; missing values count as 0
+        """
+        if isinstance(rows, pd.DataFrame):
+            return rows.reindex(columns=self.feature_names).fillna(0).to_numpy(dtype=np.float64)
+        if isinstance(rows, np.ndarray):
+            return np.nan_to_num(rows.astype(np.float64, copy=False).reshape(-1, len(self.feature_names)))
+        matrix = np.zeros((len(rows), len(self.feature_names)))
+        for r, features_dict in enumerate(rows):
+            for feature_name, value in features_dict.items():
+                i = self.feature_index.get(feature_name)
+                if i is not None:
+                    matrix[r, i] = value
+        np.nan_to_num(matrix, copy=False)
+        return matrix
+
+    def predict_timeline(self, rows):
+        """
+        Predict mood improvement for many rows (e.g. a user's whole timeline) in one matrix-vector product
+
+        Args:
+            rows: See feature_matrix
+
+        Returns:
+            Array of predictions, one per row in order
+        """
+        return self.feature_matrix(rows) @ self.fused_coefficients + self.fused_intercept
+
+    def predict_what_if(self, baseline, changes):
+        """
+        Predict every combination of what-if values for some features, everything else fixed at the baseline
+
+        Args:
+            baseline: Feature dictionary for the current situation
+            changes: Dictionary of feature name -> sequence of values to try, e.g.
+                     {"sleep_duration": np.arange(4, 10.5, 0.5), "total_activity_score": [0, 0.5, 1]}
+
+        Returns:
+            Array with one axis per changed feature (in the order given) holding the predictions
+        """
+        names = list(changes)
+        unknown = [name for name in names if name not in self.feature_index]
+        if unknown:
+            raise KeyError(f"Unknown features: {', '.join(unknown)}")
+        axes = [np.asarray(changes[name], dtype=np.float64) for name in names]
+        grid = np.meshgrid(*axes, indexing="ij")
+
+        # Only the changed features differ from the baseline, so the grid is one product with their coefficients
+        base = self.predict_mood_improvement(baseline)
+        deltas = np.stack([values.ravel() - baseline.get(name, 0) for name, values in zip(names, grid)], axis=1)
+        coefficients = self.fused_coefficients[[self.feature_index[name] for name in names]]
+        return (base + deltas @ coefficients).reshape(grid[0].shape)
     
     def get_model_function_string(self):
         """Return a string representation of the model function"""
@@ -82,14 +184,8 @@ class MoodPredictionGraph:
         Args:
             data_sample: DataFrame containing feature columns
         """
-        # Prepare features
-        X = data_sample[self.feature_names].fillna(0)
-        
-        # Scale features
-        X_scaled = self.scaler.transform(X)
-        
-        # Get predictions
-        predictions = self.model.predict(X_scaled)
+        # Get predictions with the fused model (no scaling pass)
+        predictions = self.predict_timeline(data_sample[self.feature_names])
         
         # Plot histogram
         plt.figure(figsize=(10, 6))
@@ -103,7 +199,7 @@ class MoodPredictionGraph:
 
 # Example usage
 if __name__ == "__main__":
-    # Create graph object
+    # Create graph object from the registered sensor model
     graph = MoodPredictionGraph()
     
     # Print the model function
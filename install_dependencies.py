@@ -1,7 +1,16 @@
 #!/usr/bin/env python3
+import os
 import subprocess
 import sys
 
+ML_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ML")
+
+# Generated from the trained model; not kept in git
+BUILD_STEPS = [
+    ["compiled_forest.py", "export"],
+    ["lookup_table.py", "build"],
+]
+
 def install_dependencies():
     print("Installing required dependencies...")
     try:
@@ -12,5 +21,16 @@ def install_dependencies():
         return False
     return True
 
+def build_model_artifacts():
+    print("Building the compiled model and lookup table...")
+    for step in BUILD_STEPS:
+        try:
+            subprocess.check_call([sys.executable] + step, cwd=ML_DIR)
+        except subprocess.CalledProcessError:
+            print(f"Error running 'python ML/{' '.join(step)}'. Predictions will use the sklearn pipeline until it succeeds.")
+            return False
+    return True
+
 if __name__ == "__main__":
-    install_dependencies() 
\ No newline at end of file
+    if install_dependencies():
+        build_model_artifacts()